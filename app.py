@@ -1,17 +1,70 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from routes.detailed_analysis import detailed_analysis_router
 from routes.quick_analysis import quick_analysis_router
 from routes.session_summary import session_summary_router
 from routes.session_ranking import session_ranking_router
+from routes.session_trend import session_trend_router
+from routes.session_hashtags import session_hashtags_router
+from routes.metrics import metrics_router
+from starlette.concurrency import run_in_threadpool
+from plugin.db import close_client, ensure_indexes, get_database, MONGO_ENSURE_INDEXES, EMBEDDED_JOB_WORKERS
+from plugin.http_client import close_http_client, get_http_client
+from plugin.server import API_GRACEFUL_SHUTDOWN, API_HOST, API_PORT, API_WORKERS
+from utils.inference_backends import close_backends
+from utils.inference_cache import inference_cache
+from utils.job_worker import SessionJobWorker
+from utils.metrics import MetricsMiddleware, mark_process_dead, register_inference_cache
+from utils.micro_batcher import micro_batcher
 import logging
 
 # Enable logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Clients are built here, inside each worker process, never inherited across fork()
+    get_database()
+    get_http_client()
+
+    if MONGO_ENSURE_INDEXES:
+        try:
+            await run_in_threadpool(ensure_indexes)
+        except Exception as e:
+            logger.error(f"❌ Error ensuring Mongo indexes: {e}")
+
+    job_worker = None
+    if EMBEDDED_JOB_WORKERS:
+        try:
+            job_worker = SessionJobWorker()
+            await job_worker.start()
+            logger.info("✅ Session job workers started")
+        except Exception as e:
+            job_worker = None
+            logger.error(f"❌ Error starting session job workers: {e}")
+
+    yield
+
+    # Running session jobs get JOB_DRAIN_TIMEOUT to finish before they are requeued
+    if job_worker is not None:
+        await job_worker.stop()
+    if inference_cache is not None:
+        logger.info(f"Inference cache stats: {inference_cache.stats()}")
+    # Release pooled inference connections on shutdown
+    await micro_batcher.stop()
+    await close_backends()
+    await close_http_client()
+    close_client()
+    mark_process_dead()
+
 # Create FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+# Request latency per route, exported on /metrics with the pipeline and inference metrics
+app.add_middleware(MetricsMiddleware)
+register_inference_cache(inference_cache)
 
 app.add_middleware(
     CORSMiddleware,
@@ -46,6 +99,32 @@ try:
 except Exception as e:
     logger.error(f"❌ Error loading Session Ranking Report: {e}")
 
+try:
+    app.include_router(session_trend_router)
+    logger.info("✅ Session Trend Report loaded successfully")
+except Exception as e:
+    logger.error(f"❌ Error loading Session Trend Report: {e}")
+
+try:
+    app.include_router(session_hashtags_router)
+    logger.info("✅ Session Hashtags Report loaded successfully")
+except Exception as e:
+    logger.error(f"❌ Error loading Session Hashtags Report: {e}")
+
+try:
+    app.include_router(metrics_router)
+    logger.info("✅ Metrics loaded successfully")
+except Exception as e:
+    logger.error(f"❌ Error loading Metrics: {e}")
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="10.226.51.33", port=8000, reload=False)
\ No newline at end of file
+    # An import string lets uvicorn start API_WORKERS processes, each importing the app itself
+    uvicorn.run(
+        "app:app",
+        host=API_HOST,
+        port=API_PORT,
+        workers=API_WORKERS,
+        timeout_graceful_shutdown=API_GRACEFUL_SHUTDOWN,
+        reload=False,
+    )
\ No newline at end of file
@@ -0,0 +1,179 @@
+"""
+Interactive latency while one client floods the API, with and without admission control.
+
+For each setting of ADMISSION_ENABLED, starts benchmarks.fake_inference and
+benchmarks.serve_app, then measures POST /anlaysis-sentiment latency from an
+interactive client twice: alone, and while a second token subject loops
+/process-session over pending sessions and /session-sentiment-ranking with
+--flood-ids session ids per request without backing off. Prints one JSON
+document with p50/p95/p99 per phase and the flood's status code counts.
+
+    python -m benchmarks.bench_admission --requests 1000 --concurrency 8 --flood-clients 32
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+from collections import Counter
+
+import httpx
+import jwt
+
+from benchmarks.bench_text_cleaner import synthetic_text
+from benchmarks.load_test import closed_loop, percentile, wait_until_ready
+from utils.auth import ALGORITHM, SECRET_KEY_DECODE
+
+
+def auth_headers(subject: str) -> dict:
+    token = jwt.encode({"sub": subject, "exp": int(time.time()) + 86400}, SECRET_KEY_DECODE, algorithm=ALGORITHM)
+    return {"Authorization": f"Bearer {token}"}
+
+
+def latency_stats(latencies: list, errors: int) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+    }
+
+
+async def flood(args, base_url: str, stop, statuses: dict):
+    flooder = auth_headers("flooder")
+    session_ids = [f"bench-done-{i:04d}" for i in range(args.flood_ids)]
+    counts = Counter()
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=httpx.Limits(max_connections=None)) as client:
+        async def flood_client(index: int):
+            turn = 0
+            while not stop.is_set():
+                turn += 1
+                try:
+                    if turn % 2:
+                        response = await client.post(f"/process-session/bench-pending-{(index + turn) % args.pending_sessions:04d}", headers=flooder)
+                    else:
+                        response = await client.post("/session-sentiment-ranking", json={"session_ids": session_ids}, headers=flooder)
+                    counts[response.status_code] += 1
+                except httpx.HTTPError:
+                    counts["error"] += 1
+
+        await asyncio.gather(*(flood_client(i) for i in range(args.flood_clients)))
+    statuses.update({str(status): count for status, count in counts.items()})
+
+
+def run_flood(args, base_url: str, stop, statuses: dict):
+    # On a small machine the flooding client competes with the API for CPU; a
+    # lower priority stands in for a client running on another host
+    os.nice(args.flood_nice)
+    asyncio.run(flood(args, base_url, stop, statuses))
+
+
+async def measure(args, base_url: str) -> dict:
+    import random
+
+    rng = random.Random(args.seed)
+    texts = [synthetic_text(rng, rng.randint(8, 45)) for _ in range(args.requests)]
+    interactive = auth_headers("interactive")
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=httpx.Limits(max_connections=None)) as client:
+        async def quick(i: int):
+            response = await client.post("/anlaysis-sentiment", json={"text": texts[i]}, headers=interactive)
+            response.raise_for_status()
+
+        latencies, errors, _ = await closed_loop(args.concurrency, args.requests, quick)
+    return latency_stats(latencies, errors)
+
+
+def measure_under_flood(args, base_url: str) -> dict:
+    # The flood gets its own process, so its event loop does not delay the measuring client
+    with multiprocessing.Manager() as manager:
+        stop, statuses = manager.Event(), manager.dict()
+        flooder = multiprocessing.Process(target=run_flood, args=(args, base_url, stop, statuses))
+        flooder.start()
+        try:
+            # Let the flood build up queued jobs and busy threads first
+            time.sleep(args.warmup)
+            result = asyncio.run(measure(args, base_url))
+        finally:
+            stop.set()
+            flooder.join()
+        result["flood_statuses"] = dict(sorted(statuses.items()))
+    return result
+
+
+def run_setting(args, admission_enabled: bool) -> dict:
+    inference_url = f"http://127.0.0.1:{args.inference_port}"
+    env = {
+        **os.environ,
+        "FAKE_INFERENCE_LATENCY_MS": str(args.inference_latency_ms),
+        "INFERENCE_API_URL": f"{inference_url}/infer",
+        "INFERENCE_BATCH_API_URL": f"{inference_url}/infer-batch",
+        "MONGO_ENSURE_INDEXES": "false",
+        "INFERENCE_CACHE_BACKEND": "none",
+        "ADMISSION_ENABLED": "true" if admission_enabled else "false",
+        # Only the flood should meet the limits; the interactive client runs well past one user's rate
+        "ADMISSION_LIMITS": json.dumps({"quick_analysis": [100000, 100000, 512]}),
+    }
+    serve_args = [
+        "--port", str(args.api_port),
+        "--pending-sessions", str(args.pending_sessions),
+        "--done-sessions", str(args.flood_ids),
+        "--posts-per-session", str(args.posts_per_session),
+        "--seed", str(args.seed),
+    ]
+    processes = []
+    try:
+        inference = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "benchmarks.fake_inference:app", "--port", str(args.inference_port), "--log-level", "warning"],
+            env=env,
+        )
+        processes.append(inference)
+        api = subprocess.Popen([sys.executable, "-m", "benchmarks.serve_app", *serve_args], env=env)
+        processes.append(api)
+        wait_until_ready(f"{inference_url}/docs", inference, 30)
+        base_url = f"http://127.0.0.1:{args.api_port}"
+        wait_until_ready(f"{base_url}/metrics", api, 300)
+
+        return {
+            "alone": asyncio.run(measure(args, base_url)),
+            "under_flood": measure_under_flood(args, base_url),
+        }
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000, help="Interactive requests per phase")
+    parser.add_argument("--concurrency", type=int, default=8, help="Interactive clients")
+    parser.add_argument("--flood-clients", type=int, default=32)
+    parser.add_argument("--flood-ids", type=int, default=100, help="Session ids per flooding ranking request")
+    parser.add_argument("--pending-sessions", type=int, default=40)
+    parser.add_argument("--posts-per-session", type=int, default=200)
+    parser.add_argument("--flood-nice", type=int, default=5, help="Scheduling niceness of the flooding client process")
+    parser.add_argument("--warmup", type=float, default=2, help="Seconds of flood before measuring")
+    parser.add_argument("--inference-latency-ms", type=float, default=20)
+    parser.add_argument("--api-port", type=int, default=8100)
+    parser.add_argument("--inference-port", type=int, default=5999)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    report = {"config": vars(args)}
+    for enabled in (False, True):
+        report["admission_on" if enabled else "admission_off"] = run_setting(args, enabled)
+        print(json.dumps(report, indent=2), file=sys.stderr)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Export throughput and offline report time against the database aggregate.
+
+Seeds analyzed sessions like benchmarks.serve_app, exports them with
+utils.sentiment_export, then times the summary/ranking stats from the files
+(utils.export_reader) and from socialMediaSentiment ($group pipeline of
+utils.session_stats). Prints one JSON document.
+
+    python -m benchmarks.bench_export --sessions 50 --posts-per-session 2000 --format parquet
+
+mongomock runs aggregations in Python, so use --mongo-uri for a fair
+comparison with a real mongod.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks import serve_app
+
+
+def directory_size_mb(directory: str) -> float:
+    return round(sum(entry.stat().st_size for entry in os.scandir(directory)) / 1e6, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--posts-per-session", type=int, default=2000)
+    parser.add_argument("--format", choices=["parquet", "arrow"], default="parquet")
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    parser.add_argument("--mongo-uri", help="Use this mongod instead of an in-memory stand-in")
+    parser.add_argument("--mongo-db", default="sentiment_bench")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    # Results seeded just now must count as settled
+    os.environ["EXPORT_SETTLE_SECONDS"] = "0"
+    serve_app.prepare_database(argparse.Namespace(
+        mongo_uri=args.mongo_uri, mongo_db=args.mongo_db, pending_sessions=0, done_sessions=args.sessions,
+        posts_per_session=args.posts_per_session, seed=args.seed,
+        platform_mix=serve_app.parse_platform_mix("twitter=0.5,youtube=0.3,reddit=0.2"),
+    ))
+
+    from utils.export_reader import export_session_stats
+    from utils.sentiment_export import export_sentiment
+    from utils.session_stats import fetch_session_stats
+
+    # Watermarks are whole seconds: let the seeded ids fall before the next one
+    time.sleep(1.1)
+    directory = tempfile.mkdtemp(prefix="sentiment-export-")
+    try:
+        started = time.perf_counter()
+        exported = export_sentiment(directory, fmt=args.format, chunk_size=args.chunk_size)
+        export_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        from_files = export_session_stats(directory)
+        reader_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        from_database = fetch_session_stats(None)
+        database_seconds = time.perf_counter() - started
+
+        report = {
+            "config": vars(args),
+            "rows": exported["rows"],
+            "export_seconds": round(export_seconds, 3),
+            "export_rows_per_second": round(exported["rows"] / export_seconds, 1) if export_seconds else None,
+            "export_size_mb": directory_size_mb(directory),
+            "reader_seconds": round(reader_seconds, 4),
+            "database_aggregate_seconds": round(database_seconds, 4),
+            "sessions_match": sorted(from_files) == sorted(from_database)
+            and all(from_files[s]["total_posts"] == from_database[s]["total_posts"] for s in from_files),
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Checks that session processing memory is bounded by batch size, not session size.
+
+Runs utils.session_pipeline.process_session against a synthetic scrappedPosts
+collection that generates posts on demand and a socialMediaSentiment sink that
+only counts inserts, so neither holds the session in memory. Every other
+collection the writer touches is an in-memory stand-in; their rows are
+bounded per session. The peak traced allocation for a small session and a
+million-post session must be about the same. test/test_streaming_memory.py
+runs the same check.
+
+    python -m benchmarks.bench_streaming_memory --posts 1000000
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import tracemalloc
+
+import mongomock
+
+import utils.session_pipeline as session_pipeline
+from plugin.db import use_database
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self._docs = docs
+        self._limit = None
+
+    def sort(self, *args, **kwargs):
+        return self
+
+    def limit(self, limit):
+        self._limit = limit
+        return self
+
+    def __iter__(self):
+        for count, doc in enumerate(self._docs):
+            if self._limit is not None and count >= self._limit:
+                return
+            yield doc
+
+
+class SyntheticPosts:
+    """
+    Read-only stand-in for scrappedPosts holding `size` posts with integer ids.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.updated = 0
+
+    def find(self, query, projection=None):
+        after = query.get("_id", {}).get("$gt", -1)
+        return _Cursor(self._generate(after + 1))
+
+    def _generate(self, start):
+        platforms = ("twitter", "youtube", "reddit")
+        fields = {"twitter": "text", "youtube": "metadata", "reddit": "content"}
+        for post_id in range(start, self.size):
+            platform = platforms[post_id % 3]
+            yield {
+                "_id": post_id,
+                "platform": platform,
+                fields[platform]: f"Post {post_id} about #topic{post_id % 50} by @user{post_id} http://t.co/{post_id}",
+                "datetime": "2025-01-01T00:00:00",
+            }
+
+    def bulk_write(self, operations, ordered=True):
+        # Status changes of processed posts; only counted
+        self.updated += len(operations)
+
+
+class WriteSink:
+    """
+    Accepts the writer's bulk calls and keeps only counters.
+    """
+
+    def __init__(self):
+        self.inserted = 0
+        self.updated = 0
+
+    def insert_many(self, docs, ordered=True):
+        self.inserted += len(docs)
+
+
+class StandInDatabase:
+    """
+    Database for plugin.db.use_database: scrappedPosts is synthetic,
+    socialMediaSentiment is a sink and every other collection is in memory.
+    """
+
+    def __init__(self, posts: int):
+        self.posts = SyntheticPosts(posts)
+        self.sentiment = WriteSink()
+        self.others = mongomock.MongoClient()["textdata"]
+
+    def __getitem__(self, name: str):
+        if name == "scrappedPosts":
+            return self.posts
+        if name == "socialMediaSentiment":
+            return self.sentiment
+        return self.others[name]
+
+
+async def fake_analyze_sentiment_batch(texts, model="sentiment-v3", **kwargs):
+    return [{"model": model, "scores": {"Negative": 0.2, "Positive": 0.5, "Neutral": 0.3}} for _ in texts]
+
+
+def measure(posts: int, batch_size: int) -> dict:
+    database = StandInDatabase(posts)
+    analyze_sentiment_batch = session_pipeline.analyze_sentiment_batch
+    session_pipeline.analyze_sentiment_batch = fake_analyze_sentiment_batch
+    use_database(database)
+    try:
+        tracemalloc.start()
+        started = time.perf_counter()
+        result = asyncio.run(session_pipeline.process_session("bench-session", batch_size=batch_size))
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        use_database(None)
+        session_pipeline.analyze_sentiment_batch = analyze_sentiment_batch
+
+    assert result["posts_processed"] == posts == database.sentiment.inserted == database.posts.updated, result
+    return {
+        "posts": posts,
+        "batch_size": batch_size,
+        "peak_bytes": peak,
+        "seconds": round(elapsed, 2),
+        "posts_per_second": round(posts / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=1_000_000)
+    parser.add_argument("--baseline-posts", type=int, default=10_000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--max-growth", type=float, default=1.5, help="Allowed peak ratio large/baseline")
+    args = parser.parse_args()
+
+    baseline = measure(args.baseline_posts, args.batch_size)
+    large = measure(args.posts, args.batch_size)
+    growth = large["peak_bytes"] / baseline["peak_bytes"]
+    report = {"baseline": baseline, "large": large, "peak_growth": round(growth, 3), "passed": growth <= args.max_growth}
+
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
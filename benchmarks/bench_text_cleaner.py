@@ -0,0 +1,91 @@
+"""
+Microbenchmark of utils.text_cleaner against the previous three-pass implementation.
+
+Checks that both produce identical output, then reports throughput for
+tweet-length and long Reddit-style inputs.
+
+    python -m benchmarks.bench_text_cleaner [--texts 20000] [--repeat 5]
+"""
+import argparse
+import json
+import random
+import re
+import time
+
+from utils.text_cleaner import clean_text, extract_hashtags, preprocess_batch
+
+
+def legacy_clean_text(text: str, max_words: int = 200) -> str:
+    text = text.lower()
+    text = re.sub(r"http\S+", "http", text)
+    text = re.sub(r"@\w+", "@user", text)
+    text = re.sub(r"\s+", " ", text).strip()
+    text = " ".join(text.split()[:max_words])
+    return text
+
+def legacy_extract_hashtags(text: str) -> list[str]:
+    return re.findall(r"#\w+", text)
+
+
+WORDS = (
+    "the vote count is WRONG again and nobody cares about it honestly this is "
+    "great news for everyone in the city election results tonight totally fake"
+).split()
+
+
+def synthetic_text(rng: random.Random, words: int) -> str:
+    tokens = []
+    for _ in range(words):
+        roll = rng.random()
+        if roll < 0.03:
+            tokens.append(f"https://t.co/{rng.randrange(10**8):x}")
+        elif roll < 0.06:
+            tokens.append(f"@User{rng.randrange(1000)}")
+        elif roll < 0.09:
+            tokens.append(f"#Topic{rng.randrange(50)}")
+        else:
+            tokens.append(rng.choice(WORDS))
+        tokens.append(rng.choice((" ", " ", "  ", "\n", "\t ")))
+    return "".join(tokens)
+
+
+def run(label: str, texts: list, repeat: int) -> dict:
+    for text in texts:
+        assert clean_text(text) == legacy_clean_text(text), text
+        assert extract_hashtags(text) == legacy_extract_hashtags(text), text
+
+    def timed(fn) -> float:
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - started)
+        return best
+
+    legacy = timed(lambda: [(legacy_clean_text(text), legacy_extract_hashtags(text)) for text in texts])
+    current = timed(lambda: preprocess_batch(texts))
+    return {
+        "input": label,
+        "texts": len(texts),
+        "legacy_texts_per_second": round(len(texts) / legacy, 1),
+        "current_texts_per_second": round(len(texts) / current, 1),
+        "speedup": round(legacy / current, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    tweets = [synthetic_text(rng, rng.randint(8, 45)) for _ in range(args.texts)]
+    reddit = [synthetic_text(rng, rng.randint(300, 1500)) for _ in range(max(args.texts // 10, 1))]
+
+    print(json.dumps([run("tweet", tweets, args.repeat), run("reddit_long", reddit, args.repeat)], indent=2))
+
+
+if __name__ == "__main__":
+    main()
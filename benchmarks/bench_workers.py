@@ -0,0 +1,129 @@
+"""
+Throughput of the API as the number of uvicorn worker processes grows.
+
+For each --workers count, starts benchmarks.fake_inference and
+benchmarks.serve_app --workers N, drives the request/response scenarios of
+benchmarks.load_test at a fixed concurrency, and prints one JSON document with
+requests per second per worker count and the scaling efficiency
+rps(N) / (N x rps(1)):
+
+    python -m benchmarks.bench_workers --workers 1,2,4 --concurrency 64
+
+Scaling is bounded by the cores on the machine: keep the largest worker count
+plus the fake inference server's workers at or below the core count.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.load_test import LoadTest, wait_until_ready
+
+SCENARIOS = ("quick_analysis", "summary", "ranking")
+
+
+def run_level(args, workers: int) -> list:
+    inference_url = f"http://127.0.0.1:{args.inference_port}"
+    env = {
+        **os.environ,
+        "FAKE_INFERENCE_LATENCY_MS": str(args.inference_latency_ms),
+        "FAKE_INFERENCE_PER_TEXT_MS": "0",
+        "INFERENCE_API_URL": f"{inference_url}/infer",
+        "INFERENCE_BATCH_API_URL": f"{inference_url}/infer-batch",
+        "MONGO_ENSURE_INDEXES": "false",
+        # Every quick_analysis text is new, so the cache would only add work
+        "INFERENCE_CACHE_BACKEND": "none",
+        "EMBEDDED_JOB_WORKERS": "false",
+        "ADMISSION_ENABLED": "false",
+    }
+    serve_args = [
+        "--port", str(args.api_port),
+        "--workers", str(workers),
+        "--pending-sessions", "0",
+        "--done-sessions", str(args.done_sessions),
+        "--posts-per-session", str(args.posts_per_session),
+        "--seed", str(args.seed),
+    ]
+    if args.mongo_uri:
+        serve_args += ["--mongo-uri", args.mongo_uri]
+
+    processes = []
+    try:
+        inference = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "benchmarks.fake_inference:app", "--port", str(args.inference_port),
+             "--workers", str(args.inference_workers), "--log-level", "warning"],
+            env=env,
+        )
+        processes.append(inference)
+        api = subprocess.Popen([sys.executable, "-m", "benchmarks.serve_app", *serve_args], env=env)
+        processes.append(api)
+
+        wait_until_ready(f"{inference_url}/docs", inference, 30)
+        base_url = f"http://127.0.0.1:{args.api_port}"
+        wait_until_ready(f"{base_url}/metrics", api, 300)
+
+        load_args = argparse.Namespace(
+            scenarios=args.scenarios, concurrency=[args.concurrency], requests=args.requests,
+            jobs_per_level=0, pending_sessions=0, done_sessions=args.done_sessions,
+            ids_per_request=args.ids_per_request, poll_interval=0.05, timeout=args.timeout, seed=args.seed,
+        )
+        return asyncio.run(LoadTest(load_args, base_url, api.pid).run())
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=lambda value: [int(n) for n in value.split(",")], default=[1, 2, 4])
+    parser.add_argument("--scenarios", type=lambda value: value.split(","), default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per scenario and worker count")
+    parser.add_argument("--done-sessions", type=int, default=50)
+    parser.add_argument("--posts-per-session", type=int, default=200)
+    parser.add_argument("--ids-per-request", type=int, default=5)
+    parser.add_argument("--inference-latency-ms", type=float, default=5)
+    parser.add_argument("--inference-workers", type=int, default=1)
+    parser.add_argument("--mongo-uri", help="Local mongod shared by all workers instead of one stand-in per worker")
+    parser.add_argument("--api-port", type=int, default=8100)
+    parser.add_argument("--inference-port", type=int, default=5999)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Also write the JSON report here")
+    args = parser.parse_args()
+
+    throughput = {}
+    for workers in args.workers:
+        for row in run_level(args, workers):
+            throughput.setdefault(row["scenario"], {})[workers] = row
+            print(json.dumps({"workers": workers, **row}), file=sys.stderr)
+
+    base = min(args.workers)
+    results = []
+    for scenario, rows in throughput.items():
+        single = rows[base]["throughput_rps"] / base
+        for workers, row in sorted(rows.items()):
+            results.append({
+                "scenario": scenario,
+                "workers": workers,
+                "throughput_rps": row["throughput_rps"],
+                "p95_ms": row["p95_ms"],
+                "errors": row["errors"],
+                "scaling_efficiency": round(row["throughput_rps"] / (workers * single), 3) if single else None,
+            })
+
+    report = {"config": {key: value for key, value in vars(args).items() if key != "output"},
+              "cpu_count": os.cpu_count(), "results": results}
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as report_file:
+            report_file.write(output)
+
+
+if __name__ == "__main__":
+    main()
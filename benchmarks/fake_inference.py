@@ -0,0 +1,46 @@
+"""
+Stand-in for the inference server used by the load tests.
+
+Answers /infer and /infer-batch with fixed scores after a configurable delay:
+FAKE_INFERENCE_LATENCY_MS per call plus FAKE_INFERENCE_PER_TEXT_MS per text.
+FAKE_INFERENCE_BATCH=false makes /infer-batch return 404, like a server
+without a batch endpoint.
+
+    FAKE_INFERENCE_LATENCY_MS=20 uvicorn benchmarks.fake_inference:app --port 5999
+"""
+import asyncio
+import os
+import zlib
+from fastapi import FastAPI, HTTPException
+
+LATENCY_MS = float(os.getenv("FAKE_INFERENCE_LATENCY_MS", "20"))
+PER_TEXT_MS = float(os.getenv("FAKE_INFERENCE_PER_TEXT_MS", "0.5"))
+BATCH_ENABLED = os.getenv("FAKE_INFERENCE_BATCH", "true").lower() == "true"
+
+app = FastAPI()
+
+
+def score(text: str, model: str) -> dict:
+    # Deterministic per text so cached and fresh results agree
+    negative = (zlib.crc32(text.encode("utf-8")) % 1000) / 1000 * 0.8
+    positive = (1 - negative) * 0.7
+    return {
+        "model": model,
+        "text": text,
+        "scores": {"Negative": round(negative, 4), "Positive": round(positive, 4), "Neutral": round(1 - negative - positive, 4)},
+    }
+
+
+@app.post("/infer")
+async def infer(payload: dict):
+    await asyncio.sleep((LATENCY_MS + PER_TEXT_MS) / 1000)
+    return score(payload["text"], payload.get("model", ""))
+
+
+@app.post("/infer-batch")
+async def infer_batch(payload: dict):
+    if not BATCH_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    texts = payload["texts"]
+    await asyncio.sleep((LATENCY_MS + PER_TEXT_MS * len(texts)) / 1000)
+    return {"results": [score(text, payload.get("model", "")) for text in texts]}
@@ -0,0 +1,282 @@
+"""
+Load test for the API with local stand-ins for Mongo and the inference server.
+
+Starts benchmarks.fake_inference and benchmarks.serve_app as subprocesses, then
+drives each endpoint at every concurrency level with a closed loop of clients
+and prints one JSON document with p50/p95/p99 latency, throughput and the API
+process's peak RSS:
+
+  process_session  POST /process-session/{id}, then polls the job until done;
+                   latency is submit-to-done, throughput is posts per second
+  quick_analysis   POST /anlaysis-sentiment
+  summary          POST /session-sentiment-summary
+  ranking          POST /session-sentiment-ranking
+
+    python -m benchmarks.load_test --concurrency 1,8,32 --output results.json
+    python -m benchmarks.load_test --baseline results.json --tolerance 0.2
+
+With --baseline, exits 1 when any p95 or throughput is worse than the
+baseline by more than --tolerance.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+import jwt
+
+from benchmarks.bench_text_cleaner import synthetic_text
+from utils.auth import ALGORITHM, SECRET_KEY_DECODE
+
+SCENARIOS = ("process_session", "quick_analysis", "summary", "ranking")
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    # Nearest-rank percentile
+    index = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+def peak_rss_mb(pid: int) -> float | None:
+    # VmHWM is the process's high-water resident set size (Linux only)
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        return None
+    return None
+
+
+def summarize(scenario: str, concurrency: int, latencies: list, errors: int, elapsed: float, api_pid: int, posts: int = 0) -> dict:
+    latencies = sorted(latencies)
+    result = {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "peak_rss_mb": peak_rss_mb(api_pid),
+    }
+    if scenario == "process_session":
+        result["posts_per_second"] = round(posts / elapsed, 1) if elapsed else None
+    return result
+
+
+async def closed_loop(concurrency: int, total: int, request):
+    """
+    Runs `request(i)` for i in range(total) from `concurrency` clients.
+    Returns (latencies, errors, elapsed).
+    """
+    latencies, errors = [], 0
+    next_index = iter(range(total))
+
+    async def client():
+        nonlocal errors
+        for i in next_index:
+            started = time.perf_counter()
+            try:
+                await request(i)
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+class LoadTest:
+    def __init__(self, args, base_url: str, api_pid: int):
+        self.args = args
+        self.base_url = base_url
+        self.api_pid = api_pid
+        self.rng = random.Random(args.seed)
+        token = jwt.encode({"sub": "load-test", "exp": int(time.time()) + 86400}, SECRET_KEY_DECODE, algorithm=ALGORITHM)
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.pending_sessions = [f"bench-pending-{i:04d}" for i in range(args.pending_sessions)]
+        self.done_sessions = [f"bench-done-{i:04d}" for i in range(args.done_sessions)]
+        self.posts_done = 0
+
+    async def post(self, client: httpx.AsyncClient, path: str, **kwargs) -> dict:
+        response = await client.post(path, headers=self.headers, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    async def process_session(self, client: httpx.AsyncClient, session_id: str):
+        job = await self.post(client, f"/process-session/{session_id}")
+        while True:
+            response = await client.get(f"/process-session/jobs/{job['job_id']}", headers=self.headers)
+            response.raise_for_status()
+            report = response.json()
+            if report["status"] == "done":
+                self.posts_done += report["posts_processed"]
+                return
+            if report["status"] == "failed":
+                raise RuntimeError(report.get("error"))
+            await asyncio.sleep(self.args.poll_interval)
+
+    async def run_scenario(self, client: httpx.AsyncClient, scenario: str, concurrency: int) -> dict:
+        args = self.args
+        if scenario == "process_session":
+            sessions = [self.pending_sessions.pop() for _ in range(args.jobs_per_level)]
+            self.posts_done = 0
+            latencies, errors, elapsed = await closed_loop(concurrency, len(sessions), lambda i: self.process_session(client, sessions[i]))
+            return summarize(scenario, concurrency, latencies, errors, elapsed, self.api_pid, self.posts_done)
+
+        if scenario == "quick_analysis":
+            texts = [synthetic_text(self.rng, self.rng.randint(8, 45)) for _ in range(args.requests)]
+            request = lambda i: self.post(client, "/anlaysis-sentiment", json={"text": texts[i]})
+        else:
+            path = "/session-sentiment-summary" if scenario == "summary" else "/session-sentiment-ranking"
+            picks = [self.rng.sample(self.done_sessions, min(args.ids_per_request, len(self.done_sessions))) for _ in range(args.requests)]
+            request = lambda i: self.post(client, path, json={"session_ids": picks[i]})
+
+        latencies, errors, elapsed = await closed_loop(concurrency, args.requests, request)
+        return summarize(scenario, concurrency, latencies, errors, elapsed, self.api_pid)
+
+    async def run(self) -> list:
+        results = []
+        limits = httpx.Limits(max_connections=max(self.args.concurrency) * 2)
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=self.args.timeout, limits=limits) as client:
+            for scenario in self.args.scenarios:
+                for concurrency in self.args.concurrency:
+                    result = await self.run_scenario(client, scenario, concurrency)
+                    print(json.dumps(result), file=sys.stderr)
+                    results.append(result)
+        return results
+
+
+def wait_until_ready(url: str, process: subprocess.Popen, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode} before becoming ready")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+def regressions(results: list, baseline: list, tolerance: float) -> list:
+    previous = {(row["scenario"], row["concurrency"]): row for row in baseline}
+    found = []
+    for row in results:
+        base = previous.get((row["scenario"], row["concurrency"]))
+        if not base:
+            continue
+        if row["p95_ms"] and base["p95_ms"] and row["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            found.append(f"{row['scenario']}@{row['concurrency']}: p95 {base['p95_ms']}ms -> {row['p95_ms']}ms")
+        if row["throughput_rps"] and base["throughput_rps"] and row["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            found.append(f"{row['scenario']}@{row['concurrency']}: throughput {base['throughput_rps']} -> {row['throughput_rps']} rps")
+        if row["errors"] > base["errors"]:
+            found.append(f"{row['scenario']}@{row['concurrency']}: errors {base['errors']} -> {row['errors']}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", type=lambda value: value.split(","), default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=lambda value: [int(c) for c in value.split(",")], default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per level for the request/response endpoints")
+    parser.add_argument("--jobs-per-level", type=int, default=8, help="Sessions processed per level")
+    parser.add_argument("--posts-per-session", type=int, default=500)
+    parser.add_argument("--done-sessions", type=int, default=50, help="Pre-analyzed sessions for summary and ranking")
+    parser.add_argument("--ids-per-request", type=int, default=5)
+    parser.add_argument("--platform-mix", default="twitter=0.5,youtube=0.3,reddit=0.2")
+    parser.add_argument("--inference-latency-ms", type=float, default=20)
+    parser.add_argument("--inference-per-text-ms", type=float, default=0.5)
+    parser.add_argument("--no-batch-endpoint", action="store_true", help="Fake server answers /infer-batch with 404")
+    parser.add_argument("--mongo-uri", help="Local mongod to use instead of the in-memory stand-in")
+    parser.add_argument("--api-port", type=int, default=8100)
+    parser.add_argument("--inference-port", type=int, default=5999)
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Also write the JSON report here")
+    parser.add_argument("--baseline", help="Earlier --output report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+    args.pending_sessions = args.jobs_per_level * len(args.concurrency) if "process_session" in args.scenarios else 0
+
+    inference_url = f"http://127.0.0.1:{args.inference_port}"
+    env = {
+        **os.environ,
+        "FAKE_INFERENCE_LATENCY_MS": str(args.inference_latency_ms),
+        "FAKE_INFERENCE_PER_TEXT_MS": str(args.inference_per_text_ms),
+        "FAKE_INFERENCE_BATCH": "false" if args.no_batch_endpoint else "true",
+        "INFERENCE_API_URL": f"{inference_url}/infer",
+        "INFERENCE_BATCH_API_URL": f"{inference_url}/infer-batch",
+        "MONGO_ENSURE_INDEXES": "false",
+    }
+    env.setdefault("JOB_POLL_INTERVAL", "0.05")
+    env.setdefault("INFERENCE_CACHE_BACKEND", "none")
+    # One token drives every level; rate limits would cap the numbers being measured
+    env.setdefault("ADMISSION_ENABLED", "false")
+
+    serve_args = [
+        "--port", str(args.api_port),
+        "--pending-sessions", str(args.pending_sessions),
+        "--done-sessions", str(args.done_sessions),
+        "--posts-per-session", str(args.posts_per_session),
+        "--platform-mix", args.platform_mix,
+        "--seed", str(args.seed),
+    ]
+    if args.mongo_uri:
+        serve_args += ["--mongo-uri", args.mongo_uri]
+
+    processes = []
+    try:
+        inference = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "benchmarks.fake_inference:app", "--port", str(args.inference_port), "--log-level", "warning"],
+            env=env,
+        )
+        processes.append(inference)
+        api = subprocess.Popen([sys.executable, "-m", "benchmarks.serve_app", *serve_args], env=env)
+        processes.append(api)
+
+        wait_until_ready(f"{inference_url}/docs", inference, 30)
+        base_url = f"http://127.0.0.1:{args.api_port}"
+        wait_until_ready(f"{base_url}/metrics", api, 300)
+
+        results = asyncio.run(LoadTest(args, base_url, api.pid).run())
+        report = {
+            "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+            "results": results,
+            "peak_rss_mb": {"api": peak_rss_mb(api.pid), "fake_inference": peak_rss_mb(inference.pid)},
+        }
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as report_file:
+            report_file.write(output)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            found = regressions(results, json.load(baseline_file)["results"], args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Runs the API against a Mongo stand-in seeded with synthetic sessions.
+
+By default the stand-in is an in-memory mongomock database; --mongo-uri points
+it at a local mongod instead (a throwaway database is dropped and reseeded).
+Seeds two kinds of sessions:
+
+  bench-pending-NNNN  posts with status 1, for /process-session
+  bench-done-NNNN     analyzed posts with sentiment docs and aggregates, for
+                      /session-sentiment-summary and /session-sentiment-ranking
+
+    python -m benchmarks.serve_app --port 8100 --pending-sessions 20 --posts-per-session 500
+
+With --workers N the API runs as N uvicorn worker processes. Each one builds
+its own Mongo client in its lifespan; against mongomock each worker seeds its
+own identical copy, so /process-session jobs need --mongo-uri to be visible
+from every worker.
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+
+from benchmarks.bench_text_cleaner import synthetic_text
+
+PLATFORM_FIELDS = {"twitter": "text", "youtube": "metadata", "reddit": "content"}
+# Words per post, roughly: tweets are short, Reddit posts run long
+PLATFORM_WORDS = {"twitter": (8, 45), "youtube": (15, 120), "reddit": (60, 600)}
+
+
+def parse_platform_mix(value: str) -> dict:
+    mix = {}
+    for part in value.split(","):
+        platform, _, weight = part.partition("=")
+        if platform not in PLATFORM_FIELDS:
+            raise argparse.ArgumentTypeError(f"Unknown platform {platform!r}")
+        mix[platform] = float(weight or 1)
+    return mix
+
+
+def bind_database(database):
+    from plugin.db import use_database
+
+    use_database(database)
+
+
+def synthetic_post(rng: random.Random, session_id: str, platforms: list, weights: list, index: int) -> dict:
+    platform = rng.choices(platforms, weights)[0]
+    posted = datetime.datetime(2025, 1, 1) + datetime.timedelta(minutes=index * 7 % 43200)
+    return {
+        "sessionId": session_id,
+        "status": 1,
+        "platform": platform,
+        PLATFORM_FIELDS[platform]: synthetic_text(rng, rng.randint(*PLATFORM_WORDS[platform])),
+        "keyword": f"keyword {session_id}",
+        "datetime": posted.isoformat(),
+    }
+
+
+def seed(database, pending_sessions: int, done_sessions: int, posts_per_session: int, platform_mix: dict, model: str, seed_value: int = 7):
+    from benchmarks.fake_inference import score
+    from utils.session_aggregates import rebuild
+    from utils.text_cleaner import clean_text
+
+    rng = random.Random(seed_value)
+    platforms, weights = list(platform_mix), list(platform_mix.values())
+
+    for i in range(pending_sessions):
+        session_id = f"bench-pending-{i:04d}"
+        database["scrappedPosts"].insert_many(
+            [synthetic_post(rng, session_id, platforms, weights, n) for n in range(posts_per_session)]
+        )
+
+    for i in range(done_sessions):
+        session_id = f"bench-done-{i:04d}"
+        posts = [{**synthetic_post(rng, session_id, platforms, weights, n), "status": 3} for n in range(posts_per_session)]
+        database["scrappedPosts"].insert_many(posts)
+        database["socialMediaSentiment"].insert_many([
+            {
+                "raw_id": post["_id"],
+                "sessionId": session_id,
+                "platform": post["platform"],
+                "text": post[PLATFORM_FIELDS[post["platform"]]],
+                "hashtags": [],
+                "analysis": score(clean_text(post[PLATFORM_FIELDS[post["platform"]]]), model),
+                "datetime": post["datetime"],
+                "status": 3,
+            }
+            for post in posts
+        ])
+    if done_sessions:
+        rebuild([f"bench-done-{i:04d}" for i in range(done_sessions)], model)
+
+
+def prepare_database(args, seed_data: bool = True):
+    if args.mongo_uri:
+        from pymongo import MongoClient
+        database = MongoClient(args.mongo_uri)[args.mongo_db]
+    else:
+        import mongomock
+        database = mongomock.MongoClient()[args.mongo_db]
+    bind_database(database)
+
+    if seed_data:
+        from plugin.db import db, ensure_indexes
+        from plugin.inference_client import DEFAULT_MODEL_NAME
+
+        if args.mongo_uri:
+            database.client.drop_database(args.mongo_db)
+        ensure_indexes(db)
+        seed(db, args.pending_sessions, args.done_sessions, args.posts_per_session, args.platform_mix, DEFAULT_MODEL_NAME, args.seed)
+
+
+def create_app():
+    """
+    App factory for worker processes started with --workers; the options come
+    from the parent through BENCH_SERVE_ARGS.
+    """
+    args = argparse.Namespace(**json.loads(os.environ["BENCH_SERVE_ARGS"]))
+    # A real mongod was seeded once by the parent; every mongomock copy needs its own data
+    prepare_database(args, seed_data=not args.mongo_uri)
+
+    from app import app
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--mongo-uri", help="Use this mongod instead of an in-memory stand-in")
+    parser.add_argument("--mongo-db", default="sentiment_bench")
+    parser.add_argument("--pending-sessions", type=int, default=20)
+    parser.add_argument("--done-sessions", type=int, default=50)
+    parser.add_argument("--posts-per-session", type=int, default=500)
+    parser.add_argument("--platform-mix", type=parse_platform_mix, default=parse_platform_mix("twitter=0.5,youtube=0.3,reddit=0.2"))
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    if args.workers > 1:
+        if args.mongo_uri:
+            prepare_database(args)
+        os.environ["BENCH_SERVE_ARGS"] = json.dumps(vars(args))
+        uvicorn.run("benchmarks.serve_app:create_app", factory=True, host=args.host, port=args.port,
+                    workers=args.workers, log_level="warning")
+        return
+
+    prepare_database(args)
+    from app import app
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,9 +14,12 @@
 # scrapped_data = db["scrappedPosts"]
 # sentiment_data = db["socialMediaSentiment"]
 
+import json
 import os
 import urllib.parse
-from pymongo import MongoClient
+from pymongo import MongoClient, IndexModel, ASCENDING
+from pymongo.errors import OperationFailure
+from utils.log import logging
 
 MONGO_USER = os.getenv("MONGO_USER", "user1")
 MONGO_PASS = urllib.parse.quote_plus(os.getenv("MONGO_PASS", "cdac012654"))
@@ -28,8 +31,239 @@ mongo_uri = (
     f"?authSource={MONGO_DB}&authMechanism=SCRAM-SHA-256"
 )
 
-client = MongoClient(mongo_uri)
+# Connection pool per process: every API worker and job worker process holds its own
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
 
-db = client[MONGO_DB]
+_client: MongoClient | None = None
+_client_pid: int | None = None
+_database = None
+_override_database = None
+
+
+def get_client() -> MongoClient:
+    """
+    Returns this process's MongoClient, creating it on first use. A client
+    must not be shared across fork(), so a forked worker builds its own
+    instead of inheriting the parent's sockets and monitor threads.
+    """
+    global _client, _client_pid, _database
+    if _client is None or _client_pid != os.getpid():
+        _client = MongoClient(mongo_uri, maxPoolSize=MONGO_MAX_POOL_SIZE, minPoolSize=MONGO_MIN_POOL_SIZE)
+        _client_pid = os.getpid()
+        _database = _client[MONGO_DB]
+    return _client
+
+def get_database():
+    if _override_database is not None:
+        return _override_database
+    get_client()
+    return _database
+
+def use_database(database):
+    """
+    Points every collection below at `database` instead of MONGO_DB, e.g. an
+    in-memory stand-in for benchmarks.
+    """
+    global _override_database
+    _override_database = database
+
+def close_client():
+    global _client, _client_pid, _database
+    if _client is not None and _client_pid == os.getpid():
+        _client.close()
+    _client, _client_pid, _database = None, None, None
+
+
+class LazyCollection:
+    """
+    Module-level handle on a collection of this process's database. Importing
+    it connects nothing; the real Collection is looked up on first use and
+    again whenever the process (or the database from use_database) changes.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._database = None
+        self._collection = None
+
+    def __getattr__(self, attribute):
+        if attribute.startswith("__"):
+            raise AttributeError(attribute)
+        database = get_database()
+        if database is not self._database:
+            self._database, self._collection = database, database[self.name]
+        return getattr(self._collection, attribute)
+
+
+class LazyDatabase:
+    def __getitem__(self, name: str) -> LazyCollection:
+        return LazyCollection(name)
+
+    def __getattr__(self, attribute):
+        if attribute.startswith("__"):
+            raise AttributeError(attribute)
+        return getattr(get_database(), attribute)
+
+
+db = LazyDatabase()
 scrapped_data = db["scrappedPosts"]
 sentiment_data = db["socialMediaSentiment"]
+session_aggregates = db["sessionAggregates"]
+session_jobs = db["sessionJobs"]
+job_batch_slots = db["jobBatchSlots"]
+session_trends = db["sessionTrends"]
+hashtag_sketches = db["hashtagSketches"]
+hashtag_rollups = db["hashtagRollups"]
+
+# Bulk read/write tuning for session processing
+MONGO_READ_BATCH_SIZE = int(os.getenv("MONGO_READ_BATCH_SIZE", "500"))
+MONGO_WRITE_BATCH_SIZE = int(os.getenv("MONGO_WRITE_BATCH_SIZE", "500"))
+MONGO_FLUSH_INTERVAL = float(os.getenv("MONGO_FLUSH_INTERVAL", "2"))
+MONGO_ENSURE_INDEXES = os.getenv("MONGO_ENSURE_INDEXES", "true").lower() == "true"
+
+# Time buckets kept in sessionTrends for every stored result
+TREND_GRANULARITIES = [name.strip() for name in os.getenv("TREND_GRANULARITIES", "minute,hour,day").split(",") if name.strip()]
+
+# Counters per hashtag sketch row; memory and row size stay bounded by it on viral sessions
+HASHTAG_SKETCH_SIZE = int(os.getenv("HASHTAG_SKETCH_SIZE", "1000"))
+# Seconds between merges of every session's sketch into the all-sessions rollup read by /session-hashtags/top
+HASHTAG_ROLLUP_INTERVAL = float(os.getenv("HASHTAG_ROLLUP_INTERVAL", "60"))
+
+# Columnar exports of socialMediaSentiment (utils.sentiment_export): rows per written chunk, and how old
+# a result must be before it is exported, so results still being inserted by other writers are not skipped
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "50000"))
+EXPORT_SETTLE_SECONDS = float(os.getenv("EXPORT_SETTLE_SECONDS", "60"))
+
+# Extra platforms, or overrides of the built-in ones, mapped to the post fields holding their text as JSON,
+# e.g. {"telegram": ["message"], "twitter": ["text", "quoted_status.text"]}
+PLATFORM_TEXT_FIELDS = json.loads(os.getenv("PLATFORM_TEXT_FIELDS", "{}"))
+
+# Background session jobs
+# Jobs run side by side per process; they take turns for JOB_BATCH_CONCURRENCY batch slots
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "8"))
+JOB_BATCH_CONCURRENCY = int(os.getenv("JOB_BATCH_CONCURRENCY", "2"))
+# Batch slots shared by every worker process through jobBatchSlots leases; 0 leaves only the per-process cap
+JOB_GLOBAL_BATCH_CONCURRENCY = int(os.getenv("JOB_GLOBAL_BATCH_CONCURRENCY", "8"))
+# Batches a job runs before it goes to the back of the queue, so every queued session makes progress
+JOB_BATCHES_PER_TURN = int(os.getenv("JOB_BATCHES_PER_TURN", "20"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+# Claimed posts / running jobs untouched for this long are handed back to the queue
+JOB_CLAIM_TIMEOUT = float(os.getenv("JOB_CLAIM_TIMEOUT", "900"))
+# Seconds between checks for such abandoned jobs and posts in each worker process
+JOB_RECOVER_INTERVAL = float(os.getenv("JOB_RECOVER_INTERVAL", "60"))
+# Posts one /process-session request may process; the rest stay pending for a later request
+MAX_POSTS_PER_JOB = int(os.getenv("MAX_POSTS_PER_JOB", "100000"))
+# Seconds running jobs get to finish on shutdown before they are handed back to the queue
+JOB_DRAIN_TIMEOUT = float(os.getenv("JOB_DRAIN_TIMEOUT", "25"))
+# Run workers inside the API process; set to false when using `python -m utils.job_worker`
+EMBEDDED_JOB_WORKERS = os.getenv("EMBEDDED_JOB_WORKERS", "true").lower() == "true"
+
+# Indexes backing the hot queries, keyed by collection name
+INDEX_SPECS = {
+    "scrappedPosts": [
+        # Pending-post pages: {"sessionId", "status": 1} sorted by _id
+        IndexModel([("sessionId", ASCENDING), ("status", ASCENDING), ("_id", ASCENDING)], name="sessionId_status_id"),
+        # Smaller index holding only pending work
+        IndexModel(
+            [("sessionId", ASCENDING), ("_id", ASCENDING)],
+            name="pending_sessionId_id",
+            partialFilterExpression={"status": 1},
+        ),
+        # Keyword lookup per session ($sort + $group/$first)
+        IndexModel([("sessionId", ASCENDING), ("keyword", ASCENDING)], name="sessionId_keyword"),
+        # Stale job claims (status 2) waiting to be released
+        IndexModel(
+            [("claimedAt", ASCENDING)],
+            name="claimed_claimedAt",
+            partialFilterExpression={"status": 2},
+        ),
+    ],
+    "socialMediaSentiment": [
+        IndexModel([("sessionId", ASCENDING), ("analysis.model", ASCENDING)], name="sessionId_model"),
+        # One result per post and model, so a post scored twice (failed flush, reclaimed claim) is stored once
+        IndexModel([("raw_id", ASCENDING), ("analysis.model", ASCENDING)], name="raw_id_model", unique=True),
+    ],
+    "sessionJobs": [
+        # At most one queued/running job per session; finished jobs drop the field
+        IndexModel([("activeSession", ASCENDING)], name="activeSession", unique=True, sparse=True),
+        # Claims take the job that has waited longest since it was (re)queued
+        IndexModel([("state", ASCENDING), ("queued_at", ASCENDING)], name="state_queued_at"),
+        # Jobs submitted together through /process-sessions
+        IndexModel([("batchIds", ASCENDING)], name="batchIds", sparse=True),
+    ],
+    "sessionAggregates": [
+        IndexModel([("sessionId", ASCENDING), ("model", ASCENDING)], name="sessionId_model", unique=True),
+    ],
+    "sessionTrends": [
+        # One row per bucket and platform; trend reads are a range scan on bucket
+        IndexModel(
+            [("sessionId", ASCENDING), ("model", ASCENDING), ("granularity", ASCENDING), ("bucket", ASCENDING), ("platform", ASCENDING)],
+            name="sessionId_model_granularity_bucket_platform",
+            unique=True,
+        ),
+    ],
+    "hashtagSketches": [
+        IndexModel([("sessionId", ASCENDING), ("model", ASCENDING)], name="sessionId_model", unique=True),
+        # Rollups merge every row of the model, after checking for rows updated since the last one
+        IndexModel([("model", ASCENDING), ("updated_at", ASCENDING)], name="model_updated_at"),
+    ],
+}
+
+# Mongo error codes ensure_indexes tells apart
+DUPLICATE_KEY_ERROR = 11000
+# IndexOptionsConflict, IndexKeySpecsConflict: the same key pattern exists under another name or options
+INDEX_CONFLICT_ERRORS = {85, 86}
+# How to clear the duplicates that keep a unique index from being built
+DUPLICATE_KEY_FIXES = {
+    "socialMediaSentiment.raw_id_model": "python -m utils.sentiment_dedupe",
+}
+
+def _index_signature(key, partial_filter) -> tuple:
+    return tuple((field, int(direction)) for field, direction in key), str(dict(partial_filter) if partial_filter else None)
+
+def verify_indexes(database=db) -> list:
+    """
+    Returns a list of declared indexes whose key pattern is missing on the server.
+    """
+    missing = []
+    for collection_name, models in INDEX_SPECS.items():
+        existing = database[collection_name].index_information()
+        existing_keys = {
+            _index_signature(info["key"], info.get("partialFilterExpression"))
+            for info in existing.values()
+        }
+        for model in models:
+            spec = model.document
+            wanted = _index_signature(spec["key"].items(), spec.get("partialFilterExpression"))
+            if wanted not in existing_keys:
+                missing.append(f"{collection_name}.{spec['name']}")
+    return missing
+
+def ensure_indexes(database=db) -> list:
+    """
+    Creates any declared index that does not exist yet, then verifies them all.
+    Returns the indexes that are still missing afterwards. Indexes are created
+    one at a time, so one that cannot be built does not hold back the rest.
+    """
+    for collection_name, models in INDEX_SPECS.items():
+        for model in models:
+            name = f"{collection_name}.{model.document['name']}"
+            try:
+                database[collection_name].create_indexes([model])
+            except OperationFailure as e:
+                if e.code == DUPLICATE_KEY_ERROR or "E11000" in str(e):
+                    fix = DUPLICATE_KEY_FIXES.get(name, f"remove the duplicate keys from {collection_name}")
+                    logging.error(f"Unique index {name} cannot be built while {collection_name} holds duplicates: {e}. "
+                                  f"Run `{fix}`, then restart to build it.")
+                elif e.code in INDEX_CONFLICT_ERRORS:
+                    logging.warning(f"Index {name} not created; an index on the same keys exists under another name or options: {e}")
+                else:
+                    logging.error(f"Could not create index {name}: {e}")
+
+    missing = verify_indexes(database)
+    if missing:
+        logging.error(f"Missing Mongo indexes: {', '.join(missing)}")
+    else:
+        logging.info("✅ Mongo indexes verified")
+    return missing
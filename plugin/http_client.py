@@ -0,0 +1,48 @@
+import os
+import httpx
+from plugin.inference_client import (
+    INFERENCE_CONNECT_TIMEOUT,
+    INFERENCE_READ_TIMEOUT,
+    INFERENCE_POOL_TIMEOUT,
+    INFERENCE_MAX_CONNECTIONS,
+    INFERENCE_MAX_KEEPALIVE,
+)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+_client: httpx.AsyncClient | None = None
+_client_pid: int | None = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Returns the process-wide AsyncClient, creating it on first use.
+    All inference traffic goes to one host, so the pool limits act per host.
+    A forked worker process gets its own client and connection pool.
+    """
+    global _client, _client_pid
+    if _client is None or _client.is_closed or _client_pid != os.getpid():
+        _client_pid = os.getpid()
+        _client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            timeout=httpx.Timeout(
+                INFERENCE_READ_TIMEOUT,
+                connect=INFERENCE_CONNECT_TIMEOUT,
+                pool=INFERENCE_POOL_TIMEOUT,
+            ),
+            limits=httpx.Limits(
+                max_connections=INFERENCE_MAX_CONNECTIONS,
+                max_keepalive_connections=INFERENCE_MAX_KEEPALIVE,
+            ),
+        )
+    return _client
+
+async def close_http_client():
+    global _client
+    if _client is not None and _client_pid == os.getpid():
+        await _client.aclose()
+    _client = None
@@ -1,3 +1,68 @@
+import json
+import os
+
 # Inference API URL
-INFERENCE_API_URL = "http://fastapi_inference:5000/infer"
-DEFAULT_MODEL_NAME = "sentiment-v3"
\ No newline at end of file
+INFERENCE_API_URL = os.getenv("INFERENCE_API_URL", "http://fastapi_inference:5000/infer")
+INFERENCE_BATCH_API_URL = os.getenv("INFERENCE_BATCH_API_URL", "http://fastapi_inference:5000/infer-batch")
+DEFAULT_MODEL_NAME = "sentiment-v3"
+
+# Backends: "remote" calls INFERENCE_API_URL, "local" scores in a CPU process pool.
+# INFERENCE_MODEL_BACKENDS maps model names to a backend as JSON, e.g. {"sentiment-v3": "local"}
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "remote").lower()
+INFERENCE_MODEL_BACKENDS = json.loads(os.getenv("INFERENCE_MODEL_BACKENDS", "{}"))
+# Linear model weights as JSON (see utils/local_model.py); the built-in lexicon when empty
+LOCAL_MODEL_PATH = os.getenv("LOCAL_MODEL_PATH", "")
+# Model name on local results, whatever model was requested: they are stored, aggregated
+# and cached under it, never mixed with the remote model's results
+LOCAL_MODEL_NAME = os.getenv("LOCAL_MODEL_NAME", "local-lexicon")
+# Scorer processes; 0 scores in the API process's thread pool instead
+LOCAL_MODEL_WORKERS = int(os.getenv("LOCAL_MODEL_WORKERS", "2"))
+
+# Batching
+INFERENCE_BATCH_SIZE = int(os.getenv("INFERENCE_BATCH_SIZE", "64"))
+MICRO_BATCH_MAX_SIZE = int(os.getenv("MICRO_BATCH_MAX_SIZE", "32"))
+MICRO_BATCH_WINDOW_MS = float(os.getenv("MICRO_BATCH_WINDOW_MS", "10"))
+
+# HTTP transport (seconds / connection counts)
+INFERENCE_CONNECT_TIMEOUT = float(os.getenv("INFERENCE_CONNECT_TIMEOUT", "5"))
+INFERENCE_READ_TIMEOUT = float(os.getenv("INFERENCE_READ_TIMEOUT", "60"))
+INFERENCE_POOL_TIMEOUT = float(os.getenv("INFERENCE_POOL_TIMEOUT", "30"))
+INFERENCE_MAX_CONNECTIONS = int(os.getenv("INFERENCE_MAX_CONNECTIONS", "32"))
+INFERENCE_MAX_KEEPALIVE = int(os.getenv("INFERENCE_MAX_KEEPALIVE", "16"))
+INFERENCE_MAX_CONCURRENCY = int(os.getenv("INFERENCE_MAX_CONCURRENCY", "16"))
+
+# Result cache keyed by (backend, model, cleaned text)
+INFERENCE_CACHE_SIZE = int(os.getenv("INFERENCE_CACHE_SIZE", "50000"))
+INFERENCE_CACHE_TTL = float(os.getenv("INFERENCE_CACHE_TTL", "86400"))
+# "none", "sqlite" or "mongo"
+INFERENCE_CACHE_BACKEND = os.getenv("INFERENCE_CACHE_BACKEND", "none").lower()
+INFERENCE_CACHE_SQLITE_PATH = os.getenv("INFERENCE_CACHE_SQLITE_PATH", "inference_cache.sqlite3")
+# Seconds between deletes of expired SQLite entries; reads skip expired entries in between
+INFERENCE_CACHE_PRUNE_INTERVAL = float(os.getenv("INFERENCE_CACHE_PRUNE_INTERVAL", "300"))
+
+# Retries for timeouts, connection errors and 429/502/503/504 (seconds)
+INFERENCE_RETRIES = int(os.getenv("INFERENCE_RETRIES", "3"))
+INFERENCE_RETRY_BASE_DELAY = float(os.getenv("INFERENCE_RETRY_BASE_DELAY", "0.2"))
+INFERENCE_RETRY_MAX_DELAY = float(os.getenv("INFERENCE_RETRY_MAX_DELAY", "5"))
+# Circuit breaker: consecutive failed calls before it opens, seconds before a probe call
+INFERENCE_BREAKER_THRESHOLD = int(os.getenv("INFERENCE_BREAKER_THRESHOLD", "5"))
+INFERENCE_BREAKER_RESET = float(os.getenv("INFERENCE_BREAKER_RESET", "30"))
+# Adaptive concurrency: in-flight calls move between MIN and INFERENCE_MAX_CONCURRENCY,
+# halving when latency exceeds TOLERANCE x the fastest recent latency
+INFERENCE_MIN_CONCURRENCY = int(os.getenv("INFERENCE_MIN_CONCURRENCY", "1"))
+INFERENCE_LATENCY_TOLERANCE = float(os.getenv("INFERENCE_LATENCY_TOLERANCE", "2.0"))
+
+# Bulk quick analysis: texts per streamed chunk, chunks scored at the same time per request
+BULK_STREAM_CHUNK_SIZE = int(os.getenv("BULK_STREAM_CHUNK_SIZE", str(INFERENCE_BATCH_SIZE)))
+BULK_STREAM_INFLIGHT = int(os.getenv("BULK_STREAM_INFLIGHT", "4"))
+# NDJSON request bodies are buffered in memory up to this many bytes, then on disk
+BULK_STREAM_SPOOL_SIZE = int(os.getenv("BULK_STREAM_SPOOL_SIZE", str(1024 * 1024)))
+
+# Near-duplicate collapsing in session processing: one inference call per cluster of similar posts
+NEAR_DUP_ENABLED = os.getenv("NEAR_DUP_ENABLED", "true").lower() == "true"
+# Estimated Jaccard similarity of word bigrams needed to join a cluster
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.8"))
+# MinHash signature length, rounded up to a multiple of 16
+NEAR_DUP_NUM_PERM = int(os.getenv("NEAR_DUP_NUM_PERM", "64"))
+# Clusters remembered per session run; the least recently matched are dropped first
+NEAR_DUP_MAX_CLUSTERS = int(os.getenv("NEAR_DUP_MAX_CLUSTERS", "10000"))
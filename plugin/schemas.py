@@ -1,12 +1,33 @@
-from pydantic import BaseModel
-from typing import List
+import datetime
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+from plugin.db import HASHTAG_SKETCH_SIZE
+from plugin.server import MAX_SESSION_IDS
 from plugin.inference_client import DEFAULT_MODEL_NAME
 
 # Session Details model
 class SessionRequest(BaseModel):
-    session_ids: List[str]
+    session_ids: List[str] = Field(max_length=MAX_SESSION_IDS)
 
 # Calling Inference API for model
 class TextInput(BaseModel):
     text: str
-    model: str = DEFAULT_MODEL_NAME
\ No newline at end of file
+    model: str = DEFAULT_MODEL_NAME
+
+# Bulk quick analysis: one model for the whole list
+class BulkTextInput(BaseModel):
+    texts: List[str]
+    model: str = DEFAULT_MODEL_NAME
+
+# Sentiment over time for dashboards; start/end bound the buckets, platforms filters them
+class TrendRequest(BaseModel):
+    session_ids: List[str] = Field(max_length=MAX_SESSION_IDS)
+    granularity: Literal["minute", "hour", "day"] = "hour"
+    start: Optional[datetime.datetime] = None
+    end: Optional[datetime.datetime] = None
+    platforms: Optional[List[str]] = None
+
+# Top hashtags over these sessions, or over every session when the list is empty
+class HashtagRequest(BaseModel):
+    session_ids: List[str] = Field([], max_length=MAX_SESSION_IDS)
+    k: int = Field(20, ge=1, le=HASHTAG_SKETCH_SIZE)
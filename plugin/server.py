@@ -0,0 +1,36 @@
+import json
+import os
+
+# `python app.py` serving options (the Docker image starts the API this way)
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+# Worker processes; each builds its own Mongo and HTTP clients and runs its own session job workers
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+# Seconds open requests get to finish on shutdown; session jobs then get JOB_DRAIN_TIMEOUT
+API_GRACEFUL_SHUTDOWN = float(os.getenv("API_GRACEFUL_SHUTDOWN", "30"))
+
+# Admission control (utils/admission.py), per route: [requests per second per token subject, burst,
+# requests in progress per worker process]. ADMISSION_LIMITS overrides routes as JSON, e.g. {"ranking": [2, 5, 8]}
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+DEFAULT_ADMISSION_LIMITS = {
+    "quick_analysis": [50, 100, 512],
+    "bulk_analysis": [1, 4, 4],
+    "process_session": [1, 10, 8],
+    "job_status": [20, 40, 64],
+    "summary": [5, 20, 16],
+    "ranking": [5, 20, 16],
+    "trend": [5, 20, 16],
+    "hashtags": [5, 20, 16],
+}
+ADMISSION_LIMITS = {**DEFAULT_ADMISSION_LIMITS, **json.loads(os.getenv("ADMISSION_LIMITS", "{}"))}
+# Share rate limit buckets between worker processes and replicas; per process when empty
+ADMISSION_REDIS_URL = os.getenv("ADMISSION_REDIS_URL", "")
+# Subjects tracked by the in-process buckets; the least recently seen are dropped first
+ADMISSION_MAX_SUBJECTS = int(os.getenv("ADMISSION_MAX_SUBJECTS", "100000"))
+# Sessions accepted in one summary/ranking/trend/hashtag/process-sessions request
+MAX_SESSION_IDS = int(os.getenv("MAX_SESSION_IDS", "100"))
+
+# Summary/ranking stats cached per process (utils/report_cache.py); entries are checked against
+# sessionAggregates versions on every request, the TTL only bounds how long unused entries stay
+REPORT_CACHE_SIZE = int(os.getenv("REPORT_CACHE_SIZE", "1024"))
+REPORT_CACHE_TTL = float(os.getenv("REPORT_CACHE_TTL", "3600"))
@@ -1,61 +1,91 @@
-from fastapi import APIRouter, HTTPException, Header
-from plugin.db import scrapped_data, sentiment_data
-from utils.inference_helpers import analyze_sentiment_remote, extract_text_by_platform
-from utils.log import logging
-from utils.auth import authenticate_token
-from utils.text_cleaner import clean_text, extract_hashtags
-
-detailed_analysis_router = APIRouter(tags=["Detailed Analysis"])
-
-@detailed_analysis_router.post("/process-session/{session_id}")
-def process_all_in_session(session_id: str, authorization: str = Header(..., description="Bearer token or raw token")):
-
-    if authorization.lower().startswith("bearer "):
-        token = authorization.split(" ", 1)[1]
-    else:
-        token = authorization
-    
-    # 🔐 Validate the token
-    authenticate_token(token)
-    
-    unprocessed = list(scrapped_data.find({"sessionId": session_id, "status": 1}))
-
-    if not unprocessed:
+import uuid
+from fastapi import APIRouter, HTTPException, Depends
+from starlette.concurrency import run_in_threadpool
+from plugin.schemas import SessionRequest
+from utils.admission import admit
+from utils.auth import require_token
+from utils.job_queue import job_queue, job_report, JOB_DONE, JOB_FAILED
+
+detailed_analysis_router = APIRouter(tags=["Detailed Analysis"], dependencies=[Depends(require_token)])
+
+@detailed_analysis_router.post("/process-session/{session_id}", status_code=202, dependencies=[admit("process_session")])
+async def process_all_in_session(session_id: str):
+
+    # Queue the session; workers pick it up and report progress on the job
+    job, created = await run_in_threadpool(job_queue.submit, session_id)
+
+    if job is None:
         raise HTTPException(status_code=404, detail="No unprocessed posts found for this session.")
 
-    processed_count = 0
-    for doc in unprocessed:
-        try:
-            text = extract_text_by_platform(doc)
-            if not text:
-                logging.warning(f"No valid text found in post {doc['_id']}. Skipping.")
-                continue
-
-            hashtags = extract_hashtags(text)
-            cleaned_text = clean_text(text) 
-
-            analysis = analyze_sentiment_remote(cleaned_text)
-
-            sentiment_data.insert_one({
-                "raw_id": doc["_id"],
-                "sessionId": session_id,
-                "platform": doc.get("platform"),
-                "text": text,
-                "hashtags": hashtags,
-                "analysis": analysis,
-                "datetime": doc.get("datetime"),
-                "status": 3
-            })
-
-            scrapped_data.update_one({"_id": doc["_id"]}, {"$set": {"status": 3}})
-            processed_count += 1
-
-        except Exception as e:
-            logging.error(f"Error processing post {doc['_id']}: {str(e)}")
-            scrapped_data.update_one({"_id": doc["_id"]}, {"$set": {"status": 4}})
+    message = f"Session {session_id} queued." if created else f"Session {session_id} is already {job['state']}."
+    if job.get("max_posts"):
+        message += f" Only its first {job['max_posts']} pending posts are processed; submit it again for the rest."
+
+    return {
+        "message": message,
+        "job_id": job["_id"],
+        "status": job["state"],
+        "total_posts": job.get("total_posts", 0)
+    }
+
+@detailed_analysis_router.get("/process-session/jobs/{job_id}", dependencies=[admit("job_status")])
+async def session_job_status(job_id: str):
+
+    job = await run_in_threadpool(job_queue.get, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found.")
+
+    return job_report(job)
+
+@detailed_analysis_router.post("/process-sessions", status_code=202, dependencies=[admit("process_session")])
+async def process_sessions(request: SessionRequest):
+
+    if not request.session_ids:
+        raise HTTPException(status_code=400, detail="No session ids given.")
+
+    # One job per session; running jobs share the workers' batch budget round-robin
+    batch_id = uuid.uuid4().hex
+    submitted = await run_in_threadpool(job_queue.submit_many, request.session_ids, batch_id)
+
+    sessions = []
+    for session_id, (job, created) in submitted.items():
+        if job is None:
+            sessions.append({"session_id": session_id, "job_id": None, "status": "no_pending_posts", "total_posts": 0})
+            continue
+        sessions.append({
+            "session_id": session_id,
+            "job_id": job["_id"],
+            "status": job["state"],
+            "total_posts": job.get("total_posts", 0),
+            "queued": created
+        })
+
+    queued = sum(1 for session in sessions if session.get("queued"))
+    skipped = sum(1 for session in sessions if session["job_id"] is None)
+    return {
+        "message": f"{queued} sessions queued, {len(sessions) - queued - skipped} already active, {skipped} with no unprocessed posts.",
+        "batch_id": batch_id,
+        "sessions": sessions
+    }
+
+@detailed_analysis_router.get("/process-sessions/batches/{batch_id}", dependencies=[admit("job_status")])
+async def session_batch_status(batch_id: str):
+
+    jobs = await run_in_threadpool(job_queue.batch_jobs, batch_id)
+    if not jobs:
+        raise HTTPException(status_code=404, detail="Batch not found.")
+
+    reports = [job_report(job) for job in jobs]
+    states = {}
+    for report in reports:
+        states[report["status"]] = states.get(report["status"], 0) + 1
 
     return {
-        "message": f"Session {session_id} processed.",
-        "posts_processed": processed_count,
-        "total_attempted": len(unprocessed)
-    }
\ No newline at end of file
+        "batch_id": batch_id,
+        "finished": all(report["status"] in (JOB_DONE, JOB_FAILED) for report in reports),
+        "jobs_by_status": states,
+        "total_posts": sum(report["total_posts"] for report in reports),
+        "posts_processed": sum(report["posts_processed"] for report in reports),
+        "posts_failed": sum(report["posts_failed"] for report in reports),
+        "sessions": reports
+    }
@@ -0,0 +1,11 @@
+from fastapi import APIRouter, Response
+from utils.metrics import render_metrics
+
+metrics_router = APIRouter(tags=["Metrics"])
+
+@metrics_router.get("/metrics", include_in_schema=False)
+async def metrics():
+
+    # Unauthenticated so a Prometheus scraper can reach it; expose it on an internal network only
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
@@ -1,23 +1,59 @@
-from fastapi import APIRouter, HTTPException, Header
-from utils.inference_helpers import analyze_sentiment_remote
-from plugin.schemas import TextInput
-from utils.auth import authenticate_token
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from utils.micro_batcher import micro_batcher
+from plugin.schemas import TextInput, BulkTextInput
+from utils.admission import admit
+from utils.auth import require_token
+from utils.bulk_analysis import DuplexStreamingResponse, rows_from_ndjson, rows_from_texts, stream_results
 
-quick_analysis_router = APIRouter(tags=["Quick Analysis"])
+quick_analysis_router = APIRouter(tags=["Quick Analysis"], dependencies=[Depends(require_token)])
 
-@quick_analysis_router.post("/anlaysis-sentiment")
-def analyze_text_endpoint(payload: TextInput, authorization: str = Header(..., description="Bearer token or raw token")):
+@quick_analysis_router.post("/anlaysis-sentiment", dependencies=[admit("quick_analysis")])
+async def analyze_text_endpoint(payload: TextInput):
 
-    # Handle both "Bearer <token>" and plain "<token>"
-    if authorization.lower().startswith("bearer "):
-        token = authorization.split(" ", 1)[1]
-    else:
-        token = authorization
-    # 🔐 Validate the token
-    authenticate_token(token)
-    
     if not payload.text.strip():
         raise HTTPException(status_code=400, detail="Input text is empty.")
     
-    result = analyze_sentiment_remote(payload.text, payload.model)
-    return result
\ No newline at end of file
+    # Concurrent callers inside the batching window share one inference call
+    result = await micro_batcher.analyze(payload.text, payload.model)
+    return result
+
+@quick_analysis_router.post(
+    "/anlaysis-sentiment/bulk",
+    dependencies=[admit("bulk_analysis")],
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": BulkTextInput.model_json_schema()},
+                "application/x-ndjson": {"schema": TextInput.model_json_schema()},
+            },
+        }
+    },
+)
+async def analyze_texts_endpoint(request: Request):
+    """
+    Scores many texts in one call. Send {"texts": [...], "model": ...} as JSON, or
+    one TextInput object per line as application/x-ndjson for inputs too large to
+    hold in memory. Results stream back in input order as NDJSON, or as
+    Server-Sent Events when the client accepts text/event-stream.
+    """
+    if "ndjson" in request.headers.get("content-type", ""):
+        rows = rows_from_ndjson(request.stream())
+        response_class = DuplexStreamingResponse
+    else:
+        try:
+            payload = BulkTextInput.model_validate_json(await request.body())
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+        rows = rows_from_texts(payload.texts, payload.model)
+        response_class = StreamingResponse
+
+    if "text/event-stream" in request.headers.get("accept", ""):
+        return response_class(
+            stream_results(rows, event_stream=True),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    return response_class(stream_results(rows), media_type="application/x-ndjson")
@@ -0,0 +1,22 @@
+from fastapi import APIRouter, HTTPException, Depends
+from starlette.concurrency import run_in_threadpool
+from plugin.schemas import HashtagRequest
+from utils.hashtag_sketches import fetch_top_hashtags
+from utils.admission import admit
+from utils.auth import require_token
+
+session_hashtags_router = APIRouter(tags=["Session Hashtags"], dependencies=[Depends(require_token)])
+
+@session_hashtags_router.post("/session-hashtags/top", dependencies=[admit("hashtags")])
+async def top_session_hashtags(request: HashtagRequest):
+    """
+    Most used hashtags with their average sentiment, over the given sessions or
+    across every session. Counts come from bounded sketches: `error` is how far
+    a count may overshoot, and `exact` is true when no tag was ever evicted.
+    """
+    # One sketch row per session, merged in memory
+    result = await run_in_threadpool(fetch_top_hashtags, request.session_ids, request.k)
+    if result is None:
+        raise HTTPException(status_code=404, detail="No hashtag data found for provided session IDs")
+
+    return result
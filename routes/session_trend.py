@@ -0,0 +1,35 @@
+from fastapi import APIRouter, HTTPException, Depends
+from starlette.concurrency import run_in_threadpool
+from plugin.schemas import TrendRequest
+from utils.session_trends import fetch_session_trends, TRACKED_GRANULARITIES
+from utils.admission import admit
+from utils.auth import require_token
+
+session_trend_router = APIRouter(tags=["Session Trend"], dependencies=[Depends(require_token)])
+
+@session_trend_router.post("/session-sentiment-trend", dependencies=[admit("trend")])
+async def session_sentiment_trend(request: TrendRequest):
+
+    if request.granularity not in TRACKED_GRANULARITIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Granularity '{request.granularity}' is not tracked; available: {', '.join(TRACKED_GRANULARITIES)}",
+        )
+    if request.start and request.end and request.start >= request.end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    # Precomputed bucket rows: one per session, bucket and platform
+    trends = await run_in_threadpool(
+        fetch_session_trends, request.session_ids, request.granularity,
+        start=request.start, end=request.end, platforms=request.platforms,
+    )
+
+    output = [
+        {"session_id": session_id, "granularity": request.granularity, "buckets": trends[session_id]}
+        for session_id in dict.fromkeys(request.session_ids)
+        if session_id in trends
+    ]
+    if not output:
+        raise HTTPException(status_code=404, detail="No sentiment trend data found for provided session IDs")
+
+    return output
@@ -0,0 +1,20 @@
+import mongomock
+import pytest
+from plugin.db import INDEX_SPECS, use_database
+
+
+@pytest.fixture
+def mongo():
+    """
+    Binds every collection in plugin.db to a fresh in-memory database with the declared indexes.
+    """
+    database = mongomock.MongoClient()["textdata"]
+    for collection_name, models in INDEX_SPECS.items():
+        for model in models:
+            spec = dict(model.document)
+            # mongomock has no partial indexes; uniqueness is what the tests rely on
+            spec.pop("partialFilterExpression", None)
+            database[collection_name].create_index(list(spec.pop("key").items()), **spec)
+    use_database(database)
+    yield database
+    use_database(None)
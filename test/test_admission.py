@@ -0,0 +1,97 @@
+import asyncio
+import pytest
+import utils.admission as admission_module
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from app import app
+from utils.admission import AdmissionController, MemoryBuckets
+from utils.auth import require_token
+from utils.micro_batcher import micro_batcher
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def rejection(controller: AdmissionController, route: str, subject: str = "alice") -> HTTPException:
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(controller.enter(route, subject))
+    assert error.value.status_code == 429
+    return error.value
+
+
+def test_buckets_allow_a_burst_then_refill_at_the_rate():
+    clock = Clock()
+    buckets = MemoryBuckets(clock=clock)
+
+    async def takes(count: int) -> list:
+        return [await buckets.take("route:alice", rate=2, burst=3) for _ in range(count)]
+
+    assert asyncio.run(takes(4)) == [0, 0, 0, 0.5]
+    clock.now += 0.5
+    assert asyncio.run(takes(2)) == [0, 0.5]
+    assert asyncio.run(buckets.take("route:bob", rate=2, burst=3)) == 0
+
+def test_rate_limit_answers_429_with_retry_after():
+    clock = Clock()
+    controller = AdmissionController(MemoryBuckets(clock=clock), {"ranking": (0.25, 1, 10)})
+
+    asyncio.run(controller.enter("ranking", "alice"))
+    controller.leave("ranking")
+    error = rejection(controller, "ranking")
+
+    assert error.headers["Retry-After"] == "4"
+    assert controller.in_progress["ranking"] == 0
+    # Subjects have their own buckets
+    asyncio.run(controller.enter("ranking", "bob"))
+
+def test_concurrency_cap_rejects_without_spending_tokens():
+    controller = AdmissionController(MemoryBuckets(clock=Clock()), {"summary": (1, 2, 1)})
+
+    asyncio.run(controller.enter("summary", "alice"))
+    error = rejection(controller, "summary", "bob")
+    assert error.headers["Retry-After"] == "1"
+    assert "in progress" in error.detail
+
+    controller.leave("summary")
+    # bob's turned-away request did not use up his bucket
+    asyncio.run(controller.enter("summary", "bob"))
+    controller.leave("summary")
+    asyncio.run(controller.enter("summary", "bob"))
+    assert controller.in_progress["summary"] == 1
+
+def test_unavailable_rate_store_admits():
+    class DownBuckets:
+        async def take(self, key, rate, burst, cost=1):
+            raise ConnectionError("redis is down")
+
+    controller = AdmissionController(DownBuckets(), {"summary": (1, 1, 5)})
+    for _ in range(3):
+        asyncio.run(controller.enter("summary", "alice"))
+    assert controller.in_progress["summary"] == 3
+
+def test_route_turns_away_requests_over_the_limit(monkeypatch):
+    async def fake_analyze(text, model):
+        return {"model": model, "text": text, "scores": {"Negative": 0.1, "Positive": 0.8, "Neutral": 0.1}}
+
+    controller = AdmissionController(MemoryBuckets(clock=Clock()), {**admission_module.ADMISSION_LIMITS, "quick_analysis": (0.5, 1, 5)})
+    monkeypatch.setattr(admission_module, "admission", controller)
+    monkeypatch.setattr(admission_module, "ADMISSION_ENABLED", True)
+    monkeypatch.setattr(micro_batcher, "analyze", fake_analyze)
+    app.dependency_overrides[require_token] = lambda: {"sub": "alice"}
+    try:
+        client = TestClient(app)
+        first = client.post("/anlaysis-sentiment", json={"text": "great launch"})
+        second = client.post("/anlaysis-sentiment", json={"text": "great launch"})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert first.status_code == 200
+    assert second.status_code == 429
+    assert second.headers["Retry-After"] == "2"
+    # The slot taken by the admitted request was given back once it was answered
+    assert controller.in_progress["quick_analysis"] == 0
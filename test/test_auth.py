@@ -0,0 +1,81 @@
+import asyncio
+import time
+import jwt
+import pytest
+import utils.auth as auth
+from fastapi import HTTPException
+
+
+def make_token(expires_in: float = 3600, key: bytes = None, **claims) -> str:
+    payload = {"sub": "analyst", "exp": int(time.time() + expires_in), **claims}
+    return jwt.encode(payload, key or auth.SECRET_KEY_DECODE, algorithm=auth.ALGORITHM)
+
+def rejection(token: str) -> str:
+    with pytest.raises(HTTPException) as error:
+        auth.authenticate_token(token)
+    assert error.value.status_code == 401
+    return error.value.detail
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    auth._verified_tokens.clear()
+    yield
+    auth._verified_tokens.clear()
+
+@pytest.fixture
+def decodes(monkeypatch):
+    calls = []
+    decode = jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        calls.append(args[0])
+        return decode(*args, **kwargs)
+
+    monkeypatch.setattr(auth.jwt, "decode", counting_decode)
+    return calls
+
+
+def test_verified_tokens_are_decoded_once(decodes):
+    token = make_token()
+
+    assert auth.authenticate_token(token)["sub"] == "analyst"
+    assert auth.authenticate_token(token)["sub"] == "analyst"
+    assert asyncio.run(auth.require_token(f"Bearer {token}"))["sub"] == "analyst"
+
+    assert decodes == [token]
+
+def test_cached_token_is_rejected_once_it_expires(decodes, monkeypatch):
+    token = make_token(expires_in=60)
+    auth.authenticate_token(token)
+
+    later = time.time() + 120
+    monkeypatch.setattr(auth.time, "time", lambda: later)
+
+    assert rejection(token) == "Token expired"
+    assert len(auth._verified_tokens) == 0
+    assert decodes == [token]
+
+def test_bad_tokens_are_rejected_and_never_cached():
+    forged = make_token(key=b"a different signing key, 32 bytes or more")
+    assert rejection(forged) == "Invalid token signature"
+    assert rejection(make_token(expires_in=-60)) == "Token expired"
+    assert rejection("not-a-jwt") == "Malformed token"
+    assert rejection("a.b.c") == "Token decode error"
+    no_exp = jwt.encode({"sub": "analyst"}, auth.SECRET_KEY_DECODE, algorithm=auth.ALGORITHM)
+    assert rejection(no_exp).startswith("Authentication error")
+
+    assert len(auth._verified_tokens) == 0
+
+def test_token_cache_keeps_the_most_recently_used(decodes, monkeypatch):
+    monkeypatch.setattr(auth, "AUTH_CACHE_SIZE", 2)
+    first, second, third = (make_token(n=n) for n in range(3))
+
+    auth.authenticate_token(first)
+    auth.authenticate_token(second)
+    auth.authenticate_token(first)
+    auth.authenticate_token(third)
+    auth.authenticate_token(first)
+    auth.authenticate_token(second)
+
+    assert decodes == [first, second, third, second]
@@ -0,0 +1,122 @@
+import asyncio
+import httpx
+import pytest
+import utils.inference_backends as inference_backends
+import utils.micro_batcher as micro_batcher_module
+from plugin.inference_client import INFERENCE_API_URL, INFERENCE_BATCH_API_URL
+from utils.inference_resilience import AdaptiveLimiter, CircuitBreaker
+from utils.micro_batcher import MicroBatcher
+
+
+def scored(text: str, model: str) -> dict:
+    return {"model": model, "text": text, "scores": {"Negative": 0.1, "Positive": 0.8, "Neutral": 0.1}}
+
+
+class InferenceServer:
+    """
+    Answers the shared AsyncClient's posts like the inference server, with
+    `batch_status` for the batch URL.
+    """
+
+    def __init__(self, batch_status: int = 200):
+        self.batch_status = batch_status
+        self.urls = []
+
+    async def post(self, url, json):
+        self.urls.append(url)
+        if url == INFERENCE_BATCH_API_URL:
+            if self.batch_status != 200:
+                return httpx.Response(self.batch_status, text="no such route")
+            return httpx.Response(200, json={"results": [scored(text, json["model"]) for text in json["texts"]]})
+        return httpx.Response(200, json=scored(json["text"], json["model"]))
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(inference_backends, "inference_breaker", CircuitBreaker())
+    monkeypatch.setattr(inference_backends, "inference_limiter", AdaptiveLimiter())
+
+    def serve(batch_status: int = 200) -> InferenceServer:
+        fake = InferenceServer(batch_status)
+        monkeypatch.setattr(inference_backends, "get_http_client", lambda: fake)
+        return fake
+
+    return serve
+
+
+def test_batch_endpoint_scores_a_chunk_in_one_call(server):
+    fake = server()
+
+    results = asyncio.run(inference_backends.RemoteBackend().infer_batch(["a", "b", "c"], "m"))
+
+    assert [result["text"] for result in results] == ["a", "b", "c"]
+    assert fake.urls == [INFERENCE_BATCH_API_URL]
+
+@pytest.mark.parametrize("status", [404, 405])
+def test_missing_batch_endpoint_falls_back_to_single_calls_for_good(server, status):
+    fake = server(batch_status=status)
+    backend = inference_backends.RemoteBackend()
+
+    first = asyncio.run(backend.infer_batch(["a", "b"], "m"))
+    second = asyncio.run(backend.infer_batch(["c"], "m"))
+
+    assert [result["text"] for result in first + second] == ["a", "b", "c"]
+    assert not backend.batch_endpoint_available
+    assert fake.urls == [INFERENCE_BATCH_API_URL] + [INFERENCE_API_URL] * 3
+
+def test_batch_response_of_the_wrong_length_is_an_error(server, monkeypatch):
+    fake = server()
+
+    async def short_post(url, json):
+        return httpx.Response(200, json={"results": [scored(json["texts"][0], json["model"])]})
+
+    monkeypatch.setattr(fake, "post", short_post)
+    with pytest.raises(Exception, match="does not match"):
+        asyncio.run(inference_backends.RemoteBackend().infer_batch(["a", "b"], "m"))
+
+def test_micro_batcher_groups_a_window_into_one_call_per_model(monkeypatch):
+    calls = []
+
+    async def fake_analyze_sentiment_batch(texts, model):
+        calls.append((model, list(texts)))
+        return [scored(text, model) for text in texts]
+
+    monkeypatch.setattr(micro_batcher_module, "analyze_sentiment_batch", fake_analyze_sentiment_batch)
+    batcher = MicroBatcher(max_batch_size=3, window_ms=50)
+
+    async def scenario():
+        requests = [("a", "m1"), ("b", "m1"), ("c", "m2"), ("d", "m1"), ("e", "m1")]
+        results = await asyncio.gather(*(batcher.analyze(text, model) for text, model in requests))
+        await batcher.stop()
+        return results
+
+    results = asyncio.run(scenario())
+
+    assert [(result["text"], result["model"]) for result in results] == [("a", "m1"), ("b", "m1"), ("c", "m2"), ("d", "m1"), ("e", "m1")]
+    # The first window fills up at three texts; the rest flush when the next window times out
+    assert sorted(calls) == [("m1", ["a", "b"]), ("m1", ["d", "e"]), ("m2", ["c"])]
+
+def test_micro_batcher_fails_every_request_of_a_failed_batch(monkeypatch):
+    down = True
+
+    async def flaky_analyze_sentiment_batch(texts, model):
+        if down:
+            raise RuntimeError("inference down")
+        return [scored(text, model) for text in texts]
+
+    monkeypatch.setattr(micro_batcher_module, "analyze_sentiment_batch", flaky_analyze_sentiment_batch)
+    batcher = MicroBatcher(max_batch_size=8, window_ms=20)
+
+    async def scenario():
+        nonlocal down
+        results = await asyncio.gather(batcher.analyze("a"), batcher.analyze("b"), return_exceptions=True)
+        # The batcher keeps serving after a failed batch
+        down = False
+        after = await batcher.analyze("c", "m")
+        await batcher.stop()
+        return results, after
+
+    results, after = asyncio.run(scenario())
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert after["text"] == "c"
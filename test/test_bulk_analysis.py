@@ -0,0 +1,109 @@
+import asyncio
+import json
+import pytest
+import utils.bulk_analysis as bulk_analysis
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from app import app
+from utils.auth import require_token
+from utils.bulk_analysis import rows_from_ndjson, rows_from_texts, stream_results
+
+
+async def slow_first_chunks(texts, model):
+    # Earlier texts take longer, so later chunks finish first
+    await asyncio.sleep(0.02 / (1 + int(texts[0].split()[-1])))
+    if model == "broken":
+        raise HTTPException(status_code=503, detail="Inference API unavailable")
+    return [{"model": model, "text": text, "scores": {"Negative": 0.1, "Positive": 0.8, "Neutral": 0.1}} for text in texts]
+
+async def body(*parts: bytes):
+    for part in parts:
+        await asyncio.sleep(0)
+        yield part
+
+async def collect(lines) -> list:
+    return [line async for line in lines]
+
+
+@pytest.fixture(autouse=True)
+def fake_inference(monkeypatch):
+    monkeypatch.setattr(bulk_analysis, "analyze_sentiment_batch", slow_first_chunks)
+
+@pytest.fixture
+def client():
+    app.dependency_overrides[require_token] = lambda: {"sub": "tester"}
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def test_results_come_back_in_input_order_with_bounded_chunks_in_flight(monkeypatch):
+    scoring, most = 0, 0
+
+    async def tracked(texts, model):
+        nonlocal scoring, most
+        scoring += 1
+        most = max(most, scoring)
+        try:
+            return await slow_first_chunks(texts, model)
+        finally:
+            scoring -= 1
+
+    monkeypatch.setattr(bulk_analysis, "analyze_sentiment_batch", tracked)
+    texts = [f"text {i}" for i in range(11)]
+
+    lines = asyncio.run(collect(stream_results(rows_from_texts(texts, "m"), chunk_size=2, inflight=3)))
+
+    results = [json.loads(line) for line in lines]
+    assert [result["index"] for result in results] == list(range(11))
+    assert [result["text"] for result in results] == texts
+    assert most == 3
+
+def test_failures_mid_stream_are_reported_per_row_and_the_stream_goes_on():
+    lines = b"\n".join([
+        b'{"text": "text 0", "model": "m"}',
+        b'{"text": "text 1", "model": "broken"}',
+        b'{"model": "m"}',
+        b'',
+        b'{"text": "   ", "model": "m"}',
+        b'{"text": "text 4", "model": "m"}',
+    ])
+    # Split mid-line to check lines are reassembled across reads
+    rows = rows_from_ndjson(body(lines[:20], lines[20:50], lines[50:]))
+
+    results = [json.loads(line) for line in asyncio.run(collect(stream_results(rows, chunk_size=2)))]
+
+    assert [result["index"] for result in results] == [0, 1, 2, 3, 4]
+    assert results[0]["text"] == "text 0" and "error" not in results[0]
+    assert results[1] == {"index": 1, "error": "Inference API unavailable", "status_code": 503}
+    assert results[2]["error"].startswith("Invalid line")
+    assert results[3]["error"] == "Input text is empty."
+    assert results[4]["text"] == "text 4"
+
+def test_event_stream_frames_every_result_and_ends_with_done():
+    lines = asyncio.run(collect(stream_results(rows_from_texts(["text 0", "text 1"], "m"), event_stream=True, chunk_size=1)))
+
+    assert [json.loads(line[len("data: "):])["index"] for line in lines[:-1]] == [0, 1]
+    assert all(line.startswith("data: ") and line.endswith("\n\n") for line in lines[:-1])
+    assert lines[-1] == "event: done\ndata: {}\n\n"
+
+def test_bulk_route_streams_ndjson_input_as_server_sent_events(client):
+    ndjson = "".join(json.dumps({"text": f"text {i}", "model": "m"}) + "\n" for i in range(5))
+
+    response = client.post(
+        "/anlaysis-sentiment/bulk",
+        content=ndjson,
+        headers={"Content-Type": "application/x-ndjson", "Accept": "text/event-stream"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [event for event in response.text.split("\n\n") if event]
+    assert [json.loads(event[len("data: "):])["index"] for event in events[:-1]] == [0, 1, 2, 3, 4]
+    assert events[-1] == "event: done\ndata: {}"
+
+def test_bulk_route_streams_json_input_as_ndjson(client):
+    response = client.post("/anlaysis-sentiment/bulk", json={"texts": ["text 0", "text 1"], "model": "m"})
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line)["text"] for line in response.text.splitlines()] == ["text 0", "text 1"]
+    assert client.post("/anlaysis-sentiment/bulk", json={"model": "m"}).status_code == 422
@@ -0,0 +1,110 @@
+import time
+import utils.hashtag_sketches as hashtag_sketches
+from plugin.inference_client import DEFAULT_MODEL_NAME
+from utils.hashtag_sketches import apply_hashtag_updates, fetch_top_hashtags, hashtag_updates, rebuild, refresh_rollups
+
+
+def tagged_docs(session_id: str, tags: list) -> list:
+    return [
+        {
+            "raw_id": f"{session_id}-{i}",
+            "sessionId": session_id,
+            "hashtags": post_tags,
+            "analysis": {"model": DEFAULT_MODEL_NAME, "scores": {"Negative": 0.1, "Positive": 0.7, "Neutral": 0.2}},
+        }
+        for i, post_tags in enumerate(tags)
+    ]
+
+
+def test_flushes_write_only_session_rows(mongo):
+    apply_hashtag_updates(hashtag_updates(tagged_docs("s1", [["a", "b"], ["A"]])))
+    apply_hashtag_updates(hashtag_updates(tagged_docs("s2", [["a"], ["c"]])))
+
+    assert sorted(doc["sessionId"] for doc in mongo["hashtagSketches"].find()) == ["s1", "s2"]
+
+def test_top_hashtags_across_sessions_reads_the_rollup(mongo):
+    apply_hashtag_updates(hashtag_updates(tagged_docs("s1", [["a", "b"], ["A"]])))
+    apply_hashtag_updates(hashtag_updates(tagged_docs("s2", [["a"], ["c"]])))
+
+    everywhere = fetch_top_hashtags(None, 5)
+    assert everywhere["exact"]
+    assert {tag["hashtag"]: tag["count"] for tag in everywhere["hashtags"]} == {"a": 3, "b": 1, "c": 1}
+    assert everywhere["hashtags"][0]["hashtag"] == "a"
+
+    one = fetch_top_hashtags(["s2"], 5)
+    assert one["session_ids"] == ["s2"]
+    assert {tag["hashtag"]: tag["count"] for tag in one["hashtags"]} == {"a": 1, "c": 1}
+    assert fetch_top_hashtags(["missing"], 5) is None
+
+    # Later flushes reach the all-sessions answer with the next rollup
+    apply_hashtag_updates(hashtag_updates(tagged_docs("s3", [["c"], ["c"]])))
+    assert fetch_top_hashtags(None, 5)["hashtags"][0] == everywhere["hashtags"][0]
+    assert refresh_rollups(interval=60) == 1
+    refreshed = fetch_top_hashtags(None, 5)
+    assert {tag["hashtag"]: tag["count"] for tag in refreshed["hashtags"]} == {"a": 3, "b": 1, "c": 3}
+    assert refreshed["rolled_up_at"] >= everywhere["rolled_up_at"]
+
+def test_rollups_are_redone_once_per_interval_and_only_after_changes(mongo):
+    apply_hashtag_updates(hashtag_updates(tagged_docs("s1", [["a"]])))
+    assert refresh_rollups(interval=60) == 1
+    # Claimed by this round, whoever asks
+    apply_hashtag_updates(hashtag_updates(tagged_docs("s2", [["b"]])))
+    assert refresh_rollups(interval=60) == 0
+
+    # Mongo keeps milliseconds; a row written in the rollup's millisecond counts as changed
+    time.sleep(0.01)
+    assert refresh_rollups(interval=0) == 1
+    assert refresh_rollups(interval=0) == 0
+    assert mongo["hashtagRollups"].find_one({"_id": DEFAULT_MODEL_NAME})["sessions"] == 2
+
+class RacingSketches:
+    """
+    hashtagSketches proxy on which another writer changes the row right after
+    each of the first `races` reads, so the reader's versioned update conflicts.
+    """
+
+    def __init__(self, collection, races: int):
+        self.collection = collection
+        self.races = races
+        self.reads = 0
+
+    def find_one(self, key, *args, **kwargs):
+        doc = self.collection.find_one(key, *args, **kwargs)
+        self.reads += 1
+        if self.reads <= self.races:
+            self.collection.update_one(key, {"$inc": {"version": 1}})
+        return doc
+
+    def __getattr__(self, attribute):
+        return getattr(self.collection, attribute)
+
+
+def test_conflicting_flushes_retry_instead_of_dropping_updates(mongo, monkeypatch):
+    apply_hashtag_updates(hashtag_updates(tagged_docs("s1", [["hot"]])))
+    racing = RacingSketches(mongo["hashtagSketches"], races=12)
+    monkeypatch.setattr(hashtag_sketches, "hashtag_sketches", racing)
+    monkeypatch.setattr(hashtag_sketches.time, "sleep", lambda seconds: None)
+
+    apply_hashtag_updates(hashtag_updates(tagged_docs("s1", [["hot"]])))
+
+    assert racing.reads == 13
+    assert fetch_top_hashtags(["s1"], 1)["hashtags"][0]["count"] == 2
+
+def test_endless_conflicts_give_up_instead_of_blocking_the_flush(mongo, monkeypatch):
+    apply_hashtag_updates(hashtag_updates(tagged_docs("s1", [["hot"]])))
+    racing = RacingSketches(mongo["hashtagSketches"], races=1000)
+    monkeypatch.setattr(hashtag_sketches, "hashtag_sketches", racing)
+    monkeypatch.setattr(hashtag_sketches.time, "sleep", lambda seconds: None)
+
+    apply_hashtag_updates(hashtag_updates(tagged_docs("s1", [["hot"]])))
+
+    assert racing.reads == hashtag_sketches.MAX_SAVE_ATTEMPTS
+    assert fetch_top_hashtags(["s1"], 1)["hashtags"][0]["count"] == 1
+
+def test_rebuild_replaces_session_rows_and_the_rollup(mongo):
+    mongo["socialMediaSentiment"].insert_many(tagged_docs("s1", [["a"], ["a", "b"]]))
+    assert fetch_top_hashtags(None, 5) is None
+
+    assert rebuild() == 1
+    assert [doc["sessionId"] for doc in mongo["hashtagSketches"].find()] == ["s1"]
+    assert {tag["hashtag"]: tag["count"] for tag in fetch_top_hashtags(None, 5)["hashtags"]} == {"a": 2, "b": 1}
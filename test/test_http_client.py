@@ -0,0 +1,41 @@
+import asyncio
+import pytest
+import plugin.http_client as http_client
+from plugin.http_client import close_http_client, get_http_client
+
+
+@pytest.fixture(autouse=True)
+def fresh_client():
+    asyncio.run(close_http_client())
+    yield
+    asyncio.run(close_http_client())
+
+
+def test_one_pooled_client_per_process():
+    client = get_http_client()
+
+    assert get_http_client() is client
+    assert client.timeout.connect == http_client.INFERENCE_CONNECT_TIMEOUT
+    assert client.timeout.read == http_client.INFERENCE_READ_TIMEOUT
+    assert client.timeout.pool == http_client.INFERENCE_POOL_TIMEOUT
+
+def test_closed_client_is_replaced():
+    client = get_http_client()
+
+    asyncio.run(close_http_client())
+
+    assert client.is_closed
+    assert get_http_client() is not client
+
+def test_forked_process_builds_its_own_client(monkeypatch):
+    parent = get_http_client()
+    monkeypatch.setattr(http_client.os, "getpid", lambda: -1)
+
+    child = get_http_client()
+    # Closing in the child leaves the parent's sockets alone
+    asyncio.run(close_http_client())
+
+    assert child is not parent
+    assert not parent.is_closed
+    monkeypatch.undo()
+    asyncio.run(parent.aclose())
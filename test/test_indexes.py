@@ -0,0 +1,70 @@
+import logging
+import mongomock
+import pytest
+from bson import ObjectId
+from plugin.db import ensure_indexes, use_database
+from plugin.inference_client import DEFAULT_MODEL_NAME
+from utils.sentiment_dedupe import dedupe
+from utils.session_aggregates import aggregate_increments
+
+
+@pytest.fixture
+def bare_mongo():
+    """
+    Like `mongo`, but without indexes, as a database from before they were declared.
+    """
+    database = mongomock.MongoClient()["textdata"]
+    use_database(database)
+    yield database
+    use_database(None)
+
+
+def store_twice(database, session_id: str, raw_ids: list, copies: dict):
+    docs = []
+    for raw_id in raw_ids:
+        for _ in range(copies.get(raw_id, 1)):
+            docs.append({
+                "_id": ObjectId(),
+                "raw_id": raw_id,
+                "sessionId": session_id,
+                "datetime": "2025-01-01T10:00:00",
+                "hashtags": ["launch"],
+                "analysis": {"model": DEFAULT_MODEL_NAME, "scores": {"Negative": 0.2, "Positive": 0.6, "Neutral": 0.2}},
+            })
+    database["socialMediaSentiment"].insert_many(docs)
+    # Every copy was counted, as the writer did before the unique index
+    database["sessionAggregates"].bulk_write(aggregate_increments(docs, {}))
+    return docs
+
+
+def test_duplicate_keys_are_reported_with_the_index_and_the_fix(bare_mongo, caplog):
+    store_twice(bare_mongo, "s1", ["p1", "p2"], {"p1": 2})
+
+    with caplog.at_level(logging.ERROR):
+        missing = ensure_indexes(bare_mongo)
+
+    assert "socialMediaSentiment.raw_id_model" in missing
+    errors = [record.getMessage() for record in caplog.records if record.levelno == logging.ERROR]
+    assert any("socialMediaSentiment.raw_id_model" in error and "utils.sentiment_dedupe" in error for error in errors)
+    # The other indexes were still built
+    assert "sessionId_model" in bare_mongo["socialMediaSentiment"].index_information()
+    assert "activeSession" in bare_mongo["sessionJobs"].index_information()
+
+def test_dedupe_keeps_the_oldest_copy_and_rebuilds_the_rollups(bare_mongo):
+    docs = store_twice(bare_mongo, "s1", ["p1", "p2", "p3"], {"p1": 3, "p3": 2})
+    store_twice(bare_mongo, "s2", ["q1"], {})
+    assert bare_mongo["sessionAggregates"].find_one({"sessionId": "s1"})["total_posts"] == 6
+
+    assert dedupe(dry_run=True)["removed"] == 3
+    assert bare_mongo["socialMediaSentiment"].count_documents({}) == 7
+
+    report = dedupe()
+
+    assert (report["duplicate_groups"], report["removed"]) == (2, 3)
+    assert report["sessions"] == {DEFAULT_MODEL_NAME: ["s1"]}
+    kept = {doc["raw_id"]: doc["_id"] for doc in bare_mongo["socialMediaSentiment"].find({"sessionId": "s1"})}
+    assert kept == {"p1": docs[0]["_id"], "p2": docs[3]["_id"], "p3": docs[4]["_id"]}
+    assert bare_mongo["sessionAggregates"].find_one({"sessionId": "s1"})["total_posts"] == 3
+    assert bare_mongo["hashtagSketches"].find_one({"sessionId": "s1"})["total"] == 3
+    assert "socialMediaSentiment.raw_id_model" not in ensure_indexes(bare_mongo)
+    assert dedupe()["removed"] == 0
@@ -0,0 +1,59 @@
+import asyncio
+import pytest
+import utils.inference_backends as inference_backends
+from utils.inference_cache import cache_key
+from utils.inference_helpers import analyze_sentiment_batch, analyze_sentiment_remote
+
+
+def test_local_results_carry_the_local_model_name(monkeypatch):
+    monkeypatch.setitem(inference_backends.INFERENCE_MODEL_BACKENDS, "sentiment-v3", "local")
+    monkeypatch.setattr(inference_backends.BACKENDS["local"], "workers", 0)
+
+    [result] = asyncio.run(analyze_sentiment_batch(["what a great win"], "sentiment-v3"))
+
+    assert result["model"] == inference_backends.LOCAL_MODEL_NAME != "sentiment-v3"
+    assert result["backend"] == "local"
+    assert result["scores"]["Positive"] > result["scores"]["Negative"]
+
+def test_cached_local_results_are_not_served_for_the_remote_backend(monkeypatch):
+    remote_calls = []
+
+    async def remote_infer_batch(texts, model):
+        remote_calls.extend(texts)
+        return [{"model": model, "text": text, "scores": {"Negative": 0.1, "Positive": 0.1, "Neutral": 0.8}} for text in texts]
+
+    monkeypatch.setattr(inference_backends.BACKENDS["local"], "workers", 0)
+    monkeypatch.setattr(inference_backends.BACKENDS["remote"], "infer_batch", remote_infer_batch)
+
+    monkeypatch.setitem(inference_backends.INFERENCE_MODEL_BACKENDS, "sentiment-v3", "local")
+    asyncio.run(analyze_sentiment_batch(["switching backends today"], "sentiment-v3"))
+    monkeypatch.setitem(inference_backends.INFERENCE_MODEL_BACKENDS, "sentiment-v3", "remote")
+    [result] = asyncio.run(analyze_sentiment_batch(["switching backends today"], "sentiment-v3"))
+
+    assert remote_calls == ["switching backends today"]
+    assert result["model"] == "sentiment-v3" and "backend" not in result
+    assert cache_key("local", "sentiment-v3", "text") != cache_key("remote", "sentiment-v3", "text")
+
+def test_backends_must_implement_infer_batch():
+    class Incomplete(inference_backends.InferenceBackend):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+def test_single_text_helper_shares_the_batch_path(monkeypatch):
+    calls = []
+
+    async def remote_infer_batch(texts, model):
+        calls.append(list(texts))
+        return [{"model": model, "text": text, "scores": {"Negative": 0.7, "Positive": 0.1, "Neutral": 0.2}} for text in texts]
+
+    monkeypatch.setattr(inference_backends.BACKENDS["remote"], "infer_batch", remote_infer_batch)
+    monkeypatch.setitem(inference_backends.INFERENCE_MODEL_BACKENDS, "sentiment-v3", "remote")
+
+    single = asyncio.run(analyze_sentiment_remote("Single  TEXT @someone", "sentiment-v3"))
+    [batched] = asyncio.run(analyze_sentiment_batch(["single text @user"], "sentiment-v3", cleaned=True))
+
+    assert single == batched
+    assert single["text"] == "single text @user"
+    assert calls == [["single text @user"]]
@@ -0,0 +1,69 @@
+import asyncio
+import datetime
+import os
+import time
+import utils.inference_cache as inference_cache
+from utils.inference_cache import InferenceCache, LRUCache, MongoTier, SQLiteTier
+
+
+def test_sqlite_tier_reads_skip_expired_entries(tmp_path):
+    tier = SQLiteTier(str(tmp_path / "cache.sqlite3"), ttl=60, prune_interval=3600)
+    tier.put_many({"fresh": {"label": "positive"}})
+    tier._conn.execute("INSERT INTO inference_cache VALUES ('stale', '{}', ?)", (time.time() - 120,))
+
+    assert tier.get_many(["fresh", "stale"]) == {"fresh": {"label": "positive"}}
+
+def test_sqlite_tier_prunes_on_interval_with_an_index(tmp_path):
+    tier = SQLiteTier(str(tmp_path / "cache.sqlite3"), ttl=60, prune_interval=3600)
+    tier._conn.execute("INSERT INTO inference_cache VALUES ('stale', '{}', ?)", (time.time() - 120,))
+
+    # Inside the interval writes leave expired rows alone
+    tier.put_many({"a": {}})
+    assert tier._conn.execute("SELECT COUNT(*) FROM inference_cache").fetchone()[0] == 2
+
+    tier.prune_interval = 0
+    tier.put_many({"b": {}})
+    assert [row[0] for row in tier._conn.execute("SELECT key FROM inference_cache ORDER BY key")] == ["a", "b"]
+
+    plan = " ".join(str(row) for row in tier._conn.execute("EXPLAIN QUERY PLAN DELETE FROM inference_cache WHERE created_at < 0"))
+    assert "inference_cache_created_at" in plan
+
+def test_mongo_tier_stores_dates_and_skips_expired_entries(mongo):
+    tier = MongoTier(ttl=60)
+    tier.put_many({"fresh": {"label": "positive"}})
+    long_ago = datetime.datetime.utcnow() - datetime.timedelta(minutes=5)
+    mongo["inferenceCache"].insert_one({"_id": "stale", "result": {}, "created_at": long_ago})
+
+    assert isinstance(mongo["inferenceCache"].find_one({"_id": "fresh"})["created_at"], datetime.datetime)
+    assert tier.get_many(["fresh", "stale"]) == {"fresh": {"label": "positive"}}
+
+def test_persistent_tier_opens_on_first_use_in_each_process(tmp_path, monkeypatch):
+    opened = []
+
+    def open_tier():
+        opened.append(os.getpid())
+        return SQLiteTier(str(tmp_path / "cache.sqlite3"), ttl=60)
+
+    cache = InferenceCache(LRUCache(16, 60), open_persistent=open_tier)
+    assert opened == [] and cache.persistent is None
+
+    asyncio.run(cache.put_many({"a": {"label": "positive"}}))
+    asyncio.run(cache.get_many(["b"]))
+    assert len(opened) == 1
+
+    # A forked worker opens its own tier and finds what the parent stored
+    parent_tier = cache.persistent
+    monkeypatch.setattr(inference_cache.os, "getpid", lambda: -1)
+    cache.memory = LRUCache(16, 60)
+    assert asyncio.run(cache.get_many(["a"])) == {"a": {"label": "positive"}}
+    assert opened[1] == -1 and cache.persistent is not parent_tier
+
+def test_unopenable_tier_leaves_the_memory_tier_working():
+    def broken():
+        raise OSError("disk full")
+
+    cache = InferenceCache(LRUCache(16, 60), open_persistent=broken)
+    asyncio.run(cache.put_many({"a": {"label": "positive"}}))
+
+    assert cache.persistent is None
+    assert asyncio.run(cache.get_many(["a"])) == {"a": {"label": "positive"}}
@@ -0,0 +1,176 @@
+import asyncio
+import httpx
+import pytest
+import utils.inference_backends as inference_backends
+from utils.inference_resilience import (
+    INFERENCE_RETRY_MAX_DELAY,
+    AdaptiveLimiter,
+    CircuitBreaker,
+    InferenceUnavailable,
+    backoff_delay,
+)
+
+
+class FakeClient:
+    """
+    Stands in for the shared AsyncClient: each post takes the next outcome,
+    a status code, an exception to raise or a coroutine function to await.
+    """
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    async def post(self, url, json):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        if callable(outcome):
+            return await outcome()
+        return httpx.Response(outcome, json={"model": json["model"], "scores": {}})
+
+
+@pytest.fixture
+def remote(monkeypatch):
+    breaker = CircuitBreaker(threshold=2, reset_timeout=0)
+    monkeypatch.setattr(inference_backends, "inference_breaker", breaker)
+    monkeypatch.setattr(inference_backends, "inference_limiter", AdaptiveLimiter(max_limit=4, min_limit=1))
+    monkeypatch.setattr(inference_backends, "backoff_delay", lambda attempt, retry_after=None: 0)
+
+    def use_client(*outcomes):
+        client = FakeClient(*outcomes)
+        monkeypatch.setattr(inference_backends, "get_http_client", lambda: client)
+        return client
+
+    return inference_backends.RemoteBackend(), breaker, use_client
+
+def post(backend):
+    return backend._post("http://inference/infer", {"text": "hello", "model": "m"}, "single")
+
+def test_backoff_delay_is_jittered_and_capped():
+    assert backoff_delay(0, "2") == 2.0
+    assert backoff_delay(0, str(INFERENCE_RETRY_MAX_DELAY * 10)) == INFERENCE_RETRY_MAX_DELAY
+    for attempt in range(10):
+        delay = backoff_delay(attempt, "not-a-number")
+        assert 0 <= delay <= INFERENCE_RETRY_MAX_DELAY
+
+def test_retryable_statuses_are_retried_until_success(remote):
+    backend, breaker, use_client = remote
+    client = use_client(503, httpx.ConnectError("refused"), 200)
+
+    response = asyncio.run(post(backend))
+
+    assert response.status_code == 200
+    assert client.calls == 3
+    assert breaker.failures == 0 and not breaker.is_open()
+
+def test_exhausted_retries_raise_and_open_the_circuit(remote):
+    backend, breaker, use_client = remote
+    breaker.reset_timeout = 60
+    use_client(*[503] * (inference_backends.INFERENCE_RETRIES + 1))
+
+    with pytest.raises(InferenceUnavailable):
+        asyncio.run(post(backend))
+
+    assert breaker.is_open()
+    with pytest.raises(InferenceUnavailable, match="circuit open"):
+        breaker.before_call()
+
+def test_breaker_lets_one_probe_through_after_the_reset_timeout():
+    breaker = CircuitBreaker(threshold=2, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.opened_at is None
+    breaker.record_failure()
+    assert breaker.opened_at is not None
+
+    breaker.before_call()
+    assert breaker.is_open()
+    with pytest.raises(InferenceUnavailable):
+        breaker.before_call()
+
+    breaker.record_failure()
+    assert breaker.opened_at is not None and not breaker.is_open()
+
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.opened_at is None and breaker.failures == 0
+    breaker.before_call()
+
+def test_cancelled_probe_frees_the_probe_slot(remote):
+    backend, breaker, use_client = remote
+    breaker.record_failure()
+    breaker.record_failure()
+
+    async def hang():
+        await asyncio.Event().wait()
+
+    use_client(hang)
+
+    async def cancel_probe():
+        task = asyncio.create_task(post(backend))
+        await asyncio.sleep(0.01)
+        assert breaker.is_open()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_probe())
+
+    assert not breaker.is_open()
+    breaker.before_call()
+
+def test_unexpected_probe_error_counts_as_a_failure(remote):
+    backend, breaker, use_client = remote
+    breaker.record_failure()
+    breaker.record_failure()
+    use_client(RuntimeError("boom"))
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(post(backend))
+
+    assert breaker.failures == 3 and not breaker._probing
+    assert not breaker.is_open()
+
+def test_limiter_grows_additively_and_halves_on_congestion():
+    limiter = AdaptiveLimiter(max_limit=8, min_limit=2, tolerance=1e9)
+
+    async def scenario():
+        limiter.limit = 4.0
+        started = await limiter.acquire()
+        limiter.release(started, "batch", ok=True)
+        assert limiter.limit == pytest.approx(4.25)
+
+        first = await limiter.acquire()
+        second = await limiter.acquire()
+        limiter.release(first, "batch", ok=False)
+        assert limiter.limit == pytest.approx(4.25 / 2)
+        # Already in flight when the limit was cut, so it does not cut it again
+        limiter.release(second, "batch", ok=False)
+        assert limiter.limit == pytest.approx(4.25 / 2)
+
+        started = await limiter.acquire()
+        limiter.release(started, "batch", ok=False)
+        assert limiter.limit == 2
+
+        for _ in range(200):
+            started = await limiter.acquire()
+            limiter.release(started, "batch", ok=True)
+        assert limiter.limit == 8
+
+    asyncio.run(scenario())
+
+def test_limiter_queues_callers_over_the_limit():
+    limiter = AdaptiveLimiter(max_limit=1, min_limit=1)
+
+    async def scenario():
+        started = await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert not waiter.done() and limiter.in_flight == 1
+
+        limiter.release(started, "single", ok=True)
+        await waiter
+        assert limiter.in_flight == 1
+
+    asyncio.run(scenario())
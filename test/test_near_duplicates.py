@@ -0,0 +1,84 @@
+import asyncio
+import utils.session_pipeline as session_pipeline
+from plugin.inference_client import DEFAULT_MODEL_NAME
+from utils.near_duplicates import NearDuplicateIndex, lsh_params, tokens
+
+BASE = "the new phone launch event was great and the battery life looks really impressive this year"
+# One word changed: 14 of 16 word bigrams shared, a Jaccard similarity of 14/18
+NEAR = BASE.replace("great", "amazing")
+OTHER = "traffic on the bridge is terrible again this morning and nobody knows why"
+
+
+def jaccard(first: str, second: str) -> float:
+    def bigrams(text):
+        words = tokens(text)
+        return set(zip(words, words[1:]))
+    return len(bigrams(first) & bigrams(second)) / len(bigrams(first) | bigrams(second))
+
+
+def test_lsh_bands_fit_the_signature():
+    for threshold in (0.5, 0.8, 0.9):
+        bands, rows = lsh_params(64, threshold)
+        assert bands * rows <= 64
+    # A higher threshold asks for more rows per band, so fewer pairs become candidates
+    assert lsh_params(64, 0.9)[1] > lsh_params(64, 0.5)[1]
+
+def test_repeats_and_retweets_join_the_first_cluster():
+    index = NearDuplicateIndex(threshold=0.8)
+
+    first = index.assign("p1", BASE)
+    assert index.assign("p2", BASE).id == "p1"
+    assert index.assign("p3", f"rt @user: {BASE}!!") is first
+    assert index.assign("p4", OTHER).id == "p4"
+    assert first.text == BASE
+
+def test_threshold_decides_whether_near_duplicates_merge():
+    similarity = jaccard(BASE, NEAR)
+    assert 0.7 < similarity < 0.9
+
+    loose = NearDuplicateIndex(threshold=0.5)
+    loose.assign("p1", BASE)
+    assert loose.assign("p2", NEAR).id == "p1"
+    assert loose.assign("p3", OTHER).id == "p3"
+
+    strict = NearDuplicateIndex(threshold=0.95)
+    strict.assign("p1", BASE)
+    assert strict.assign("p2", NEAR).id == "p2"
+
+def test_texts_without_words_are_never_clustered():
+    index = NearDuplicateIndex()
+    assert index.assign("p1", "!!!").id == "p1"
+    assert index.assign("p2", "!!!").id == "p2"
+
+def test_oldest_clusters_are_forgotten_past_max_clusters():
+    index = NearDuplicateIndex(max_clusters=2)
+    index.assign("p1", BASE)
+    index.assign("p2", OTHER)
+    index.assign("p3", "a completely different post about the football final last night")
+
+    assert index.assign("p4", OTHER).id == "p2"
+    assert index.assign("p5", BASE).id == "p5"
+
+def test_near_duplicate_posts_share_one_inference_call(mongo, monkeypatch):
+    scored = []
+
+    async def fake_analyze_sentiment_batch(texts, model=DEFAULT_MODEL_NAME, **kwargs):
+        scored.extend(texts)
+        return [{"model": model, "text": text, "scores": {"Negative": 0.1, "Positive": 0.8, "Neutral": 0.1}} for text in texts]
+
+    monkeypatch.setattr(session_pipeline, "analyze_sentiment_batch", fake_analyze_sentiment_batch)
+    texts = {"p1": BASE, "p2": BASE, "p3": f"RT @someone: {BASE}", "p4": OTHER}
+    mongo["scrappedPosts"].insert_many([
+        {"_id": raw_id, "sessionId": "s1", "status": 1, "platform": "twitter", "text": text} for raw_id, text in texts.items()
+    ])
+
+    result = asyncio.run(session_pipeline.process_session("s1"))
+
+    assert result["posts_processed"] == 4
+    assert len(scored) == 2
+    stored = {doc["raw_id"]: doc for doc in mongo["socialMediaSentiment"].find()}
+    assert {raw_id: doc["cluster_id"] for raw_id, doc in stored.items()} == {"p1": "p1", "p2": "p1", "p3": "p1", "p4": "p4"}
+    # Every post keeps its own cleaned text alongside the shared scores
+    assert stored["p3"]["analysis"]["scores"] == stored["p1"]["analysis"]["scores"]
+    assert stored["p3"]["analysis"]["text"] != stored["p1"]["analysis"]["text"]
+    assert mongo["scrappedPosts"].count_documents({"status": 3}) == 4
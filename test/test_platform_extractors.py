@@ -0,0 +1,42 @@
+from utils.platform_extractors import (
+    BUILTIN_TEXT_FIELDS,
+    COMMON_FIELDS,
+    build_projection,
+    build_registry,
+    extract_text_by_platform,
+)
+
+
+def test_builtin_platforms_read_their_own_field():
+    registry = build_registry({})
+
+    assert set(registry) == set(BUILTIN_TEXT_FIELDS)
+    assert extract_text_by_platform({"platform": "Twitter", "text": "tweet", "content": "not this"}, registry) == "tweet"
+    assert extract_text_by_platform({"platform": "youtube", "metadata": "video title"}, registry) == "video title"
+    assert extract_text_by_platform({"platform": "reddit", "content": "   "}, registry) == ""
+
+def test_overrides_add_platforms_and_replace_builtin_fields():
+    registry = build_registry({"Telegram": ["message"], "twitter": ["text", "quoted_status.text"]})
+    tweet = {"platform": "twitter", "text": "my take", "quoted_status": {"text": "their take"}}
+
+    assert extract_text_by_platform({"platform": "telegram", "message": "hello"}, registry) == "hello"
+    assert extract_text_by_platform(tweet, registry) == "my take\n\ntheir take"
+    # Missing or non-text nested values are skipped, not errors
+    assert extract_text_by_platform({"platform": "twitter", "text": "solo", "quoted_status": "deleted"}, registry) == "solo"
+
+def test_unknown_platforms_yield_no_text():
+    assert extract_text_by_platform({"platform": "myspace", "text": "hi"}, build_registry({})) == ""
+    assert extract_text_by_platform({"text": "no platform"}, build_registry({})) == ""
+
+def test_projection_covers_every_field_without_overlapping_paths(mongo):
+    registry = build_registry({"twitter": ["text", "quoted.text"], "forum": ["quoted", "body.title", "body.text"]})
+
+    projection = build_projection(registry)
+
+    assert projection == {field: 1 for field in [*COMMON_FIELDS, "body.text", "body.title", "content", "metadata", "quoted", "text"]}
+    mongo["scrappedPosts"].insert_one({
+        "_id": "p1", "platform": "twitter", "text": "my take", "quoted": {"text": "their take"}, "raw_html": "<p>...</p>",
+    })
+    doc = mongo["scrappedPosts"].find_one({"_id": "p1"}, projection)
+    assert "raw_html" not in doc
+    assert extract_text_by_platform(doc, registry) == "my take\n\ntheir take"
@@ -0,0 +1,56 @@
+import pytest
+from fastapi.testclient import TestClient
+from app import app
+from plugin.inference_client import DEFAULT_MODEL_NAME
+from utils.auth import require_token
+from utils.inference_cache import LRUCache
+from utils.report_cache import etag_matches, report_cache
+from utils.session_aggregates import aggregate_increments
+
+
+@pytest.fixture
+def client(mongo, monkeypatch):
+    app.dependency_overrides[require_token] = lambda: {"sub": "tester"}
+    monkeypatch.setattr(report_cache, "entries", LRUCache(16, 60))
+    # No lifespan: the tests need neither job workers nor the inference client
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def store_results(mongo, session_id: str, count: int, start: int = 0):
+    docs = [
+        {
+            "raw_id": f"{session_id}-{i}",
+            "sessionId": session_id,
+            "analysis": {"model": DEFAULT_MODEL_NAME, "scores": {"Negative": 0.2, "Positive": 0.6, "Neutral": 0.2}},
+        }
+        for i in range(start, start + count)
+    ]
+    mongo["socialMediaSentiment"].insert_many(docs)
+    mongo["sessionAggregates"].bulk_write(aggregate_increments(docs, {session_id: "launch"}))
+
+
+def test_etag_matches_ignores_wildcard():
+    assert etag_matches('W/"abc", "def"', '"abc"')
+    assert not etag_matches("*", '"abc"')
+    assert not etag_matches(None, '"abc"')
+
+def test_wildcard_does_not_turn_404_into_304(client):
+    response = client.post("/session-sentiment-summary", json={"session_ids": ["nope"]}, headers={"If-None-Match": "*"})
+
+    assert response.status_code == 404
+
+def test_unchanged_report_is_not_modified_until_a_write(client, mongo):
+    store_results(mongo, "s1", 3)
+    first = client.post("/session-sentiment-summary", json={"session_ids": ["s1"]})
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    again = client.post("/session-sentiment-summary", json={"session_ids": ["s1"]}, headers={"If-None-Match": etag})
+    assert again.status_code == 304 and not again.content
+
+    store_results(mongo, "s1", 2, start=3)
+    changed = client.post("/session-sentiment-summary", json={"session_ids": ["s1"]}, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert "out of 5 analyzed posts" in changed.json()[0]["summary"]
@@ -0,0 +1,97 @@
+import utils.sentiment_writer as sentiment_writer
+from pymongo.errors import BulkWriteError
+from plugin.inference_client import DEFAULT_MODEL_NAME
+from utils.sentiment_writer import DUPLICATE_KEY_ERROR, SentimentWriter
+
+
+def add_claimed_posts(mongo, ids: list):
+    mongo["scrappedPosts"].insert_many([{"_id": raw_id, "sessionId": "s1", "status": 2, "claimedBy": "job-1"} for raw_id in ids])
+
+def result(raw_id: str) -> dict:
+    return {
+        "raw_id": raw_id,
+        "sessionId": "s1",
+        "platform": "twitter",
+        "text": f"text of {raw_id}",
+        "hashtags": ["launch"],
+        "analysis": {"model": DEFAULT_MODEL_NAME, "scores": {"Negative": 0.2, "Positive": 0.6, "Neutral": 0.2}},
+        "cluster_id": raw_id,
+        "datetime": "2025-01-01T10:15:00",
+        "status": 3,
+    }
+
+def statuses(mongo) -> dict:
+    return {doc["_id"]: doc["status"] for doc in mongo["scrappedPosts"].find()}
+
+
+class RejectingSentiment:
+    """
+    socialMediaSentiment proxy whose insert_many stores every doc except the
+    ones at `errors` indexes, then raises like pymongo with those write errors.
+    """
+
+    def __init__(self, collection, errors: dict):
+        self.collection = collection
+        self.errors = errors
+
+    def insert_many(self, docs, ordered=True):
+        stored = [doc for i, doc in enumerate(docs) if i not in self.errors]
+        if stored:
+            self.collection.insert_many(stored)
+        write_errors = [{"index": i, "code": code, "errmsg": "rejected"} for i, code in self.errors.items()]
+        raise BulkWriteError({"writeErrors": write_errors, "nInserted": len(stored)})
+
+    def __getattr__(self, attribute):
+        return getattr(self.collection, attribute)
+
+
+def test_flush_stores_results_and_updates_every_rollup(mongo):
+    add_claimed_posts(mongo, ["p1", "p2"])
+    writer = SentimentWriter()
+    writer.add_result(result("p1"), keyword="launch")
+    writer.add_result(result("p2"), keyword="launch")
+
+    assert writer.flush() == 2
+
+    assert statuses(mongo) == {"p1": 3, "p2": 3}
+    assert mongo["scrappedPosts"].count_documents({"claimedBy": {"$exists": True}}) == 0
+    row = mongo["sessionAggregates"].find_one({"sessionId": "s1"})
+    assert row["total_posts"] == 2 and row["keyword"] == "launch"
+    assert mongo["sessionTrends"].count_documents({"sessionId": "s1"}) > 0
+    assert mongo["hashtagSketches"].find_one({"sessionId": "s1"})["total"] == 2
+
+def test_partial_insert_failure_marks_only_the_failed_posts_status_4(mongo, monkeypatch):
+    add_claimed_posts(mongo, ["p1", "p2", "p3", "p4"])
+    # p2 was stored by an earlier run; p3 was rejected outright
+    rejecting = RejectingSentiment(mongo["socialMediaSentiment"], {1: DUPLICATE_KEY_ERROR, 2: 121})
+    monkeypatch.setattr(sentiment_writer, "sentiment_data", rejecting)
+    writer = SentimentWriter()
+    for raw_id in ["p1", "p2", "p3"]:
+        writer.add_result(result(raw_id))
+    writer.add_release("p4")
+
+    assert writer.flush() == 2
+
+    assert statuses(mongo) == {"p1": 3, "p2": 3, "p3": 4, "p4": 1}
+    assert (writer.inserted_count, writer.failed_count) == (2, 1)
+    # Only the newly stored result counts towards the totals
+    assert mongo["sessionAggregates"].find_one({"sessionId": "s1"})["total_posts"] == 1
+    assert mongo["hashtagSketches"].find_one({"sessionId": "s1"})["total"] == 1
+
+def test_failed_insert_marks_every_post_status_4(mongo, monkeypatch):
+    add_claimed_posts(mongo, ["p1", "p2"])
+
+    class DownSentiment:
+        def insert_many(self, docs, ordered=True):
+            raise ConnectionError("primary stepped down")
+
+    monkeypatch.setattr(sentiment_writer, "sentiment_data", DownSentiment())
+    writer = SentimentWriter()
+    writer.add_result(result("p1"))
+    writer.add_result(result("p2"))
+
+    assert writer.flush() == 0
+
+    assert statuses(mongo) == {"p1": 4, "p2": 4}
+    assert writer.failed_count == 2
+    assert mongo["sessionAggregates"].count_documents({}) == 0
@@ -0,0 +1,50 @@
+import pytest
+from plugin.inference_client import DEFAULT_MODEL_NAME
+from utils.session_aggregates import aggregate_increments, check, fetch_session_aggregates, rebuild
+
+
+def sentiment_docs(session_id: str, count: int, start: int = 0) -> list:
+    return [
+        {
+            "raw_id": f"{session_id}-{i}",
+            "sessionId": session_id,
+            "analysis": {"model": DEFAULT_MODEL_NAME, "scores": {"Negative": 0.1, "Positive": 0.8, "Neutral": 0.1}},
+        }
+        for i in range(start, start + count)
+    ]
+
+
+def test_read_during_first_flush_does_not_double_count(mongo):
+    docs = sentiment_docs("s1", 5)
+    # A summary poll lands between the writer's insert_many and its $inc
+    mongo["socialMediaSentiment"].insert_many([dict(doc) for doc in docs])
+    assert fetch_session_aggregates(["s1"])["s1"]["total_posts"] == 5
+    mongo["sessionAggregates"].bulk_write(aggregate_increments(docs, {}))
+
+    row = mongo["sessionAggregates"].find_one({"sessionId": "s1"})
+    assert row["total_posts"] == 5
+    assert check(["s1"]) == []
+
+
+def test_reads_do_not_write_rows(mongo):
+    mongo["socialMediaSentiment"].insert_many(sentiment_docs("s1", 3))
+    stats = fetch_session_aggregates(["s1", "missing"])
+
+    assert stats["s1"]["total_posts"] == 3
+    assert stats["s1"]["avg_positive"] == pytest.approx(0.8)
+    assert "missing" not in stats
+    assert mongo["sessionAggregates"].count_documents({}) == 0
+
+
+def test_rebuild_seeds_rows_that_increments_extend(mongo):
+    mongo["socialMediaSentiment"].insert_many(sentiment_docs("s1", 3))
+    assert rebuild(["s1"]) == 1
+
+    more = sentiment_docs("s1", 2, start=3)
+    mongo["socialMediaSentiment"].insert_many([dict(doc) for doc in more])
+    mongo["sessionAggregates"].bulk_write(aggregate_increments(more, {}))
+
+    row = mongo["sessionAggregates"].find_one({"sessionId": "s1"})
+    assert row["total_posts"] == 5
+    assert row["version"] == 2
+    assert check(["s1"]) == []
@@ -0,0 +1,224 @@
+import asyncio
+import datetime
+import pytest
+import utils.session_pipeline as session_pipeline
+from plugin.inference_client import DEFAULT_MODEL_NAME
+from utils.job_queue import JOB_DONE, JOB_QUEUED, JOB_RUNNING, SessionJobQueue, job_report
+from utils.job_worker import SessionJobWorker, SharedBatchBudget
+
+
+def add_posts(mongo, session_id: str, count: int):
+    mongo["scrappedPosts"].insert_many([
+        {
+            "_id": f"{session_id}-{i:04d}",
+            "sessionId": session_id,
+            "status": 1,
+            "platform": "twitter",
+            "text": f"Post number {i} about the {session_id} launch #launch{i % 3}",
+            "keyword": "launch",
+            "datetime": "2025-01-01T00:00:00",
+        }
+        for i in range(count)
+    ])
+
+
+async def fake_analyze_sentiment_batch(texts, model=DEFAULT_MODEL_NAME, **kwargs):
+    return [{"model": model, "scores": {"Negative": 0.2, "Positive": 0.5, "Neutral": 0.3}} for _ in texts]
+
+
+@pytest.fixture
+def queue(mongo):
+    return SessionJobQueue()
+
+@pytest.fixture
+def fake_inference(monkeypatch):
+    monkeypatch.setattr(session_pipeline, "analyze_sentiment_batch", fake_analyze_sentiment_batch)
+
+
+class RacingPosts:
+    """
+    scrappedPosts proxy that lets `rival` submit the same session right after
+    the first submit checked for an active job.
+    """
+
+    def __init__(self, posts, rival):
+        self.posts = posts
+        self.rival = rival
+
+    def count_documents(self, *args, **kwargs):
+        rival, self.rival = self.rival, None
+        if rival is not None:
+            rival()
+        return self.posts.count_documents(*args, **kwargs)
+
+
+def test_concurrent_submit_returns_the_same_job(mongo, queue):
+    add_posts(mongo, "s1", 5)
+    rival_result = {}
+    racing = SessionJobQueue(posts=RacingPosts(mongo["scrappedPosts"], lambda: rival_result.update(submitted=queue.submit("s1"))))
+
+    job, created = racing.submit("s1")
+    rival_job, rival_created = rival_result["submitted"]
+
+    assert rival_created and not created
+    assert job["_id"] == rival_job["_id"]
+    assert mongo["sessionJobs"].count_documents({}) == 1
+    assert queue.submit("s1")[0]["_id"] == job["_id"]
+
+def test_submit_without_pending_posts(queue):
+    assert queue.submit("empty") == (None, False)
+
+def test_claim_posts_never_hands_a_post_to_two_jobs(mongo, queue):
+    add_posts(mongo, "s1", 25)
+    first, second = {"_id": "job-1", "sessionId": "s1"}, {"_id": "job-2", "sessionId": "s1"}
+
+    claimed = {"job-1": [], "job-2": []}
+    while True:
+        batches = [(job, queue.claim_posts(job, 4)) for job in (first, second)]
+        if not any(docs for _, docs in batches):
+            break
+        for job, docs in batches:
+            claimed[job["_id"]] += [doc["_id"] for doc in docs]
+
+    assert not set(claimed["job-1"]) & set(claimed["job-2"])
+    assert sorted(claimed["job-1"] + claimed["job-2"]) == sorted(doc["_id"] for doc in mongo["scrappedPosts"].find())
+    for job_id, post_ids in claimed.items():
+        assert mongo["scrappedPosts"].count_documents({"_id": {"$in": post_ids}, "status": 2, "claimedBy": job_id}) == len(post_ids)
+
+def test_requeue_puts_claimed_posts_back(mongo, queue):
+    add_posts(mongo, "s1", 10)
+    job, _ = queue.submit("s1")
+    job = queue.claim_job("worker-1")
+    assert len(queue.claim_posts(job, 6)) == 6
+
+    queue.requeue(job["_id"])
+
+    assert queue.get(job["_id"])["state"] == JOB_QUEUED
+    assert mongo["scrappedPosts"].count_documents({"status": 1}) == 10
+    assert mongo["scrappedPosts"].count_documents({"claimedBy": {"$exists": True}}) == 0
+
+def test_recover_stale_requeues_abandoned_jobs_and_posts(mongo, queue):
+    add_posts(mongo, "s1", 10)
+    queue.submit("s1")
+    job = queue.claim_job("crashed-worker")
+    queue.claim_posts(job, 6)
+
+    assert queue.recover_stale(timeout=60) == 0
+    long_ago = datetime.datetime.utcnow() - datetime.timedelta(hours=1)
+    mongo["sessionJobs"].update_one({"_id": job["_id"]}, {"$set": {"updated_at": long_ago}})
+    mongo["scrappedPosts"].update_many({"status": 2}, {"$set": {"claimedAt": long_ago}})
+
+    assert queue.recover_stale(timeout=60) == 1
+    assert queue.get(job["_id"])["state"] == JOB_QUEUED
+    assert mongo["scrappedPosts"].count_documents({"status": 1}) == 10
+
+def test_running_worker_recovers_jobs_abandoned_after_it_started(mongo, queue, fake_inference):
+    add_posts(mongo, "s1", 10)
+    job, _ = queue.submit("s1")
+    queue.claim_posts(queue.claim_job("crashed-worker"), 6)
+    worker = SessionJobWorker(queue=queue, concurrency=1, poll_interval=0.01, batch_size=5, batch_concurrency=1, recover_interval=0.05)
+
+    async def scenario():
+        await worker.start()
+        # The other worker dies now, after this one's startup recovery
+        long_ago = datetime.datetime.utcnow() - datetime.timedelta(hours=1)
+        mongo["sessionJobs"].update_one({"_id": job["_id"]}, {"$set": {"updated_at": long_ago}})
+        mongo["scrappedPosts"].update_many({"status": 2}, {"$set": {"claimedAt": long_ago}})
+        for _ in range(200):
+            if queue.get(job["_id"])["state"] == JOB_DONE:
+                break
+            await asyncio.sleep(0.01)
+        await worker.stop()
+
+    asyncio.run(scenario())
+
+    assert queue.get(job["_id"])["state"] == JOB_DONE
+    assert mongo["scrappedPosts"].count_documents({"status": 3}) == 10
+
+def test_worker_runs_job_and_reports_progress(mongo, queue, fake_inference):
+    add_posts(mongo, "s1", 23)
+    job, _ = queue.submit("s1")
+    worker = SessionJobWorker(queue=queue, concurrency=1, batch_size=5, batch_concurrency=1)
+
+    result = asyncio.run(worker.run_job(queue.claim_job(worker.worker_id)))
+
+    assert result["state"] == JOB_DONE
+    report = job_report(queue.get(job["_id"]))
+    assert report["status"] == JOB_DONE
+    assert report["total_posts"] == report["posts_attempted"] == report["posts_processed"] == 23
+    assert report["eta_seconds"] == 0
+    assert report["posts_per_second"] > 0
+    assert mongo["scrappedPosts"].count_documents({"status": 3}) == 23
+    assert mongo["sessionAggregates"].find_one({"sessionId": "s1"})["total_posts"] == 23
+
+def test_reprocessed_posts_are_not_stored_or_counted_twice(mongo, queue, fake_inference):
+    add_posts(mongo, "s1", 12)
+    worker = SessionJobWorker(queue=queue, concurrency=1, batch_size=5, batch_concurrency=1)
+    queue.submit("s1")
+    asyncio.run(worker.run_job(queue.claim_job(worker.worker_id)))
+
+    # Stored, but released again as after a failed status write or a reclaimed claim
+    mongo["scrappedPosts"].update_many({}, {"$set": {"status": 1}})
+    job, _ = queue.submit("s1")
+    asyncio.run(worker.run_job(queue.claim_job(worker.worker_id)))
+
+    assert mongo["socialMediaSentiment"].count_documents({}) == 12
+    assert mongo["scrappedPosts"].count_documents({"status": 3}) == 12
+    assert mongo["sessionAggregates"].find_one({"sessionId": "s1"})["total_posts"] == 12
+    assert job_report(queue.get(job["_id"]))["posts_processed"] == 12
+
+def test_job_report_eta_for_running_job():
+    started = datetime.datetime.utcnow() - datetime.timedelta(seconds=10)
+    report = job_report({
+        "_id": "job-1", "sessionId": "s1", "state": JOB_RUNNING, "total_posts": 300,
+        "posts_attempted": 100, "posts_processed": 90, "posts_failed": 10, "started_at": started,
+    })
+
+    assert report["posts_per_second"] == pytest.approx(10, rel=0.05)
+    assert report["eta_seconds"] == pytest.approx(20, rel=0.05)
+
+def test_job_report_before_start():
+    report = job_report({"_id": "job-1", "sessionId": "s1", "state": JOB_QUEUED, "total_posts": 300})
+
+    assert report["posts_attempted"] == 0
+    assert report["posts_per_second"] is None and report["eta_seconds"] is None
+
+def test_large_job_hands_its_turn_to_jobs_queued_behind_it(mongo, queue, fake_inference):
+    add_posts(mongo, "large", 40)
+    add_posts(mongo, "small", 5)
+    large, _ = queue.submit("large")
+    small, _ = queue.submit("small")
+    worker = SessionJobWorker(queue=queue, concurrency=1, batch_size=5, batch_concurrency=1, batches_per_turn=3)
+
+    result = asyncio.run(worker.run_job(queue.claim_job(worker.worker_id)))
+    assert result["state"] == JOB_QUEUED
+    assert queue.get(large["_id"])["posts_processed"] == 15
+
+    # The small session goes next, then the large one resumes where it stopped
+    next_job = queue.claim_job(worker.worker_id)
+    assert next_job["_id"] == small["_id"]
+    assert asyncio.run(worker.run_job(next_job))["state"] == JOB_DONE
+
+    while (job := queue.claim_job(worker.worker_id)) is not None:
+        asyncio.run(worker.run_job(job))
+    report = job_report(queue.get(large["_id"]))
+    assert report["status"] == JOB_DONE
+    assert report["posts_processed"] == 40
+    assert mongo["socialMediaSentiment"].count_documents({}) == 45
+    assert mongo["jobBatchSlots"].count_documents({"holder": {"$ne": None}}) == 0
+
+def test_shared_batch_budget_caps_leases_across_processes(mongo):
+    first, second = SharedBatchBudget(2, lease_seconds=60), SharedBatchBudget(2, lease_seconds=60)
+
+    leases = [asyncio.run(first.acquire()), asyncio.run(second.acquire())]
+    assert second.try_acquire("third") is None
+
+    first.release(leases[0])
+    assert second.try_acquire("third") == leases[0][0]
+
+def test_shared_batch_budget_reclaims_lapsed_leases(mongo):
+    budget = SharedBatchBudget(1, lease_seconds=60)
+    budget.try_acquire("crashed")
+    mongo["jobBatchSlots"].update_one({"_id": 0}, {"$set": {"expires_at": datetime.datetime.utcnow() - datetime.timedelta(seconds=1)}})
+
+    assert budget.try_acquire("alive") == 0
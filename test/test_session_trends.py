@@ -0,0 +1,77 @@
+import datetime
+import pytest
+from plugin.inference_client import DEFAULT_MODEL_NAME
+from utils.session_trends import fetch_session_trends, rebuild, to_utc, trend_increments
+
+
+def result(raw_id: str, moment, platform: str = "twitter", negative: float = 0.2, session_id: str = "s1") -> dict:
+    return {
+        "raw_id": raw_id,
+        "sessionId": session_id,
+        "platform": platform,
+        "datetime": moment,
+        "analysis": {"model": DEFAULT_MODEL_NAME, "scores": {"Negative": negative, "Positive": 0.8 - negative, "Neutral": 0.2}},
+    }
+
+def store(mongo, docs: list):
+    mongo["socialMediaSentiment"].insert_many(docs)
+    mongo["sessionTrends"].bulk_write(trend_increments(docs, ["minute", "hour", "day"]))
+
+DOCS = [
+    result("p1", "2025-01-01T10:15:30Z", negative=0.1),
+    result("p2", "2025-01-01T10:45:00+00:00", platform="Reddit", negative=0.3),
+    # 11:05 in UTC
+    result("p3", "2025-01-01T12:05:00+01:00", negative=0.5),
+    result("p4", datetime.datetime(2025, 1, 2, 9, 0)),
+    result("p5", "yesterday-ish"),
+]
+
+
+def test_to_utc_normalizes_timestamps():
+    assert to_utc("2025-01-01T12:05:00+01:00") == datetime.datetime(2025, 1, 1, 11, 5)
+    assert to_utc("2025-01-01T10:15:30Z") == datetime.datetime(2025, 1, 1, 10, 15, 30)
+    assert to_utc("not a date") is None and to_utc(None) is None
+
+def test_buckets_roll_up_per_granularity_and_platform(mongo):
+    store(mongo, DOCS)
+
+    [hours] = fetch_session_trends(["s1"], "hour").values()
+    assert [(bucket["bucket"], bucket["total_posts"]) for bucket in hours] == [
+        (datetime.datetime(2025, 1, 1, 10), 2),
+        (datetime.datetime(2025, 1, 1, 11), 1),
+        (datetime.datetime(2025, 1, 2, 9), 1),
+    ]
+    assert hours[0]["avg_negative"] == pytest.approx(0.2)
+    assert set(hours[0]["platforms"]) == {"twitter", "reddit"}
+    assert hours[0]["platforms"]["reddit"]["avg_negative"] == pytest.approx(0.3)
+
+    [days] = fetch_session_trends(["s1"], "day").values()
+    assert [bucket["total_posts"] for bucket in days] == [3, 1]
+    [minutes] = fetch_session_trends(["s1"], "minute").values()
+    assert len(minutes) == 4
+
+def test_range_and_platform_filters(mongo):
+    store(mongo, DOCS)
+
+    # start is truncated to its bucket; end is exclusive
+    trends = fetch_session_trends(
+        ["s1"], "hour", start=datetime.datetime(2025, 1, 1, 10, 30), end=datetime.datetime(2025, 1, 1, 11),
+    )
+    assert [bucket["bucket"] for bucket in trends["s1"]] == [datetime.datetime(2025, 1, 1, 10)]
+
+    [reddit] = fetch_session_trends(["s1"], "hour", platforms=["REDDIT"]).values()
+    assert [(bucket["total_posts"], list(bucket["platforms"])) for bucket in reddit] == [(1, ["reddit"])]
+    assert fetch_session_trends(["other"], "hour") == {}
+    assert fetch_session_trends([], "hour") == {}
+
+def test_rebuild_matches_incremental_rollups(mongo):
+    store(mongo, DOCS + [result("q1", "2025-01-01T10:00:00Z", session_id="s2")])
+    incremental = fetch_session_trends(["s1", "s2"], "hour")
+
+    mongo["sessionTrends"].update_many({}, {"$inc": {"total_posts": 100}})
+    # One row per bucket and platform: 4 minutes, 4 hours and 3 days
+    assert rebuild(["s1"], granularities=["minute", "hour", "day"]) == 4 + 4 + 3
+
+    rebuilt = fetch_session_trends(["s1", "s2"], "hour")
+    assert rebuilt["s1"] == incremental["s1"]
+    assert rebuilt["s2"][0]["total_posts"] == 101
@@ -0,0 +1,18 @@
+"""
+Session processing memory must not grow with session size. Set
+STREAMING_TEST_POSTS=1000000 for the full million-post run (about 20 minutes
+under tracemalloc).
+"""
+import os
+from benchmarks.bench_streaming_memory import measure
+
+BASELINE_POSTS = 10_000
+LARGE_POSTS = int(os.getenv("STREAMING_TEST_POSTS", "50000"))
+MAX_GROWTH = 1.5
+
+
+def test_peak_memory_is_bounded_by_batch_size():
+    baseline = measure(BASELINE_POSTS, batch_size=500)
+    large = measure(LARGE_POSTS, batch_size=500)
+
+    assert large["peak_bytes"] <= MAX_GROWTH * baseline["peak_bytes"], (baseline, large)
@@ -0,0 +1,46 @@
+import re
+import pytest
+from utils.text_cleaner import clean_text, extract_hashtags, preprocess, preprocess_batch
+
+
+def reference_clean_text(text: str, max_words: int = 200) -> str:
+    # The multi-pass version clean_text replaced; outputs must not change
+    text = text.lower()
+    text = re.sub(r"http\S+", "http", text)
+    text = re.sub(r"@\w+", "@user", text)
+    text = re.sub(r"\s+", " ", text).strip()
+    return " ".join(text.split()[:max_words])
+
+
+POSTS = [
+    "Hello World",
+    "  Check   THIS out:\thttps://t.co/AbC?x=1\n\n@Someone_1 said so  ",
+    "RT @news: breaking!!! http://example.com/path@host more",
+    "email me at me@example.com or @me",
+    " non-breaking spaces　everywhere ",
+    "İstanbul ÇOK güzel #Travel #İstanbul",
+    "#one#two #three_3 not#four",
+    "",
+    "   ",
+    "word " * 250,
+    "@a @b @c http://x http://y " * 60,
+]
+
+
+@pytest.mark.parametrize("text", POSTS)
+def test_clean_text_matches_the_multi_pass_version(text):
+    assert clean_text(text) == reference_clean_text(text)
+    assert clean_text(text, max_words=3) == reference_clean_text(text, max_words=3)
+
+@pytest.mark.parametrize("text", POSTS)
+def test_hashtags_match_a_full_scan(text):
+    assert extract_hashtags(text) == re.findall(r"#\w+", text)
+
+def test_preprocess_takes_hashtags_from_the_whole_post():
+    text = "word " * 250 + "#late"
+
+    cleaned, hashtags = preprocess(text)
+
+    assert len(cleaned.split()) == 200 and "#late" not in cleaned
+    assert hashtags == ["#late"]
+    assert preprocess_batch([text, "Hi @you #x"]) == [preprocess(text), ("hi @user #x", ["#x"])]
@@ -0,0 +1,176 @@
+"""
+Admission control for the API routes.
+
+Each route names its limits in ADMISSION_LIMITS and adds `admit("<route>")`
+to its dependencies. A request is then turned away with 429 and Retry-After,
+before any Mongo or inference work, when
+
+- its token's subject has used up its token bucket for the route
+  (rate per second, burst), or
+- the route already has its cap of requests in progress in this process.
+
+Buckets live in this process, or in Redis when ADMISSION_REDIS_URL is set so
+that worker processes and replicas share them. Concurrency caps are per
+process. A Redis outage lets requests through instead of failing them.
+"""
+import math
+import time
+from collections import OrderedDict
+from fastapi import Depends, HTTPException
+from plugin.server import ADMISSION_ENABLED, ADMISSION_LIMITS, ADMISSION_MAX_SUBJECTS, ADMISSION_REDIS_URL
+from utils.auth import require_token
+from utils.log import logging
+from utils.metrics import ADMISSION_REJECTED
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:
+    redis_asyncio = None
+
+# Refills the bucket at KEYS[1] by elapsed time x rate, then takes `cost` tokens.
+# Returns seconds to wait as a string ("0" when admitted). Time comes from the
+# Redis server so every caller agrees on it.
+_TAKE_SCRIPT = """
+local rate, burst, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local clock = redis.call("TIME")
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call("HMGET", KEYS[1], "tokens", "updated")
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / rate
+end
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "updated", tostring(now))
+redis.call("EXPIRE", KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+class MemoryBuckets:
+    """
+    Token buckets in this process, keyed by (route, subject). Only touched from
+    the event loop, so no lock is needed.
+    """
+
+    def __init__(self, max_keys: int = ADMISSION_MAX_SUBJECTS, clock=time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: float, cost: float = 1) -> float:
+        """
+        Takes `cost` tokens and returns 0, or returns the seconds until they would be there.
+        """
+        now = self.clock()
+        tokens, updated = self._buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        wait = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            wait = (cost - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            # A dropped bucket comes back full, which only ever errs towards admitting
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class RedisBuckets:
+    """
+    The same buckets in Redis, updated atomically by a Lua script. `client` is
+    any redis.asyncio-compatible client, e.g. fakeredis for local runs.
+    """
+
+    def __init__(self, client, prefix: str = "admission:"):
+        self.client = client
+        self.prefix = prefix
+
+    async def take(self, key: str, rate: float, burst: float, cost: float = 1) -> float:
+        return float(await self.client.eval(_TAKE_SCRIPT, 1, self.prefix + key, rate, burst, cost))
+
+
+class AdmissionController:
+    def __init__(self, buckets, limits: dict = ADMISSION_LIMITS):
+        self.buckets = buckets
+        self.limits = limits
+        self.in_progress = {route: 0 for route in limits}
+
+    async def _wait_for_tokens(self, route: str, subject: str, rate: float, burst: float) -> float:
+        try:
+            return await self.buckets.take(f"{route}:{subject}", rate, burst)
+        except Exception as e:
+            logging.warning(f"Rate limit store unavailable, admitting request: {str(e)}")
+            return 0.0
+
+    async def enter(self, route: str, subject: str):
+        """
+        Admits one request or raises 429. Every admitted request must `leave`.
+        """
+        rate, burst, concurrency = self.limits[route]
+        # Checked first, so requests turned away here keep their tokens
+        if self.in_progress[route] >= concurrency:
+            ADMISSION_REJECTED.labels(route, "concurrency").inc()
+            raise HTTPException(
+                status_code=429,
+                detail=f"Too many {route} requests in progress; retry shortly.",
+                headers={"Retry-After": "1"},
+            )
+        self.in_progress[route] += 1
+        try:
+            wait = await self._wait_for_tokens(route, subject, rate, burst)
+        except BaseException:
+            self.leave(route)
+            raise
+        if wait > 0:
+            self.leave(route)
+            ADMISSION_REJECTED.labels(route, "rate").inc()
+            raise HTTPException(
+                status_code=429,
+                detail=f"Rate limit exceeded for {route}; retry in {wait:.1f}s.",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
+    def leave(self, route: str):
+        self.in_progress[route] -= 1
+
+
+def _default_buckets():
+    if not ADMISSION_REDIS_URL:
+        return MemoryBuckets()
+    if redis_asyncio is None:
+        logging.warning("ADMISSION_REDIS_URL is set but the redis package is missing; rate limits are per process")
+        return MemoryBuckets()
+    return RedisBuckets(redis_asyncio.from_url(ADMISSION_REDIS_URL))
+
+
+admission = AdmissionController(_default_buckets())
+
+
+def token_subject(payload: dict) -> str:
+    return str(payload.get("sub") or payload.get("user_id") or payload.get("username") or "anonymous")
+
+def admit(route: str):
+    """
+    Route dependency applying `route`'s limits to the caller's token subject.
+    The concurrency slot is held until the response, streamed or not, is sent.
+    """
+    if route not in ADMISSION_LIMITS:
+        raise ValueError(f"No admission limits configured for route '{route}'")
+
+    async def dependency(payload: dict = Depends(require_token)):
+        if not ADMISSION_ENABLED:
+            yield
+            return
+        await admission.enter(route, token_subject(payload))
+        try:
+            yield
+        finally:
+            admission.leave(route)
+
+    return Depends(dependency)
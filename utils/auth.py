@@ -1,15 +1,19 @@
 import jwt
-import datetime
 import base64
+import hashlib
 import os
+import threading
+import time
+from collections import OrderedDict
 from dotenv import load_dotenv
-from fastapi import HTTPException
+from fastapi import HTTPException, Header
 
 # Load environment variables
 load_dotenv()
 
 SECRET_KEY = os.getenv("SECRET_KEY", "default_secret")
 ALGORITHM = "HS256"
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "4096"))
 
 # Fix base64 padding
 missing_padding = len(SECRET_KEY) % 4
@@ -18,24 +22,42 @@ if missing_padding:
 
 SECRET_KEY_DECODE = base64.b64decode(SECRET_KEY)
 
-def authenticate_token(token: str):
-    try:
-        if not token or len(token.split('.')) != 3:
-            raise HTTPException(status_code=401, detail="Malformed token")
-
-        # Decode without verifying to check exp
-        unverified_payload = jwt.decode(token, options={"verify_signature": False})
-        exp_time = datetime.datetime.utcfromtimestamp(unverified_payload["exp"])
-        current_time = datetime.datetime.utcnow()
+# sha256(token) -> (exp, payload) for tokens whose signature already checked out
+_verified_tokens = OrderedDict()
+_verified_lock = threading.Lock()
 
-        # Decode with signature
-        payload = jwt.decode(token, SECRET_KEY_DECODE, algorithms=[ALGORITHM])
 
-        if current_time > exp_time:
+def _cached_payload(digest: bytes):
+    with _verified_lock:
+        entry = _verified_tokens.get(digest)
+        if entry is None:
+            return None
+        exp, payload = entry
+        if time.time() >= exp:
+            del _verified_tokens[digest]
             raise HTTPException(status_code=401, detail="Token expired")
+        _verified_tokens.move_to_end(digest)
+        return payload
+
+def _remember(digest: bytes, payload: dict):
+    with _verified_lock:
+        _verified_tokens[digest] = (payload["exp"], payload)
+        _verified_tokens.move_to_end(digest)
+        while len(_verified_tokens) > AUTH_CACHE_SIZE:
+            _verified_tokens.popitem(last=False)
 
+def authenticate_token(token: str):
+    if not token or token.count(".") != 2:
+        raise HTTPException(status_code=401, detail="Malformed token")
+
+    digest = hashlib.sha256(token.encode("utf-8")).digest()
+    payload = _cached_payload(digest)
+    if payload is not None:
         return payload
 
+    try:
+        # One decode checks signature and exp together
+        payload = jwt.decode(token, SECRET_KEY_DECODE, algorithms=[ALGORITHM], options={"require": ["exp"]})
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.InvalidSignatureError:
@@ -44,3 +66,20 @@ def authenticate_token(token: str):
         raise HTTPException(status_code=401, detail="Token decode error")
     except Exception as e:
         raise HTTPException(status_code=401, detail=f"Authentication error: {str(e)}")
+
+    if AUTH_CACHE_SIZE > 0:
+        _remember(digest, payload)
+    return payload
+
+async def require_token(authorization: str = Header(..., description="Bearer token or raw token")) -> dict:
+    """
+    Shared route dependency: accepts "Bearer <token>" or a raw token and returns its payload.
+    """
+    # Handle both "Bearer <token>" and plain "<token>"
+    if authorization[:7].lower() == "bearer ":
+        token = authorization[7:]
+    else:
+        token = authorization
+
+    # 🔐 Validate the token
+    return authenticate_token(token)
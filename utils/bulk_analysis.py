@@ -0,0 +1,153 @@
+import asyncio
+import json
+import tempfile
+from collections import deque
+from typing import AsyncIterator, List, Tuple
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from plugin.inference_client import BULK_STREAM_CHUNK_SIZE, BULK_STREAM_INFLIGHT, BULK_STREAM_SPOOL_SIZE
+from plugin.schemas import TextInput
+from utils.inference_helpers import analyze_sentiment_batch
+
+# One input row: its position in the request and either the text or why it was rejected
+Row = Tuple[int, TextInput | str]
+
+
+async def rows_from_texts(texts: List[str], model: str) -> AsyncIterator[Row]:
+    for index, text in enumerate(texts):
+        yield index, TextInput(text=text, model=model)
+
+async def _spool_body(stream: AsyncIterator[bytes], spool, arrived: asyncio.Event, state: dict):
+    try:
+        async for data in stream:
+            spool.seek(0, 2)
+            spool.write(data)
+            arrived.set()
+    except Exception as e:
+        state["error"] = e
+    finally:
+        state["done"] = True
+        arrived.set()
+
+async def rows_from_ndjson(stream: AsyncIterator[bytes]) -> AsyncIterator[Row]:
+    """
+    Parses a request body of one TextInput JSON object per line while it arrives.
+    The body is copied to a spooled temp file as fast as the client sends it, so
+    a client that uploads everything before reading the response never blocks
+    on us, and server memory stays bounded. Blank lines are skipped.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=BULK_STREAM_SPOOL_SIZE)
+    arrived = asyncio.Event()
+    state = {"done": False, "error": None}
+    copier = asyncio.create_task(_spool_body(stream, spool, arrived, state))
+
+    index = 0
+    position = 0
+    buffer = b""
+    try:
+        while True:
+            spool.seek(position)
+            data = spool.read(65536)
+            position += len(data)
+            if not data:
+                if state["error"] is not None:
+                    raise state["error"]
+                if state["done"]:
+                    break
+                arrived.clear()
+                await arrived.wait()
+                continue
+
+            buffer += data
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield index, _parse_line(line)
+                    index += 1
+        if buffer.strip():
+            yield index, _parse_line(buffer)
+    finally:
+        copier.cancel()
+        spool.close()
+
+def _parse_line(line: bytes) -> TextInput | str:
+    try:
+        return TextInput.model_validate_json(line)
+    except ValidationError as e:
+        return f"Invalid line: {e.errors()[0]['msg']}"
+
+async def _chunks(rows: AsyncIterator[Row], size: int) -> AsyncIterator[List[Row]]:
+    chunk = []
+    async for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+async def _score_chunk(chunk: List[Row]) -> List[dict]:
+    results = {}
+    by_model = {}
+    for index, item in chunk:
+        if isinstance(item, str):
+            results[index] = {"index": index, "error": item}
+        elif not item.text.strip():
+            results[index] = {"index": index, "error": "Input text is empty."}
+        else:
+            by_model.setdefault(item.model, []).append((index, item.text))
+
+    for model, items in by_model.items():
+        try:
+            analyses = await analyze_sentiment_batch([text for _, text in items], model)
+        except HTTPException as e:
+            # The rest of the stream may still succeed, so errors are reported per row
+            analyses = [{"error": e.detail, "status_code": e.status_code}] * len(items)
+        for (index, _), analysis in zip(items, analyses):
+            results[index] = {"index": index, **analysis}
+
+    return [results[index] for index, _ in chunk]
+
+async def stream_results(rows: AsyncIterator[Row], event_stream: bool = False,
+                         chunk_size: int = BULK_STREAM_CHUNK_SIZE, inflight: int = BULK_STREAM_INFLIGHT) -> AsyncIterator[str]:
+    """
+    Scores `rows` chunk by chunk and yields one NDJSON line (or SSE event) per
+    text, in input order. Up to `inflight` chunks are scored at once and the
+    next chunk is only taken once the oldest is sent, so results held in memory
+    stay bounded by chunk_size x inflight whatever the input size.
+    """
+    pending = deque()
+
+    def encode(result: dict) -> str:
+        body = json.dumps(result)
+        return f"data: {body}\n\n" if event_stream else f"{body}\n"
+
+    try:
+        async for chunk in _chunks(rows, chunk_size):
+            pending.append(asyncio.create_task(_score_chunk(chunk)))
+            if len(pending) >= inflight:
+                for result in await pending.popleft():
+                    yield encode(result)
+        while pending:
+            for result in await pending.popleft():
+                yield encode(result)
+        if event_stream:
+            yield "event: done\ndata: {}\n\n"
+    finally:
+        # Client went away: stop scoring chunks nobody will read
+        for task in pending:
+            task.cancel()
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse for bodies produced while the request body is still being
+    read. Starlette's disconnect listener would take the request's body messages
+    off `receive`, so here a disconnect surfaces from request.stream() instead.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
@@ -0,0 +1,112 @@
+"""
+Summary and ranking reports over a columnar export (see utils.sentiment_export),
+so large historical reports read files instead of the production database.
+
+Only the needed columns are scanned, batch by batch, and each batch is folded
+into per-session totals with Arrow's vectorized group-by, so memory grows with
+the number of sessions, not the number of posts. Filters on sessions, post
+time and platform are pushed down to the file scan.
+
+    python -m utils.export_reader DIR summary [--session-id ID ...] [--start ISO] [--end ISO] [--platform NAME ...]
+    python -m utils.export_reader DIR ranking [--session-id ID ...] [--min-posts N] ...
+
+Without --session-id the report covers every session in the export.
+"""
+import argparse
+import datetime
+import functools
+import json
+import operator
+import os
+import sys
+from typing import Dict, List, Optional
+from plugin.db import EXPORT_CHUNK_SIZE
+from utils.sentiment_export import PYARROW_AVAILABLE, SCHEMA, SCORE_COLUMNS, load_manifest
+from utils.session_reports import rank_sessions, summarize_sessions
+from utils.session_trends import to_utc
+
+if PYARROW_AVAILABLE:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+_DATASET_FORMATS = {"parquet": "parquet", "arrow": "ipc"}
+
+
+def open_export(directory: str) -> "ds.Dataset":
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError("Reading exports needs pyarrow: pip install pyarrow")
+    manifest = load_manifest(directory)
+    if manifest is None:
+        raise FileNotFoundError(f"No export manifest in {directory}")
+    files = [os.path.join(directory, part["name"]) for part in manifest["files"]]
+    return ds.dataset(files, schema=SCHEMA, format=_DATASET_FORMATS[manifest["format"]])
+
+def _filter(session_ids: Optional[List[str]], start: Optional[datetime.datetime], end: Optional[datetime.datetime],
+            platforms: Optional[List[str]]):
+    conditions = []
+    if session_ids:
+        conditions.append(ds.field("sessionId").isin(list(session_ids)))
+    if start is not None:
+        conditions.append(ds.field("datetime") >= pa.scalar(to_utc(start), SCHEMA.field("datetime").type))
+    if end is not None:
+        conditions.append(ds.field("datetime") < pa.scalar(to_utc(end), SCHEMA.field("datetime").type))
+    if platforms:
+        conditions.append(ds.field("platform").isin([platform.lower() for platform in platforms]))
+    return functools.reduce(operator.and_, conditions) if conditions else None
+
+def export_session_stats(directory: str, session_ids: Optional[List[str]] = None,
+                         start: Optional[datetime.datetime] = None, end: Optional[datetime.datetime] = None,
+                         platforms: Optional[List[str]] = None, batch_size: int = EXPORT_CHUNK_SIZE) -> Dict[str, dict]:
+    """
+    {session_id: stats} in the shape of fetch_session_aggregates, for sessions
+    with exported posts in [start, end). Missing scores count as 0.
+    """
+    scanner = open_export(directory).scanner(
+        columns=["sessionId", "keyword", *SCORE_COLUMNS],
+        filter=_filter(session_ids, start, end, platforms),
+        batch_size=batch_size,
+    )
+    aggregations = [("sessionId", "count"), ("keyword", "max")] + [(column, "sum") for column in SCORE_COLUMNS]
+
+    totals: Dict[str, dict] = {}
+    for batch in scanner.to_batches():
+        if not batch.num_rows:
+            continue
+        grouped = pa.Table.from_batches([batch]).group_by("sessionId").aggregate(aggregations)
+        for row in grouped.to_pylist():
+            stats = totals.setdefault(row["sessionId"], {"total_posts": 0, **{f"total_{column}": 0.0 for column in SCORE_COLUMNS}})
+            stats["total_posts"] += row["sessionId_count"]
+            stats["keyword"] = row["keyword_max"] or "Unknown"
+            for column in SCORE_COLUMNS:
+                stats[f"total_{column}"] += row[f"{column}_sum"] or 0.0
+
+    for stats in totals.values():
+        for column in SCORE_COLUMNS:
+            stats[f"avg_{column}"] = stats[f"total_{column}"] / stats["total_posts"]
+    return totals
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory")
+    parser.add_argument("report", choices=["summary", "ranking"])
+    parser.add_argument("--session-id", action="append", dest="session_ids", help="Limit to these sessions (repeatable)")
+    parser.add_argument("--start", type=datetime.datetime.fromisoformat, help="Only posts at or after this UTC time")
+    parser.add_argument("--end", type=datetime.datetime.fromisoformat, help="Only posts before this UTC time")
+    parser.add_argument("--platform", action="append", dest="platforms", help="Limit to these platforms (repeatable)")
+    parser.add_argument("--min-posts", type=int, default=3, help="Minimum number of posts to rank a session")
+    args = parser.parse_args()
+
+    stats = export_session_stats(args.directory, args.session_ids, args.start, args.end, args.platforms)
+    session_ids = args.session_ids or sorted(stats)
+    if args.report == "summary":
+        report = summarize_sessions(session_ids, stats)
+    else:
+        report = rank_sessions(session_ids, stats, args.min_posts)
+    if not report:
+        print("No sentiment data found for the requested sessions", file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""
+Bounded top-k hashtag index per session in `hashtagSketches`.
+
+Each (session, model) row holds a Space-Saving summary: at most
+HASHTAG_SKETCH_SIZE counters of (count, error, score sums), so a viral session
+with millions of distinct tags still costs one small document. Any tag used
+more than total/size times is guaranteed a counter, counts never undershoot,
+and each count overshoots by at most its `error`. Sentiment means cover only
+the posts seen while the tag held its counter.
+
+SentimentWriter merges every flush into the session's row, so no row is
+shared by all writers. Top-k across all sessions reads one rollup per model in
+`hashtagRollups`: the merge of every session row, redone by the job workers
+every HASHTAG_ROLLUP_INTERVAL seconds when a row changed. Rebuild rows from
+socialMediaSentiment, or refresh the rollup now, with:
+
+    python -m utils.hashtag_sketches rebuild [--session-id ID ...] [--model MODEL]
+    python -m utils.hashtag_sketches rollup [--model MODEL]
+"""
+import argparse
+import datetime
+import heapq
+import random
+import time
+from typing import Dict, Iterable, List, Optional
+from pymongo.errors import DuplicateKeyError
+from plugin.db import (
+    hashtag_rollups,
+    hashtag_sketches,
+    sentiment_data,
+    HASHTAG_ROLLUP_INTERVAL,
+    HASHTAG_SKETCH_SIZE,
+    MONGO_READ_BATCH_SIZE,
+)
+from plugin.inference_client import DEFAULT_MODEL_NAME
+from utils.log import logging
+from utils.session_stats import SCORE_FIELDS
+
+SCORE_TOTALS = [f"total_{field.lower()}" for field in SCORE_FIELDS]
+# Versioned writes of one row that lost to another writer before a flush gives up on it
+MAX_SAVE_ATTEMPTS = 20
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy-hitter summary with per-tag sentiment score sums.
+    """
+
+    def __init__(self, capacity: int = HASHTAG_SKETCH_SIZE, counters: Optional[Dict[str, dict]] = None, total: int = 0):
+        self.capacity = capacity
+        self.counters = counters or {}
+        self.total = total
+
+    @classmethod
+    def from_doc(cls, doc: Optional[dict], capacity: int = HASHTAG_SKETCH_SIZE) -> "SpaceSaving":
+        if not doc:
+            return cls(capacity)
+        counters = {counter.pop("tag"): counter for counter in doc.get("counters", [])}
+        return cls(capacity, counters, doc.get("total", 0))
+
+    def to_doc(self) -> dict:
+        return {
+            "counters": [{"tag": tag, **counter} for tag, counter in self.counters.items()],
+            "total": self.total,
+            "size": len(self.counters),
+        }
+
+    def update_many(self, updates: Dict[str, dict]):
+        """
+        Adds {tag: {"count": n, "total_negative": ..., ...}} from one batch of posts.
+        """
+        heap = None
+        for tag, update in updates.items():
+            self.total += update["count"]
+            counter = self.counters.get(tag)
+            if counter is None:
+                if len(self.counters) < self.capacity:
+                    counter = self.counters[tag] = {"count": 0, "error": 0, **dict.fromkeys(SCORE_TOTALS, 0.0)}
+                else:
+                    # Replace the smallest counter; the new tag may have been it all along
+                    if heap is None:
+                        heap = [(existing["count"], name) for name, existing in self.counters.items()]
+                        heapq.heapify(heap)
+                    while True:
+                        count, name = heapq.heappop(heap)
+                        if name in self.counters and self.counters[name]["count"] == count:
+                            break
+                    del self.counters[name]
+                    counter = self.counters[tag] = {"count": count, "error": count, **dict.fromkeys(SCORE_TOTALS, 0.0)}
+            counter["count"] += update["count"]
+            for field in SCORE_TOTALS:
+                counter[field] += update[field]
+            if heap is not None:
+                heapq.heappush(heap, (counter["count"], tag))
+
+    def merge(self, other: "SpaceSaving"):
+        """
+        Folds another summary into this one. A tag missing from a full summary
+        may still have up to its smallest count there, which goes into `error`.
+        """
+        self_floor = min((c["count"] for c in self.counters.values()), default=0) if len(self.counters) >= self.capacity else 0
+        other_floor = min((c["count"] for c in other.counters.values()), default=0) if len(other.counters) >= other.capacity else 0
+        merged = {}
+        for tag in set(self.counters) | set(other.counters):
+            mine, theirs = self.counters.get(tag), other.counters.get(tag)
+            counter = {"count": 0, "error": 0, **dict.fromkeys(SCORE_TOTALS, 0.0)}
+            for found, floor in ((mine, self_floor), (theirs, other_floor)):
+                if found is None:
+                    counter["count"] += floor
+                    counter["error"] += floor
+                else:
+                    for field in counter:
+                        counter[field] += found[field]
+            merged[tag] = counter
+        self.counters = dict(heapq.nlargest(self.capacity, merged.items(), key=lambda item: item[1]["count"]))
+        self.total += other.total
+
+    def top(self, k: int) -> List[dict]:
+        results = []
+        for tag, counter in heapq.nlargest(k, self.counters.items(), key=lambda item: item[1]["count"]):
+            observed = counter["count"] - counter["error"]
+            result = {"hashtag": tag, "count": counter["count"], "error": counter["error"]}
+            for field in SCORE_FIELDS:
+                name = field.lower()
+                result[f"avg_{name}"] = round(counter[f"total_{name}"] / observed, 4) if observed > 0 else None
+            results.append(result)
+        return results
+
+
+def hashtag_updates(docs: Iterable[dict]) -> Dict[tuple, Dict[str, dict]]:
+    """
+    Per-batch tag counts and score sums keyed by (session, model).
+    A tag counts once per post, case-insensitively.
+    """
+    updates = {}
+    for doc in docs:
+        tags = {tag.lower() for tag in doc.get("hashtags") or ()}
+        if not tags:
+            continue
+        analysis = doc.get("analysis") or {}
+        scores = analysis.get("scores") or {}
+        counters = updates.setdefault((doc["sessionId"], analysis.get("model")), {})
+        for tag in tags:
+            update = counters.setdefault(tag, {"count": 0, **dict.fromkeys(SCORE_TOTALS, 0.0)})
+            update["count"] += 1
+            for field in SCORE_FIELDS:
+                update[f"total_{field.lower()}"] += scores.get(field, 0.0)
+    return updates
+
+def _save(session_id: str, model: str, change) -> bool:
+    """
+    Read-modify-write of one row, guarded by its version number and retried
+    up to MAX_SAVE_ATTEMPTS times. One job writes a session at a time, so
+    conflicts are rare (a concurrent rebuild) and short-lived.
+    `change(sketch)` applies the update in memory. Returns False when it gave up.
+    """
+    key = {"sessionId": session_id, "model": model}
+    for attempt in range(1, MAX_SAVE_ATTEMPTS + 1):
+        doc = hashtag_sketches.find_one(key)
+        sketch = SpaceSaving.from_doc(doc)
+        change(sketch)
+        values = {**sketch.to_doc(), "updated_at": datetime.datetime.utcnow()}
+        if doc is None:
+            try:
+                hashtag_sketches.insert_one({**key, **values, "version": 1})
+                return True
+            except DuplicateKeyError:
+                pass
+        elif hashtag_sketches.update_one({**key, "version": doc["version"]}, {"$set": values, "$inc": {"version": 1}}).matched_count:
+            return True
+        time.sleep(random.uniform(0, min(0.5, 0.01 * attempt)))
+
+    logging.error(
+        f"Hashtag sketch {session_id}/{model} changed underneath {MAX_SAVE_ATTEMPTS} updates in a row; dropped this update. "
+        f"Run `python -m utils.hashtag_sketches rebuild --session-id {session_id} --model {model}` to restore it"
+    )
+    return False
+
+def apply_hashtag_updates(updates: Dict[tuple, Dict[str, dict]]):
+    for (session_id, model), counters in updates.items():
+        _save(session_id, model, lambda sketch, counters=counters: sketch.update_many(counters))
+
+def rollup(model: str = DEFAULT_MODEL_NAME) -> int:
+    """
+    Merges every session row of `model` into its all-sessions rollup.
+    Returns the number of sessions merged.
+    """
+    started = datetime.datetime.utcnow()
+    # Rows stream through the merge one at a time, so memory stays at two sketches
+    docs = hashtag_sketches.find({"model": model}, {"_id": 0, "counters": 1, "total": 1}, batch_size=MONGO_READ_BATCH_SIZE)
+    sketch, sessions = SpaceSaving(), 0
+    for doc in docs:
+        sketch.merge(SpaceSaving.from_doc(doc))
+        sessions += 1
+
+    # Rows updated from `started` on are picked up by the next rollup
+    hashtag_rollups.update_one(
+        {"_id": model},
+        {"$set": {**sketch.to_doc(), "sessions": sessions, "rolled_up_at": started}},
+        upsert=True,
+    )
+    return sessions
+
+def refresh_rollups(interval: float = HASHTAG_ROLLUP_INTERVAL) -> int:
+    """
+    Redoes the rollup of each model whose session rows changed since its last
+    rollup, at most once per `interval` seconds across every process.
+    Returns the number of rollups redone.
+    """
+    refreshed = 0
+    for model in hashtag_sketches.distinct("model"):
+        now = datetime.datetime.utcnow()
+        try:
+            # Whoever moves claimed_at forward does this round; the upsert of a claimed rollup collides on _id
+            hashtag_rollups.update_one(
+                {"_id": model, "claimed_at": {"$not": {"$gt": now - datetime.timedelta(seconds=interval)}}},
+                {"$set": {"claimed_at": now}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            continue
+
+        previous = hashtag_rollups.find_one({"_id": model}, {"rolled_up_at": 1})
+        changed = {"model": model}
+        if previous.get("rolled_up_at") is not None:
+            changed["updated_at"] = {"$gte": previous["rolled_up_at"]}
+        if hashtag_sketches.find_one(changed, {"_id": 1}) is None:
+            continue
+        rollup(model)
+        refreshed += 1
+    return refreshed
+
+def fetch_top_hashtags(session_ids: Optional[List[str]], k: int, model: str = DEFAULT_MODEL_NAME) -> Optional[dict]:
+    """
+    Top `k` hashtags over the given sessions, or across all sessions when
+    `session_ids` is empty. The all-sessions answer comes from the rollup, up
+    to HASHTAG_ROLLUP_INTERVAL seconds behind, and says when it was rolled up.
+    Returns None when there is no data.
+    """
+    if not session_ids:
+        doc = hashtag_rollups.find_one({"_id": model, "rolled_up_at": {"$exists": True}})
+        if doc is None:
+            # No rollup yet: build the first one now
+            if not rollup(model):
+                return None
+            doc = hashtag_rollups.find_one({"_id": model})
+        if not doc["sessions"]:
+            return None
+        return {"session_ids": [], "rolled_up_at": doc["rolled_up_at"], **_top_of(SpaceSaving.from_doc(doc), k)}
+
+    docs = hashtag_sketches.find(
+        {"sessionId": {"$in": list(dict.fromkeys(session_ids))}, "model": model},
+        {"_id": 0, "sessionId": 1, "counters": 1, "total": 1},
+    )
+    sketch, merged_ids = None, []
+    for doc in docs:
+        merged_ids.append(doc["sessionId"])
+        if sketch is None:
+            sketch = SpaceSaving.from_doc(doc)
+        else:
+            sketch.merge(SpaceSaving.from_doc(doc))
+    if sketch is None:
+        return None
+    return {"session_ids": sorted(merged_ids), **_top_of(sketch, k)}
+
+def _top_of(sketch: SpaceSaving, k: int) -> dict:
+    return {
+        "tagged_posts": sketch.total,
+        # With every tag still counted, counts are exact
+        "exact": all(counter["error"] == 0 for counter in sketch.counters.values()),
+        "hashtags": sketch.top(k),
+    }
+
+def rebuild(session_ids: Optional[List[str]] = None, model: str = DEFAULT_MODEL_NAME) -> int:
+    """
+    Recomputes session rows from socialMediaSentiment, replaces them and
+    redoes the model's rollup. Returns rows written.
+    """
+    query = {"analysis.model": model, "hashtags.0": {"$exists": True}}
+    if session_ids is not None:
+        query["sessionId"] = {"$in": list(session_ids)}
+    docs = sentiment_data.find(
+        query, {"_id": 0, "sessionId": 1, "hashtags": 1, "analysis.model": 1, "analysis.scores": 1},
+        batch_size=MONGO_READ_BATCH_SIZE,
+    )
+
+    sketches: Dict[str, SpaceSaving] = {}
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= MONGO_READ_BATCH_SIZE:
+            _fold_into(sketches, batch)
+            batch = []
+    _fold_into(sketches, batch)
+
+    stale = {"model": model}
+    if session_ids is not None:
+        stale["sessionId"] = {"$in": list(session_ids)}
+    hashtag_sketches.delete_many(stale)
+    now = datetime.datetime.utcnow()
+    for scope, sketch in sketches.items():
+        hashtag_sketches.insert_one({"sessionId": scope, "model": model, **sketch.to_doc(), "updated_at": now, "version": 1})
+    rollup(model)
+    return len(sketches)
+
+def _fold_into(sketches: Dict[str, SpaceSaving], docs: List[dict]):
+    for (session_id, _), counters in hashtag_updates(docs).items():
+        sketches.setdefault(session_id, SpaceSaving()).update_many(counters)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["rebuild", "rollup"])
+    parser.add_argument("--session-id", action="append", dest="session_ids", help="Limit rebuild to these sessions (repeatable)")
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    args = parser.parse_args()
+
+    if args.command == "rollup":
+        sessions = rollup(args.model)
+        logging.info(f"Rolled up hashtag sketches of {sessions} sessions for {args.model}")
+        return
+    written = rebuild(args.session_ids, args.model)
+    logging.info(f"Rebuilt {written} hashtag sketch rows for {args.model}")
+
+
+if __name__ == "__main__":
+    main()
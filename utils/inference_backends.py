@@ -0,0 +1,230 @@
+import asyncio
+import multiprocessing
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+import httpx
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from plugin.inference_client import (
+    INFERENCE_API_URL,
+    INFERENCE_BATCH_API_URL,
+    INFERENCE_RETRIES,
+    INFERENCE_BACKEND,
+    INFERENCE_MODEL_BACKENDS,
+    LOCAL_MODEL_NAME,
+    LOCAL_MODEL_PATH,
+    LOCAL_MODEL_WORKERS,
+)
+from plugin.http_client import get_http_client
+from utils import local_model
+from utils.inference_resilience import (
+    RETRYABLE_STATUS,
+    InferenceUnavailable,
+    backoff_delay,
+    inference_breaker,
+    inference_limiter,
+)
+from utils.log import logging
+from utils.metrics import INFERENCE_ERRORS, INFERENCE_IN_FLIGHT, INFERENCE_LATENCY, INFERENCE_RETRY_COUNT, http_error_reason
+
+
+class InferenceBackend(ABC):
+    """
+    Scores cleaned texts for one model. Results use the inference server's
+    shape: {"model", "text", "scores": {label: probability}}.
+    """
+
+    name = ""
+
+    async def infer_one(self, text: str, model: str) -> Dict:
+        return (await self.infer_batch([text], model))[0]
+
+    @abstractmethod
+    async def infer_batch(self, texts: List[str], model: str) -> List[Dict]:
+        """
+        Results for `texts`, in order.
+        """
+
+    async def close(self):
+        pass
+
+
+class RemoteBackend(InferenceBackend):
+    """
+    The HTTP inference server, with retries, the circuit breaker and the
+    adaptive concurrency limit in front of it.
+    """
+
+    name = "remote"
+
+    def __init__(self):
+        # Flipped off the first time the inference server answers the batch URL with 404/405
+        self.batch_endpoint_available = True
+
+    async def _attempt(self, url: str, payload: dict, endpoint: str, kind: str) -> httpx.Response:
+        model = payload["model"]
+        # In-flight calls per worker process follow the adaptive (AIMD) limit
+        started = await inference_limiter.acquire()
+        ok = False
+        try:
+            with INFERENCE_IN_FLIGHT.track_inprogress():
+                response = await get_http_client().post(url, json=payload)
+            ok = response.status_code not in RETRYABLE_STATUS
+        except httpx.TimeoutException:
+            INFERENCE_ERRORS.labels(model, endpoint, "timeout").inc()
+            raise
+        except Exception:
+            INFERENCE_ERRORS.labels(model, endpoint, "transport").inc()
+            raise
+        finally:
+            inference_limiter.release(started, kind, ok)
+
+        INFERENCE_LATENCY.labels(model, endpoint).observe(time.monotonic() - started)
+        if response.status_code != 200:
+            INFERENCE_ERRORS.labels(model, endpoint, http_error_reason(response.status_code)).inc()
+        return response
+
+    async def _post(self, url: str, payload: dict, endpoint: str) -> httpx.Response:
+        """
+        POSTs to the inference server. Timeouts, connection errors and 429/502/503/504
+        are retried with jittered backoff; scoring is idempotent, so a retry only costs time.
+        Raises InferenceUnavailable once the circuit is open or every attempt failed.
+        """
+        # Batch latency grows with batch size, so the limiter compares like with like
+        kind = f"{endpoint}:{len(payload.get('texts', ())).bit_length()}"
+        for attempt in range(INFERENCE_RETRIES + 1):
+            inference_breaker.before_call()
+            retry_after = None
+            try:
+                response = await self._attempt(url, payload, endpoint, kind)
+            except httpx.TimeoutException as e:
+                error = InferenceUnavailable(f"Inference API timed out: {e!r}", status_code=504)
+            except httpx.TransportError as e:
+                error = InferenceUnavailable(f"Error calling inference API: {e!r}")
+            except Exception:
+                inference_breaker.record_failure()
+                raise
+            except BaseException:
+                # Cancelled: no verdict on the server, but a probe must not stay claimed
+                inference_breaker.release_probe()
+                raise
+            else:
+                if response.status_code not in RETRYABLE_STATUS:
+                    inference_breaker.record_success()
+                    return response
+                error = InferenceUnavailable(f"Inference API returned status {response.status_code}: {response.text}")
+                retry_after = response.headers.get("Retry-After")
+
+            inference_breaker.record_failure()
+            if attempt < INFERENCE_RETRIES:
+                INFERENCE_RETRY_COUNT.labels(payload["model"], endpoint).inc()
+                await asyncio.sleep(backoff_delay(attempt, retry_after))
+        raise error
+
+    async def infer_one(self, text: str, model: str) -> Dict:
+        try:
+            response = await self._post(INFERENCE_API_URL, {
+                "text": text,
+                "model": model
+            }, "single")
+            if response.status_code != 200:
+                raise Exception(f"Inference API returned status {response.status_code}: {response.text}")
+            return response.json()
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error calling inference API: {e}")
+
+    async def _post_batch(self, texts: List[str], model: str) -> List[Dict] | None:
+        """
+        Sends one chunk to the batch endpoint. Returns None when the server has no batch endpoint.
+        """
+        response = await self._post(INFERENCE_BATCH_API_URL, {"texts": texts, "model": model}, "batch")
+        if response.status_code in (404, 405):
+            logging.warning("Inference batch endpoint unavailable, falling back to per-text calls.")
+            self.batch_endpoint_available = False
+            return None
+        if response.status_code != 200:
+            raise Exception(f"Inference API returned status {response.status_code}: {response.text}")
+
+        body = response.json()
+        results = body.get("results") if isinstance(body, dict) else body
+        if not isinstance(results, list) or len(results) != len(texts):
+            raise Exception("Inference batch response does not match the number of texts sent")
+        return results
+
+    async def infer_batch(self, texts: List[str], model: str) -> List[Dict]:
+        results = await self._post_batch(texts, model) if self.batch_endpoint_available else None
+        if results is None:
+            results = await asyncio.gather(*(self.infer_one(text, model) for text in texts))
+        return list(results)
+
+
+class LocalBackend(InferenceBackend):
+    """
+    Scores texts with utils.local_model in a pool of worker processes, so
+    CPU-bound scoring never blocks the event loop. With LOCAL_MODEL_WORKERS=0
+    it runs in the API process's thread pool instead. Results carry
+    LOCAL_MODEL_NAME as their model, whichever model was routed here.
+    """
+
+    name = "local"
+
+    def __init__(self, workers: int = LOCAL_MODEL_WORKERS, model_path: str = LOCAL_MODEL_PATH,
+                 model_name: str = LOCAL_MODEL_NAME):
+        self.workers = workers
+        self.model_path = model_path
+        self.model_name = model_name
+        self._pool = None
+        self._loaded = False
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a process that runs an event loop and holds sockets is not safe
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=local_model.init_worker,
+                initargs=(self.model_path,),
+            )
+        return self._pool
+
+    async def infer_batch(self, texts: List[str], model: str) -> List[Dict]:
+        started = time.monotonic()
+        try:
+            if self.workers > 0:
+                loop = asyncio.get_running_loop()
+                results = await loop.run_in_executor(self._get_pool(), local_model.score_texts, texts, self.model_name)
+            else:
+                if not self._loaded:
+                    local_model.init_worker(self.model_path)
+                    self._loaded = True
+                results = await run_in_threadpool(local_model.score_texts, texts, self.model_name)
+        except Exception as e:
+            INFERENCE_ERRORS.labels(model, self.name, "local").inc()
+            raise HTTPException(status_code=500, detail=f"Error running local model: {e!r}")
+        INFERENCE_LATENCY.labels(model, self.name).observe(time.monotonic() - started)
+        return results
+
+    async def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+
+BACKENDS = {backend.name: backend for backend in (RemoteBackend(), LocalBackend())}
+
+
+def get_backend(model: str) -> InferenceBackend:
+    name = INFERENCE_MODEL_BACKENDS.get(model, INFERENCE_BACKEND)
+    backend = BACKENDS.get(name)
+    if backend is None:
+        raise HTTPException(status_code=500, detail=f"Unknown inference backend '{name}' for model '{model}'")
+    return backend
+
+
+async def close_backends():
+    for backend in BACKENDS.values():
+        await backend.close()
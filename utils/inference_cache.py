@@ -0,0 +1,231 @@
+import datetime
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable
+from starlette.concurrency import run_in_threadpool
+from plugin.inference_client import (
+    INFERENCE_CACHE_SIZE,
+    INFERENCE_CACHE_TTL,
+    INFERENCE_CACHE_BACKEND,
+    INFERENCE_CACHE_PRUNE_INTERVAL,
+    INFERENCE_CACHE_SQLITE_PATH,
+)
+from utils.log import logging
+
+
+def cache_key(backend: str, model: str, cleaned_text: str) -> str:
+    # The backend is part of the key: a model routed to another backend scores differently
+    return hashlib.sha256(f"{backend}\x00{model}\x00{cleaned_text}".encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """
+    In-process tier: bounded by entry count, entries expire after `ttl` seconds.
+    """
+
+    def __init__(self, max_size: int = INFERENCE_CACHE_SIZE, ttl: float = INFERENCE_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteTier:
+    """
+    Persistent tier in a local SQLite file, shared by workers on the same host.
+    """
+
+    def __init__(self, path: str = INFERENCE_CACHE_SQLITE_PATH, ttl: float = INFERENCE_CACHE_TTL,
+                 prune_interval: float = INFERENCE_CACHE_PRUNE_INTERVAL):
+        self.ttl = ttl
+        self.prune_interval = prune_interval
+        self._last_prune = time.monotonic()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS inference_cache (key TEXT PRIMARY KEY, result TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS inference_cache_created_at ON inference_cache (created_at)")
+
+    def get_many(self, keys: list) -> Dict[str, dict]:
+        oldest = time.time() - self.ttl
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, result FROM inference_cache WHERE key IN ({placeholders}) AND created_at >= ?",
+                [*keys, oldest],
+            ).fetchall()
+        return {key: json.loads(result) for key, result in rows}
+
+    def put_many(self, items: Dict[str, dict]):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO inference_cache (key, result, created_at) VALUES (?, ?, ?)",
+                [(key, json.dumps(result), now) for key, result in items.items()],
+            )
+            if time.monotonic() - self._last_prune >= self.prune_interval:
+                self.prune(now)
+
+    def prune(self, now: float | None = None) -> int:
+        """
+        Deletes expired entries (an index range scan on created_at). Callers hold the lock.
+        """
+        self._last_prune = time.monotonic()
+        cursor = self._conn.execute("DELETE FROM inference_cache WHERE created_at < ?", ((now or time.time()) - self.ttl,))
+        return cursor.rowcount
+
+
+class MongoTier:
+    """
+    Persistent tier in the `inferenceCache` collection; a TTL index drops old
+    entries. The TTL monitor only runs once a minute, so reads check age too.
+    """
+
+    def __init__(self, ttl: float = INFERENCE_CACHE_TTL):
+        from plugin.db import db
+
+        self.ttl = ttl
+        self.collection = db["inferenceCache"]
+        self.collection.create_index("created_at", expireAfterSeconds=int(ttl), name="created_at_ttl")
+
+    def get_many(self, keys: list) -> Dict[str, dict]:
+        oldest = datetime.datetime.utcnow() - datetime.timedelta(seconds=self.ttl)
+        return {doc["_id"]: doc["result"] for doc in self.collection.find({"_id": {"$in": keys}, "created_at": {"$gte": oldest}})}
+
+    def put_many(self, items: Dict[str, dict]):
+        from pymongo import UpdateOne
+
+        # TTL indexes only expire BSON dates
+        now = datetime.datetime.utcnow()
+        operations = [
+            UpdateOne({"_id": key}, {"$set": {"result": result, "created_at": now}}, upsert=True)
+            for key, result in items.items()
+        ]
+        self.collection.bulk_write(operations, ordered=False)
+
+
+class InferenceCache:
+    """
+    LRU tier in front of an optional persistent tier, with hit/miss/eviction counters.
+    The persistent tier is opened by `open_persistent` on first use in each
+    process, never at import: its SQLite connection or MongoClient must not be
+    inherited across fork(), and opening it may touch the network.
+    """
+
+    def __init__(self, memory: LRUCache, persistent=None, open_persistent=None):
+        self.memory = memory
+        self.persistent = persistent
+        self._open_persistent = open_persistent
+        self._persistent_pid = None
+        self._open_lock = threading.Lock()
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, dict]:
+        found = {}
+        remaining = []
+        for key in keys:
+            value = self.memory.get(key)
+            if value is None:
+                remaining.append(key)
+            else:
+                found[key] = value
+        self.hits += len(found)
+
+        persistent = await self._persistent_tier() if remaining else None
+        if persistent is not None:
+            try:
+                stored = await run_in_threadpool(persistent.get_many, remaining)
+            except Exception as e:
+                logging.error(f"Inference cache lookup failed: {e}")
+                stored = {}
+            for key, value in stored.items():
+                self.memory.put(key, value)
+            found.update(stored)
+            self.persistent_hits += len(stored)
+
+        self.misses += sum(1 for key in remaining if key not in found)
+        return found
+
+    async def put_many(self, items: Dict[str, dict]):
+        for key, value in items.items():
+            self.memory.put(key, value)
+        persistent = await self._persistent_tier() if items else None
+        if persistent is not None:
+            try:
+                await run_in_threadpool(persistent.put_many, items)
+            except Exception as e:
+                logging.error(f"Inference cache write failed: {e}")
+
+    async def _persistent_tier(self):
+        if self._open_persistent is not None and self._persistent_pid != os.getpid():
+            await run_in_threadpool(self._open)
+        return self.persistent
+
+    def _open(self):
+        with self._open_lock:
+            if self._persistent_pid == os.getpid():
+                return
+            # A failed open is not retried; this process runs on the memory tier alone
+            self._persistent_pid = os.getpid()
+            try:
+                self.persistent = self._open_persistent()
+            except Exception as e:
+                self.persistent = None
+                logging.error(f"❌ Error opening {INFERENCE_CACHE_BACKEND} inference cache, using memory only: {e}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.persistent_hits + self.misses
+        return {
+            "hits": self.hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "evictions": self.memory.evictions,
+            "expirations": self.memory.expirations,
+            "size": len(self.memory),
+            "hit_ratio": round((self.hits + self.persistent_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+def _build_cache() -> InferenceCache | None:
+    if INFERENCE_CACHE_SIZE <= 0:
+        return None
+    tiers = {"sqlite": SQLiteTier, "mongo": MongoTier}
+    return InferenceCache(LRUCache(), open_persistent=tiers.get(INFERENCE_CACHE_BACKEND))
+
+
+inference_cache = _build_cache()
@@ -1,28 +1,49 @@
-from plugin.inference_client import INFERENCE_API_URL, DEFAULT_MODEL_NAME
-from typing import Dict
-import requests
+import asyncio
+from plugin.inference_client import (
+    INFERENCE_BATCH_SIZE,
+    DEFAULT_MODEL_NAME,
+)
+from typing import Dict, List
 from fastapi import HTTPException
+from utils.inference_backends import get_backend
+from utils.inference_cache import cache_key, inference_cache
 from utils.text_cleaner import clean_text
 
+async def analyze_sentiment_batch(texts: List[str], model: str = DEFAULT_MODEL_NAME, batch_size: int = INFERENCE_BATCH_SIZE,
+                                  cleaned: bool = False) -> List[Dict]:
+    """
+    Scores a list of texts in chunks of `batch_size`, returning results in input order.
+    Duplicate texts and cached results are not sent to the model; the remaining
+    chunks go to the model's backend concurrently.
+    """
+    cleaned_texts = texts if cleaned else [clean_text(text) for text in texts]
+    backend = get_backend(model)
+    keys = [cache_key(backend.name, model, text) for text in cleaned_texts]
 
-def analyze_sentiment_remote(text: str, model: str = DEFAULT_MODEL_NAME) -> Dict:
+    # Each distinct text reaches the model at most once per call
+    unique = dict(zip(keys, cleaned_texts))
+    results_by_key = await inference_cache.get_many(list(unique)) if inference_cache is not None else {}
+    pending_keys = [key for key in unique if key not in results_by_key]
+    pending = [unique[key] for key in pending_keys]
+
+    chunks = [pending[start:start + batch_size] for start in range(0, len(pending), batch_size)]
     try:
-        response = requests.post(INFERENCE_API_URL, json={
-            "text": clean_text(text),
-            "model": model
-        })
-        if response.status_code != 200:
-            raise Exception(f"Inference API returned status {response.status_code}: {response.text}")
-        return response.json()
+        chunk_results = await asyncio.gather(*(backend.infer_batch(chunk, model) for chunk in chunks))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error calling inference API: {e}")
 
-def extract_text_by_platform(doc: dict) -> str:
-    platform = doc.get("platform", "").lower()
-    if platform == "twitter":
-        return doc.get("text", "")
-    elif platform == "youtube":
-        return doc.get("metadata", "")
-    elif platform == "reddit":
-        return doc.get("content", "")
-    return ""
\ No newline at end of file
+    fresh = dict(zip(pending_keys, (result for results in chunk_results for result in results)))
+    if fresh and inference_cache is not None:
+        await inference_cache.put_many(fresh)
+    results_by_key.update(fresh)
+
+    return [results_by_key[key] for key in keys]
+
+async def analyze_sentiment_remote(text: str, model: str = DEFAULT_MODEL_NAME, cleaned: bool = False) -> Dict:
+    """
+    Scores one text. A batch of one, so it shares the batch path's cache key,
+    backend routing and resilience.
+    """
+    return (await analyze_sentiment_batch([text], model, cleaned=cleaned))[0]
@@ -0,0 +1,163 @@
+import asyncio
+import random
+import time
+from collections import deque
+from fastapi import HTTPException
+from plugin.inference_client import (
+    INFERENCE_MAX_CONCURRENCY,
+    INFERENCE_MIN_CONCURRENCY,
+    INFERENCE_LATENCY_TOLERANCE,
+    INFERENCE_BREAKER_THRESHOLD,
+    INFERENCE_BREAKER_RESET,
+    INFERENCE_RETRY_BASE_DELAY,
+    INFERENCE_RETRY_MAX_DELAY,
+)
+from utils.log import logging
+from utils.metrics import INFERENCE_CIRCUIT_OPEN, INFERENCE_CONCURRENCY_LIMIT
+
+# Worth retrying: the server is overloaded, restarting or behind a proxy that gave up
+RETRYABLE_STATUS = {429, 502, 503, 504}
+
+
+class InferenceUnavailable(HTTPException):
+    """
+    The inference server is down or kept failing through every retry.
+    Routes answer with its status code; session runs stop and leave the
+    remaining posts pending instead of marking them failed.
+    """
+
+    def __init__(self, detail: str, status_code: int = 503):
+        super().__init__(status_code=status_code, detail=detail)
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failed calls and rejects calls for
+    `reset_timeout` seconds. Then one probe call is let through: success
+    closes the circuit, failure opens it again. While the probe is in flight
+    the circuit counts as open.
+    """
+
+    def __init__(self, threshold: int = INFERENCE_BREAKER_THRESHOLD, reset_timeout: float = INFERENCE_BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def is_open(self) -> bool:
+        if self.opened_at is None:
+            return False
+        return self._probing or time.monotonic() - self.opened_at < self.reset_timeout
+
+    def before_call(self):
+        if self.opened_at is None:
+            return
+        if self.is_open():
+            raise InferenceUnavailable("Inference API unavailable (circuit open)")
+        self._probing = True
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logging.info("Inference circuit closed")
+            INFERENCE_CIRCUIT_OPEN.set(0)
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._probing or (self.opened_at is None and self.failures >= self.threshold):
+            if self.opened_at is None:
+                logging.warning(f"Inference circuit opened after {self.failures} consecutive failures")
+                INFERENCE_CIRCUIT_OPEN.set(1)
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+    def release_probe(self):
+        """
+        Gives the probe slot back when a call ends without an outcome (it was
+        cancelled), so the next call can probe instead of the circuit staying
+        half-open forever.
+        """
+        self._probing = False
+
+
+class AdaptiveLimiter:
+    """
+    AIMD cap on in-flight inference calls. Each fast call raises the limit by
+    1/limit (about +1 per round of calls); a call slower than `tolerance` x the
+    fastest recent latency for its `kind` of call, or a failed one, halves it.
+    Calls already in flight when the limit was cut do not cut it again.
+    """
+
+    def __init__(self, max_limit: int = INFERENCE_MAX_CONCURRENCY, min_limit: int = INFERENCE_MIN_CONCURRENCY,
+                 tolerance: float = INFERENCE_LATENCY_TOLERANCE):
+        self.max_limit = max_limit
+        self.min_limit = max(min(min_limit, max_limit), 1)
+        self.tolerance = tolerance
+        self.limit = float(max_limit)
+        INFERENCE_CONCURRENCY_LIMIT.set(int(self.limit))
+        self.in_flight = 0
+        self._waiters = deque()
+        self._baseline = {}
+        self._last_decrease = 0.0
+
+    async def acquire(self) -> float:
+        """
+        Waits for a slot and returns the start time to pass to `release`.
+        """
+        if self.in_flight >= int(self.limit) or self._waiters:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self.in_flight -= 1
+                    self._wake()
+                raise
+        else:
+            self.in_flight += 1
+        return time.monotonic()
+
+    def release(self, started: float, kind: str, ok: bool):
+        latency = time.monotonic() - started
+        self.in_flight -= 1
+
+        baseline = self._baseline.get(kind)
+        congested = not ok or (baseline is not None and latency > baseline * self.tolerance)
+        if ok:
+            # Tracks the fastest recent latency, drifting up slowly if the server gets slower for good
+            self._baseline[kind] = latency if baseline is None else min(latency, baseline + (latency - baseline) * 0.01)
+
+        if congested and started >= self._last_decrease:
+            self.limit = max(self.limit / 2, self.min_limit)
+            self._last_decrease = time.monotonic()
+        elif not congested:
+            self.limit = min(self.limit + 1 / self.limit, self.max_limit)
+        INFERENCE_CONCURRENCY_LIMIT.set(int(self.limit))
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+
+def backoff_delay(attempt: int, retry_after: str | None = None) -> float:
+    """
+    Full-jitter exponential backoff, or the server's Retry-After when it gives one.
+    """
+    if retry_after:
+        try:
+            return min(float(retry_after), INFERENCE_RETRY_MAX_DELAY)
+        except ValueError:
+            pass
+    return random.uniform(0, min(INFERENCE_RETRY_MAX_DELAY, INFERENCE_RETRY_BASE_DELAY * 2 ** attempt))
+
+
+inference_breaker = CircuitBreaker()
+inference_limiter = AdaptiveLimiter()
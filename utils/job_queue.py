@@ -0,0 +1,258 @@
+import datetime
+import uuid
+from typing import Dict, List, Optional, Tuple
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from plugin.db import scrapped_data, session_jobs, JOB_CLAIM_TIMEOUT, MAX_POSTS_PER_JOB
+from utils.log import logging
+from utils.session_pipeline import SCRAPPED_POST_PROJECTION, pending_posts_query
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.utcnow()
+
+
+class SessionJobQueue:
+    """
+    Session processing jobs stored in Mongo, so any API or worker process can
+    submit, claim and report on them. Collections are injectable so a local
+    worker can run against a Mongo stand-in.
+    """
+
+    def __init__(self, jobs=session_jobs, posts=scrapped_data, max_posts: int = MAX_POSTS_PER_JOB):
+        self.jobs = jobs
+        self.posts = posts
+        self.max_posts = max_posts
+
+    def submit(self, session_id: str) -> Tuple[Optional[dict], bool]:
+        """
+        Queues a job for the session's pending posts.
+        Returns (job, created); job is None when the session has nothing pending,
+        and created is False when a queued/running job already covers the session.
+        """
+        active = self.jobs.find_one({"activeSession": session_id})
+        if active:
+            return active, False
+
+        # Counting stops past the cap, so a huge backlog costs no more than a capped one
+        total = self.posts.count_documents(pending_posts_query(session_id), limit=self.max_posts + 1)
+        if not total:
+            return None, False
+
+        job = self._new_job(session_id, total)
+        try:
+            self.jobs.insert_one(job)
+        except DuplicateKeyError:
+            # Lost a race with a concurrent submit for the same session
+            return self.jobs.find_one({"activeSession": session_id}), False
+        return job, True
+
+    def _new_job(self, session_id: str, total: int, batch_id: Optional[str] = None) -> dict:
+        now = _now()
+        job = {
+            "_id": uuid.uuid4().hex,
+            "sessionId": session_id,
+            "activeSession": session_id,
+            "state": JOB_QUEUED,
+            "total_posts": min(total, self.max_posts),
+            "posts_attempted": 0,
+            "posts_processed": 0,
+            "posts_failed": 0,
+            "created_at": now,
+            "queued_at": now,
+            "updated_at": now,
+        }
+        if total > self.max_posts:
+            # Workers stop claiming at the cap; later posts wait for another request
+            job["max_posts"] = self.max_posts
+        if batch_id:
+            job["batchIds"] = [batch_id]
+        return job
+
+    def submit_many(self, session_ids: List[str], batch_id: str) -> Dict[str, Tuple[Optional[dict], bool]]:
+        """
+        `submit` for many sessions in a fixed number of round-trips.
+        Returns {session_id: (job, created)}. Jobs that were already active are
+        tagged with `batch_id` too, so the batch report covers every session.
+        """
+        session_ids = list(dict.fromkeys(session_ids))
+        active = {job["activeSession"]: job for job in self.jobs.find({"activeSession": {"$in": session_ids}})}
+
+        unclaimed = [session_id for session_id in session_ids if session_id not in active]
+        totals = {
+            row["_id"]: row["count"]
+            for row in self.posts.aggregate([
+                {"$match": {"sessionId": {"$in": unclaimed}, "status": 1}},
+                {"$group": {"_id": "$sessionId", "count": {"$sum": 1}}},
+            ])
+        } if unclaimed else {}
+
+        new_jobs = [self._new_job(session_id, totals[session_id], batch_id) for session_id in unclaimed if totals.get(session_id)]
+        created = {job["sessionId"]: job for job in new_jobs}
+        if new_jobs:
+            try:
+                self.jobs.insert_many(new_jobs, ordered=False)
+            except BulkWriteError as e:
+                # Sessions a concurrent submit got to first
+                lost = [new_jobs[error["index"]]["sessionId"] for error in e.details.get("writeErrors", [])]
+                for session_id in lost:
+                    del created[session_id]
+                active.update({job["activeSession"]: job for job in self.jobs.find({"activeSession": {"$in": lost}})})
+
+        if active:
+            self.jobs.update_many(
+                {"_id": {"$in": [job["_id"] for job in active.values()]}},
+                {"$addToSet": {"batchIds": batch_id}},
+            )
+
+        results = {}
+        for session_id in session_ids:
+            if session_id in created:
+                results[session_id] = (created[session_id], True)
+            else:
+                results[session_id] = (active.get(session_id), False)
+        return results
+
+    def get(self, job_id: str) -> Optional[dict]:
+        return self.jobs.find_one({"_id": job_id})
+
+    def batch_jobs(self, batch_id: str) -> List[dict]:
+        return list(self.jobs.find({"batchIds": batch_id}).sort("created_at", 1))
+
+    def claim_job(self, worker_id: str) -> Optional[dict]:
+        """
+        Takes the job queued longest ago. A job handed back after its turn is
+        queued anew, so it waits behind the jobs that were already queued.
+        """
+        now = _now()
+        return self.jobs.find_one_and_update(
+            {"state": JOB_QUEUED},
+            {
+                "$set": {"state": JOB_RUNNING, "worker_id": worker_id, "updated_at": now},
+                # The first run's start, so throughput and ETA cover every turn
+                "$min": {"started_at": now},
+            },
+            sort=[("queued_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def claim_posts(self, job: dict, batch_size: int, after_id=None) -> List[dict]:
+        """
+        Atomically moves up to `batch_size` pending posts to status 2 for this job
+        and returns only the posts this job won, in `_id` order.
+        """
+        while True:
+            query = pending_posts_query(job["sessionId"])
+            if after_id is not None:
+                query["_id"] = {"$gt": after_id}
+            candidate_ids = [doc["_id"] for doc in self.posts.find(query, {"_id": 1}).sort("_id", 1).limit(batch_size)]
+            if not candidate_ids:
+                return []
+
+            self.posts.update_many(
+                {"_id": {"$in": candidate_ids}, "status": 1},
+                {"$set": {"status": 2, "claimedBy": job["_id"], "claimedAt": _now()}},
+            )
+            claimed = self.posts.find(
+                {"_id": {"$in": candidate_ids}, "status": 2, "claimedBy": job["_id"]},
+                SCRAPPED_POST_PROJECTION,
+            )
+            claimed = sorted(claimed, key=lambda doc: doc["_id"])
+            if claimed:
+                return claimed
+
+            # Every candidate was taken by someone else; keep paging past them
+            after_id = candidate_ids[-1]
+
+    def record_progress(self, job_id: str, attempted: int, processed: int, failed: int):
+        # Increments, so a requeued job keeps the progress of its earlier runs
+        self.jobs.update_one(
+            {"_id": job_id},
+            {
+                "$inc": {"posts_attempted": attempted, "posts_processed": processed, "posts_failed": failed},
+                "$set": {"updated_at": _now()},
+            },
+        )
+
+    def finish(self, job_id: str, state: str, error: Optional[str] = None):
+        update = {"$set": {"state": state, "finished_at": _now(), "updated_at": _now()}, "$unset": {"activeSession": ""}}
+        if error:
+            update["$set"]["error"] = error
+        self.jobs.update_one({"_id": job_id}, update)
+
+    def release_claims(self, job_id: str) -> int:
+        result = self.posts.update_many(
+            {"claimedBy": job_id, "status": 2},
+            {"$set": {"status": 1}, "$unset": {"claimedBy": "", "claimedAt": ""}},
+        )
+        return result.modified_count
+
+    def requeue(self, job_id: str):
+        """
+        Hands a running job and its claimed posts back; it goes to the back of the queue.
+        """
+        self.release_claims(job_id)
+        now = _now()
+        self.jobs.update_one(
+            {"_id": job_id, "state": JOB_RUNNING},
+            {"$set": {"state": JOB_QUEUED, "queued_at": now, "updated_at": now}, "$unset": {"worker_id": ""}},
+        )
+
+    def recover_stale(self, timeout: float = JOB_CLAIM_TIMEOUT) -> int:
+        """
+        Hands jobs and posts abandoned by a crashed worker back to the queue.
+        """
+        cutoff = _now() - datetime.timedelta(seconds=timeout)
+        stale_jobs = list(self.jobs.find({"state": JOB_RUNNING, "updated_at": {"$lt": cutoff}}, {"_id": 1}))
+        for job in stale_jobs:
+            logging.warning(f"Requeueing stale session job {job['_id']}")
+            self.requeue(job["_id"])
+
+        self.posts.update_many(
+            {"status": 2, "claimedAt": {"$lt": cutoff}},
+            {"$set": {"status": 1}, "$unset": {"claimedBy": "", "claimedAt": ""}},
+        )
+        return len(stale_jobs)
+
+
+def job_report(job: dict) -> dict:
+    """
+    Public view of a job with throughput and ETA derived from its counters.
+    """
+    report = {
+        "job_id": job["_id"],
+        "session_id": job["sessionId"],
+        "status": job["state"],
+        "total_posts": job.get("total_posts", 0),
+        "posts_attempted": job.get("posts_attempted", 0),
+        "posts_processed": job.get("posts_processed", 0),
+        "posts_failed": job.get("posts_failed", 0),
+        "created_at": job.get("created_at"),
+        "started_at": job.get("started_at"),
+        "finished_at": job.get("finished_at"),
+        "posts_per_second": None,
+        "eta_seconds": None,
+    }
+    if job.get("error"):
+        report["error"] = job["error"]
+
+    started = job.get("started_at")
+    if started:
+        elapsed = ((job.get("finished_at") or _now()) - started).total_seconds()
+        if elapsed > 0 and report["posts_attempted"]:
+            rate = report["posts_attempted"] / elapsed
+            report["posts_per_second"] = round(rate, 2)
+            if job["state"] == JOB_RUNNING:
+                remaining = max(report["total_posts"] - report["posts_attempted"], 0)
+                report["eta_seconds"] = round(remaining / rate, 1)
+    if job["state"] == JOB_DONE:
+        report["eta_seconds"] = 0
+    return report
+
+
+job_queue = SessionJobQueue()
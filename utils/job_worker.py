@@ -0,0 +1,363 @@
+"""
+Worker pool that runs queued session jobs.
+
+The API process starts one in its lifespan unless EMBEDDED_JOB_WORKERS=false.
+Dedicated worker processes can be run alongside it with:
+
+    python -m utils.job_worker [--workers N] [--batch-concurrency M]
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import signal
+import socket
+import time
+import uuid
+from collections import deque
+from typing import Optional
+from pymongo.errors import BulkWriteError
+from starlette.concurrency import run_in_threadpool
+from plugin.db import (
+    close_client,
+    job_batch_slots,
+    HASHTAG_ROLLUP_INTERVAL,
+    JOB_BATCH_CONCURRENCY,
+    JOB_BATCHES_PER_TURN,
+    JOB_CLAIM_TIMEOUT,
+    JOB_DRAIN_TIMEOUT,
+    JOB_GLOBAL_BATCH_CONCURRENCY,
+    JOB_POLL_INTERVAL,
+    JOB_RECOVER_INTERVAL,
+    JOB_WORKERS,
+    MONGO_READ_BATCH_SIZE,
+)
+from utils.hashtag_sketches import refresh_rollups
+from utils.inference_resilience import InferenceUnavailable, inference_breaker
+from utils.job_queue import SessionJobQueue, JOB_DONE, JOB_FAILED, JOB_QUEUED, job_queue
+from utils.log import logging
+from utils.metrics import FETCH_LATENCY, JOBS_RUNNING
+from utils.sentiment_writer import SentimentWriter
+from utils.session_pipeline import run_pipeline
+
+
+class BatchBudget:
+    """
+    Caps post batches in flight across all running jobs. Slots go to waiters
+    strictly in arrival order and a job queues again behind the others after
+    each batch, so a large session gets one turn per round like everyone else.
+    """
+
+    def __init__(self, slots: int):
+        self._free = slots
+        self._waiters = deque()
+
+    async def acquire(self):
+        if self._free > 0 and not self._waiters:
+            self._free -= 1
+            return
+        turn = asyncio.get_running_loop().create_future()
+        self._waiters.append(turn)
+        try:
+            await turn
+        except asyncio.CancelledError:
+            # Handed a slot just as we were cancelled: pass it on
+            if turn.done() and not turn.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        while self._waiters:
+            turn = self._waiters.popleft()
+            if not turn.done():
+                turn.set_result(None)
+                return
+        self._free += 1
+
+
+class SharedBatchBudget:
+    """
+    Caps post batches in flight across every worker process: each batch holds
+    a lease on one of `slots` documents in jobBatchSlots. A lease left behind
+    by a crashed process lapses after `lease_seconds`.
+    """
+
+    def __init__(self, slots: int, collection=job_batch_slots, lease_seconds: float = JOB_CLAIM_TIMEOUT,
+                 poll_interval: float = 0.05, max_poll_interval: float = 0.5):
+        self.slots = slots
+        self.collection = collection
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self._created = False
+
+    def _create_slots(self):
+        try:
+            self.collection.insert_many([{"_id": slot, "holder": None} for slot in range(self.slots)], ordered=False)
+        except BulkWriteError:
+            # Another process created some or all of them first
+            pass
+        self._created = True
+
+    def try_acquire(self, holder: str) -> Optional[int]:
+        if not self._created:
+            self._create_slots()
+        now = datetime.datetime.utcnow()
+        slot = self.collection.find_one_and_update(
+            {"_id": {"$in": list(range(self.slots))}, "$or": [{"holder": None}, {"expires_at": {"$lt": now}}]},
+            {"$set": {"holder": holder, "expires_at": now + datetime.timedelta(seconds=self.lease_seconds)}},
+        )
+        return None if slot is None else slot["_id"]
+
+    async def acquire(self) -> tuple:
+        """
+        Waits for a free slot and returns the lease to hand to `release`.
+        """
+        holder = uuid.uuid4().hex
+        delay = self.poll_interval
+        while True:
+            slot = await run_in_threadpool(self.try_acquire, holder)
+            if slot is not None:
+                return slot, holder
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_poll_interval)
+
+    def release(self, lease: tuple):
+        slot, holder = lease
+        self.collection.update_one({"_id": slot, "holder": holder}, {"$set": {"holder": None}, "$unset": {"expires_at": ""}})
+
+
+def _default_shared_budget() -> Optional[SharedBatchBudget]:
+    return SharedBatchBudget(JOB_GLOBAL_BATCH_CONCURRENCY) if JOB_GLOBAL_BATCH_CONCURRENCY > 0 else None
+
+
+class SessionJobWorker:
+    """
+    Runs up to `concurrency` jobs at a time, each as an asyncio task that
+    streams claimed post batches through the session pipeline. The jobs share
+    `batch_concurrency` batch slots round-robin, and every batch also holds one
+    of the slots shared by all processes. After `batches_per_turn` batches a
+    job goes to the back of the queue, so sessions queued behind large ones
+    still make progress. Alongside the jobs it hands abandoned jobs and posts
+    back to the queue every `recover_interval` seconds and redoes the
+    all-sessions hashtag rollup every `rollup_interval` seconds.
+    """
+
+    def __init__(self, queue: SessionJobQueue = job_queue, concurrency: int = JOB_WORKERS,
+                 poll_interval: float = JOB_POLL_INTERVAL, batch_size: int = MONGO_READ_BATCH_SIZE,
+                 batch_concurrency: int = JOB_BATCH_CONCURRENCY, batches_per_turn: int = JOB_BATCHES_PER_TURN,
+                 shared_budget: Optional[SharedBatchBudget] = None, recover_interval: float = JOB_RECOVER_INTERVAL,
+                 rollup_interval: float = HASHTAG_ROLLUP_INTERVAL):
+        self.queue = queue
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.budget = BatchBudget(batch_concurrency)
+        self.shared_budget = shared_budget if shared_budget is not None else _default_shared_budget()
+        self.batches_per_turn = max(1, batches_per_turn)
+        self.recover_interval = recover_interval
+        self.rollup_interval = rollup_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks = []
+        self._maintenance = None
+        self._draining = False
+
+    async def _report_progress(self, job: dict, writer: SentimentWriter, stats: dict):
+        current = {"attempted": stats["attempted"], "processed": writer.inserted_count, "failed": writer.failed_count}
+        delta = {key: current[key] - stats["reported"][key] for key in current}
+        await run_in_threadpool(self.queue.record_progress, job["_id"], **delta)
+        stats["reported"] = current
+
+    async def _end_turn(self, stats: dict):
+        if stats["lease"] is not None:
+            lease, stats["lease"] = stats["lease"], None
+            try:
+                await run_in_threadpool(self.shared_budget.release, lease)
+            except Exception as e:
+                # The lease lapses on its own
+                logging.error(f"Error releasing shared batch slot: {str(e)}")
+        if stats["has_turn"]:
+            stats["has_turn"] = False
+            self.budget.release()
+
+    async def _claimed_batches(self, job: dict, writer: SentimentWriter, stats: dict):
+        last_id = None
+        while True:
+            # Being asked for the next batch means the previous one is through the pipeline
+            await self._end_turn(stats)
+            if stats["batches"] >= self.batches_per_turn:
+                stats["turn_over"] = True
+                return
+            batch_size = self.batch_size
+            if job.get("max_posts") is not None:
+                # Attempts from earlier runs of a requeued job count towards the cap too
+                batch_size = min(batch_size, job["max_posts"] - job.get("posts_attempted", 0) - stats["attempted"])
+                if batch_size <= 0:
+                    return
+            await self.budget.acquire()
+            stats["has_turn"] = True
+            if self.shared_budget is not None:
+                stats["lease"] = await self.shared_budget.acquire()
+
+            with FETCH_LATENCY.time():
+                docs = await run_in_threadpool(self.queue.claim_posts, job, batch_size, last_id)
+
+            # Report what happened since the last batch before handing out the next one
+            await self._report_progress(job, writer, stats)
+
+            if not docs:
+                return
+            last_id = docs[-1]["_id"]
+            stats["attempted"] += len(docs)
+            stats["batches"] += 1
+            yield docs
+
+    async def run_job(self, job: dict) -> dict:
+        writer = SentimentWriter()
+        stats = {
+            "attempted": 0,
+            "reported": {"attempted": 0, "processed": 0, "failed": 0},
+            "batches": 0,
+            "turn_over": False,
+            "has_turn": False,
+            "lease": None,
+        }
+        try:
+            result = await run_pipeline(job["sessionId"], self._claimed_batches(job, writer, stats), writer)
+            await self._report_progress(job, writer, stats)
+        except asyncio.CancelledError:
+            # Shutting down: hand the job and its claimed posts back for another worker
+            await run_in_threadpool(self.queue.requeue, job["_id"])
+            raise
+        except InferenceUnavailable as e:
+            # Keep what was scored, put the rest back to status 1 and retry the job later
+            logging.warning(f"Session job {job['_id']} paused, inference unavailable: {e.detail}")
+            await run_in_threadpool(writer.flush)
+            await self._report_progress(job, writer, stats)
+            await run_in_threadpool(self.queue.requeue, job["_id"])
+            return {"state": JOB_QUEUED, "error": e.detail}
+        except Exception as e:
+            logging.error(f"Session job {job['_id']} failed: {str(e)}")
+            await run_in_threadpool(self.queue.release_claims, job["_id"])
+            await run_in_threadpool(self.queue.finish, job["_id"], JOB_FAILED, str(e))
+            return {"state": JOB_FAILED, "error": str(e)}
+        finally:
+            await self._end_turn(stats)
+
+        if stats["turn_over"]:
+            # More posts may be pending: let the jobs queued meanwhile have a turn first
+            await run_in_threadpool(self.queue.requeue, job["_id"])
+            return {"state": JOB_QUEUED, **result}
+
+        await run_in_threadpool(self.queue.finish, job["_id"], JOB_DONE)
+        logging.info(f"Session job {job['_id']} for {job['sessionId']} done: {result}")
+        return {"state": JOB_DONE, **result}
+
+    async def _loop(self):
+        while not self._draining:
+            if inference_breaker.is_open():
+                # Jobs would only be claimed and handed straight back
+                await asyncio.sleep(self.poll_interval)
+                continue
+            try:
+                job = await run_in_threadpool(self.queue.claim_job, self.worker_id)
+            except Exception as e:
+                logging.error(f"Error claiming session job: {str(e)}")
+                job = None
+            if job is None:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            if self._draining:
+                # Claimed just as shutdown began: leave it for another worker
+                await run_in_threadpool(self.queue.requeue, job["_id"])
+                return
+            with JOBS_RUNNING.track_inprogress():
+                await self.run_job(job)
+
+    async def _recover_stale(self):
+        try:
+            await run_in_threadpool(self.queue.recover_stale)
+        except Exception as e:
+            logging.error(f"Error recovering stale session jobs: {str(e)}")
+
+    async def _refresh_rollups(self):
+        try:
+            # Every worker process tries; one of them per interval does the work
+            await run_in_threadpool(refresh_rollups, self.rollup_interval)
+        except Exception as e:
+            logging.error(f"Error rolling up hashtag sketches: {str(e)}")
+
+    async def _maintain(self):
+        """
+        Runs each chore once its interval is up, checking every poll interval.
+        A worker that crashed mid-job is only noticed here, so without it its
+        jobs would wait for the next worker restart.
+        """
+        now = time.monotonic()
+        # start() has just recovered stale jobs
+        chores = [[now + self.recover_interval, self.recover_interval, self._recover_stale],
+                  [now, self.rollup_interval, self._refresh_rollups]]
+        while not self._draining:
+            for chore in chores:
+                due, interval, run = chore
+                if time.monotonic() >= due:
+                    await run()
+                    chore[0] = time.monotonic() + interval
+            await asyncio.sleep(self.poll_interval)
+
+    async def start(self):
+        self._draining = False
+        await self._recover_stale()
+        self._tasks = [asyncio.create_task(self._loop()) for _ in range(self.concurrency)]
+        self._maintenance = asyncio.create_task(self._maintain())
+
+    async def stop(self, drain_timeout: float = JOB_DRAIN_TIMEOUT):
+        """
+        Stops claiming jobs and gives running ones `drain_timeout` seconds to
+        finish. Jobs still running after that are cancelled, which hands them
+        and their claimed posts back to the queue.
+        """
+        self._draining = True
+        if self._maintenance is not None:
+            self._maintenance.cancel()
+            await asyncio.gather(self._maintenance, return_exceptions=True)
+            self._maintenance = None
+        if self._tasks:
+            _, unfinished = await asyncio.wait(self._tasks, timeout=drain_timeout)
+            if unfinished:
+                logging.warning(f"{len(unfinished)} session job slots still busy after {drain_timeout}s; requeueing their jobs")
+            for task in unfinished:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def run_forever(self):
+        await self.start()
+        stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signal_number, stopping.set)
+        await stopping.wait()
+        logging.info("Draining session jobs")
+        await self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=JOB_WORKERS, help="Jobs processed concurrently")
+    parser.add_argument("--batch-concurrency", type=int, default=JOB_BATCH_CONCURRENCY, help="Post batches in flight across all jobs")
+    parser.add_argument("--batches-per-turn", type=int, default=JOB_BATCHES_PER_TURN, help="Batches a job runs before requeueing")
+    args = parser.parse_args()
+
+    logging.info(f"Starting session job worker with {args.workers} job slots sharing {args.batch_concurrency} batch slots")
+    try:
+        worker = SessionJobWorker(concurrency=args.workers, batch_concurrency=args.batch_concurrency, batches_per_turn=args.batches_per_turn)
+        asyncio.run(worker.run_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        close_client()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+CPU sentiment scorer behind the local inference backend.
+
+A linear model over lower-cased word tokens: each label's logit is its bias
+plus the weights of the words in the text, and a softmax turns the logits into
+scores. A negator ("not", "never", ...) flips the Negative/Positive weights of
+the next word. Weights are read from a JSON file:
+
+    {"labels": ["Negative", "Positive", "Neutral"],
+     "bias": [0.0, 0.0, 0.5],
+     "weights": {"great": [-1.0, 2.0, 0.0], ...}}
+
+or fall back to the small built-in lexicon below. This module only needs the
+standard library, so process-pool workers start quickly.
+"""
+import json
+import math
+import re
+
+LABELS = ("Negative", "Positive", "Neutral")
+
+_TOKEN_RE = re.compile(r"[a-z']+")
+_NEGATORS = {"not", "no", "never", "don't", "doesn't", "isn't", "wasn't", "can't", "won't", "nothing"}
+
+_POSITIVE = (
+    "good great excellent amazing awesome love loved like best happy glad win won wonderful fantastic "
+    "nice brilliant support proud beautiful success successful thanks thank congratulations hope peace"
+).split()
+_NEGATIVE = (
+    "bad terrible awful worst hate hated angry sad fail failed failure fake corrupt corruption wrong "
+    "disaster horrible poor violence attack crisis scam fraud protest shame killed death dead"
+).split()
+
+_model = None
+
+
+def builtin_model() -> dict:
+    weights = {word: [-1.0, 1.5, -0.5] for word in _POSITIVE}
+    weights.update({word: [1.5, -1.0, -0.5] for word in _NEGATIVE})
+    return {"labels": list(LABELS), "bias": [0.0, 0.0, 0.7], "weights": weights}
+
+
+def load_model(path: str = "") -> dict:
+    if not path:
+        return builtin_model()
+    with open(path) as model_file:
+        model = json.load(model_file)
+    if sorted(model["labels"]) != sorted(LABELS):
+        raise ValueError(f"Local model labels must be {LABELS}, got {model['labels']}")
+    return model
+
+
+def init_worker(path: str = ""):
+    global _model
+    _model = load_model(path)
+
+
+def _score(text: str, model: dict) -> dict:
+    labels, weights = model["labels"], model["weights"]
+    negative, positive = labels.index("Negative"), labels.index("Positive")
+    logits = list(model["bias"])
+    negate = False
+    for token in _TOKEN_RE.findall(text):
+        word_weights = weights.get(token)
+        if word_weights is not None:
+            if negate:
+                word_weights = list(word_weights)
+                word_weights[negative], word_weights[positive] = word_weights[positive], word_weights[negative]
+            for i, weight in enumerate(word_weights):
+                logits[i] += weight
+        negate = token in _NEGATORS
+
+    top = max(logits)
+    exps = [math.exp(logit - top) for logit in logits]
+    total = sum(exps)
+    return {label: round(value / total, 6) for label, value in zip(labels, exps)}
+
+
+def score_texts(texts: list, model_name: str) -> list:
+    """
+    Scores cleaned texts with the worker's model (see `init_worker`), in the
+    inference server's result shape plus `"backend": "local"`. `model_name`
+    identifies this model, not the one the caller asked for.
+    """
+    if _model is None:
+        init_worker()
+    return [{"model": model_name, "backend": "local", "text": text, "scores": _score(text, _model)} for text in texts]
@@ -0,0 +1,181 @@
+"""
+Prometheus metrics for the API, the session pipeline and inference calls.
+
+Everything is a prometheus_client counter/histogram/gauge updated in-process,
+so recording is a lock and a few additions; values are only serialized when
+/metrics is scraped. Posts per second is `rate(sentiment_posts_total[1m])`.
+
+With several worker processes, point PROMETHEUS_MULTIPROC_DIR at an empty
+directory before start-up: every process then writes its values there and
+/metrics on any worker reports the sum over all of them. The inference cache
+collector is per process and is left out in that mode.
+"""
+import os
+import time
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+# Pipeline batches and inference calls run well past the default 10s top bucket
+SLOW_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+REQUEST_LATENCY = Histogram(
+    "sentiment_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+)
+
+PIPELINE_STAGE_LATENCY = Histogram(
+    "sentiment_pipeline_stage_duration_seconds",
+    "Time spent per batch in each session pipeline stage",
+    ["stage"],
+    buckets=SLOW_BUCKETS,
+)
+FETCH_LATENCY = PIPELINE_STAGE_LATENCY.labels(stage="fetch")
+EXTRACT_LATENCY = PIPELINE_STAGE_LATENCY.labels(stage="extract")
+CLEAN_LATENCY = PIPELINE_STAGE_LATENCY.labels(stage="clean")
+DEDUP_LATENCY = PIPELINE_STAGE_LATENCY.labels(stage="dedup")
+INFERENCE_STAGE_LATENCY = PIPELINE_STAGE_LATENCY.labels(stage="inference")
+WRITE_LATENCY = PIPELINE_STAGE_LATENCY.labels(stage="write")
+
+INFERENCE_LATENCY = Histogram(
+    "sentiment_inference_request_duration_seconds",
+    "Inference API call latency",
+    ["model", "endpoint"],
+    buckets=SLOW_BUCKETS,
+)
+INFERENCE_ERRORS = Counter(
+    "sentiment_inference_errors_total",
+    "Failed inference API calls",
+    ["model", "endpoint", "reason"],
+)
+INFERENCE_RETRY_COUNT = Counter(
+    "sentiment_inference_retries_total",
+    "Inference API calls retried after a timeout, connection error or 429/5xx",
+    ["model", "endpoint"],
+)
+INFERENCE_CONCURRENCY_LIMIT = Gauge(
+    "sentiment_inference_concurrency_limit",
+    "Current adaptive cap on in-flight inference calls",
+    multiprocess_mode="liveall",
+)
+INFERENCE_CIRCUIT_OPEN = Gauge(
+    "sentiment_inference_circuit_open",
+    "1 from the inference circuit breaker opening until a probe call succeeds",
+    multiprocess_mode="livemax",
+)
+INFERENCE_IN_FLIGHT = Gauge(
+    "sentiment_inference_in_flight",
+    "Inference API calls currently holding a concurrency slot",
+    multiprocess_mode="livesum",
+)
+
+POSTS = Counter(
+    "sentiment_posts_total",
+    "Scraped posts handled by the session pipeline",
+    ["outcome"],
+)
+POSTS_PROCESSED = POSTS.labels(outcome="processed")
+POSTS_FAILED = POSTS.labels(outcome="failed")
+POSTS_RELEASED = POSTS.labels(outcome="released")
+NEAR_DUPLICATE_POSTS = Counter(
+    "sentiment_near_duplicate_posts_total",
+    "Posts that reused the inference result of their near-duplicate cluster",
+)
+
+ADMISSION_REJECTED = Counter(
+    "sentiment_admission_rejected_total",
+    "Requests turned away with 429 by admission control",
+    ["route", "reason"],
+)
+
+REPORT_CACHE_REQUESTS = Counter(
+    "sentiment_report_cache_requests_total",
+    "Summary and ranking requests by how the report cache answered them",
+    ["outcome"],
+)
+REPORT_CACHE_HITS = REPORT_CACHE_REQUESTS.labels(outcome="hit")
+REPORT_CACHE_MISSES = REPORT_CACHE_REQUESTS.labels(outcome="miss")
+REPORT_NOT_MODIFIED = REPORT_CACHE_REQUESTS.labels(outcome="not_modified")
+
+MICRO_BATCH_QUEUE_DEPTH = Gauge(
+    "sentiment_micro_batch_queue_depth",
+    "Quick-analysis texts waiting for the next micro-batch",
+    multiprocess_mode="livesum",
+)
+
+JOBS_RUNNING = Gauge(
+    "sentiment_session_jobs_running",
+    "Session jobs being run by this process",
+    multiprocess_mode="livesum",
+)
+
+
+class InferenceCacheCollector:
+    """
+    Reads the inference cache's own counters at scrape time instead of
+    mirroring every hit and miss into a second set of counters.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def collect(self):
+        stats = self.cache.stats()
+        for name in ("hits", "persistent_hits", "misses", "evictions", "expirations"):
+            yield CounterMetricFamily(f"sentiment_inference_cache_{name}", f"Inference cache {name.replace('_', ' ')}", value=stats[name])
+        yield GaugeMetricFamily("sentiment_inference_cache_size", "Entries in the in-memory inference cache", value=stats["size"])
+
+
+def register_inference_cache(cache):
+    if cache is not None and not MULTIPROCESS:
+        REGISTRY.register(InferenceCacheCollector(cache))
+
+
+def http_error_reason(status_code: int) -> str:
+    return f"http_{status_code // 100}xx"
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording request latency under the matched route
+    template (e.g. /process-session/jobs/{job_id}), so label cardinality stays
+    bounded by the number of routes.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            REQUEST_LATENCY.labels(scope["method"], route, str(status)).observe(time.perf_counter() - started)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+def mark_process_dead():
+    # Drops this process's live gauges from the shared directory on shutdown
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,84 @@
+import asyncio
+import time
+from typing import Dict
+from plugin.inference_client import DEFAULT_MODEL_NAME, MICRO_BATCH_MAX_SIZE, MICRO_BATCH_WINDOW_MS
+from utils.inference_helpers import analyze_sentiment_batch
+from utils.log import logging
+from utils.metrics import MICRO_BATCH_QUEUE_DEPTH
+
+
+class MicroBatcher:
+    """
+    Groups concurrent single-text requests that arrive within a short window
+    into one batch call, so the inference server sees full batches.
+    """
+
+    def __init__(self, max_batch_size: int = MICRO_BATCH_MAX_SIZE, window_ms: float = MICRO_BATCH_WINDOW_MS):
+        self.max_batch_size = max_batch_size
+        self.window = window_ms / 1000
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self._inflight = set()
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def analyze(self, text: str, model: str = DEFAULT_MODEL_NAME) -> Dict:
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, model, future))
+        MICRO_BATCH_QUEUE_DEPTH.inc()
+        return await future
+
+    async def _collect(self) -> list:
+        pending = [await self._queue.get()]
+        MICRO_BATCH_QUEUE_DEPTH.dec()
+        deadline = time.monotonic() + self.window
+        while len(pending) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                pending.append(await asyncio.wait_for(self._queue.get(), remaining))
+                MICRO_BATCH_QUEUE_DEPTH.dec()
+            except asyncio.TimeoutError:
+                break
+        return pending
+
+    async def _dispatch(self, model: str, items: list):
+        try:
+            results = await analyze_sentiment_batch([text for text, _ in items], model)
+        except Exception as e:
+            logging.error(f"Micro-batch of {len(items)} texts failed: {e}")
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(items, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _run(self):
+        while True:
+            pending = await self._collect()
+
+            # One batch call per model present in the window; the next window
+            # starts collecting while these are in flight
+            by_model = {}
+            for text, model, future in pending:
+                by_model.setdefault(model, []).append((text, future))
+
+            for model, items in by_model.items():
+                task = asyncio.create_task(self._dispatch(model, items))
+                self._inflight.add(task)
+                task.add_done_callback(self._inflight.discard)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+micro_batcher = MicroBatcher()
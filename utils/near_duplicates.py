@@ -0,0 +1,137 @@
+"""
+Near-duplicate clustering of cleaned post texts with MinHash and LSH.
+
+Texts are reduced to word bigrams after dropping retweet prefixes and
+punctuation (clean_text already folds URLs and mentions), signed with
+NEAR_DUP_NUM_PERM min-hashes and bucketed by LSH bands. A text joins the
+first candidate cluster whose representative's signature agrees on at least
+NEAR_DUP_THRESHOLD of its positions (the estimated Jaccard similarity);
+otherwise it starts a new cluster and becomes its representative.
+"""
+import functools
+import hashlib
+import re
+import struct
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from plugin.inference_client import NEAR_DUP_MAX_CLUSTERS, NEAR_DUP_NUM_PERM, NEAR_DUP_THRESHOLD
+
+_TOKEN_RE = re.compile(r"\w+")
+_RETWEET_RE = re.compile(r"^(?:rt\s+@user\W*)+")
+# One blake2b digest gives 16 independent 32-bit hashes of a shingle
+_HASHES_PER_DIGEST = 16
+_unpack_digest = struct.Struct(f"<{_HASHES_PER_DIGEST}I").unpack
+
+
+def tokens(text: str) -> List[str]:
+    return _TOKEN_RE.findall(_RETWEET_RE.sub("", text))
+
+@functools.lru_cache(maxsize=None)
+def lsh_params(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """
+    (bands, rows) with bands x rows <= num_perm that minimizes the weighted
+    chance of missing a pair above `threshold` or pairing one below it. Misses
+    weigh more: a false candidate only costs one signature comparison.
+    """
+    def integrate(f, low, high, steps=100):
+        width = (high - low) / steps
+        return sum(f(low + (i + 0.5) * width) for i in range(steps)) * width
+
+    best, best_error = (1, num_perm), float("inf")
+    for bands in range(1, num_perm + 1):
+        for rows in range(1, num_perm // bands + 1):
+            false_positive = integrate(lambda s: 1 - (1 - s ** rows) ** bands, 0.0, threshold)
+            false_negative = integrate(lambda s: (1 - s ** rows) ** bands, threshold, 1.0)
+            error = 0.1 * false_positive + 0.9 * false_negative
+            if error < best_error:
+                best, best_error = (bands, rows), error
+    return best
+
+
+class Cluster:
+    __slots__ = ("id", "text", "signature", "analysis", "keys")
+
+    def __init__(self, cluster_id, text: str, signature: Optional[List[int]] = None):
+        self.id = cluster_id
+        self.text = text
+        self.signature = signature
+        # Inference result of the representative `text`, once scored
+        self.analysis = None
+        self.keys = []
+
+
+class NearDuplicateIndex:
+    """
+    LSH index over the clusters seen in one pipeline run. The oldest clusters
+    are forgotten past `max_clusters`, which bounds memory on huge sessions.
+    """
+
+    def __init__(self, threshold: float = NEAR_DUP_THRESHOLD, num_perm: int = NEAR_DUP_NUM_PERM,
+                 max_clusters: int = NEAR_DUP_MAX_CLUSTERS, seed: int = 1):
+        self.threshold = threshold
+        # Rounded up to whole digests
+        num_perm = -(-num_perm // _HASHES_PER_DIGEST) * _HASHES_PER_DIGEST
+        self.num_perm = num_perm
+        self.max_clusters = max_clusters
+        self.bands, self.rows = lsh_params(num_perm, threshold)
+        # Salted digests stand in for permutations; a fixed seed keeps signatures comparable across processes
+        self._salts = [hashlib.blake2b(f"{seed}:{i}".encode(), digest_size=16).digest() for i in range(num_perm // _HASHES_PER_DIGEST)]
+        self._buckets: List[Dict[tuple, Cluster]] = [{} for _ in range(self.bands)]
+        # Normalized text -> cluster, so repeats of a seen text skip MinHash entirely
+        self._exact: Dict[str, Cluster] = {}
+        self._clusters: "OrderedDict[object, Cluster]" = OrderedDict()
+
+    def signature(self, words: List[str]) -> List[int]:
+        shingles = [shingle.encode() for shingle in {f"{first} {second}" for first, second in zip(words, words[1:])} or set(words)]
+        signature = []
+        for salt in self._salts:
+            digests = [_unpack_digest(hashlib.blake2b(shingle, digest_size=64, salt=salt).digest()) for shingle in shingles]
+            signature.extend(map(min, zip(*digests)))
+        return signature
+
+    def _similarity(self, first: List[int], second: List[int]) -> float:
+        return sum(1 for x, y in zip(first, second) if x == y) / self.num_perm
+
+    def _band_keys(self, signature: List[int]) -> List[tuple]:
+        return [tuple(signature[band * self.rows:(band + 1) * self.rows]) for band in range(self.bands)]
+
+    def assign(self, cluster_id, text: str) -> Cluster:
+        """
+        Returns the cluster `text` belongs to, creating one with `cluster_id`
+        as its id (and `text` as its representative) when nothing is close enough.
+        """
+        words = tokens(text)
+        if not words:
+            return Cluster(cluster_id, text)
+        normalized = " ".join(words)
+        cluster = self._exact.get(normalized)
+        if cluster is not None:
+            self._clusters.move_to_end(cluster.id)
+            return cluster
+
+        signature = self.signature(words)
+        band_keys = self._band_keys(signature)
+        for band, key in enumerate(band_keys):
+            candidate = self._buckets[band].get(key)
+            if candidate is not None and self._similarity(signature, candidate.signature) >= self.threshold:
+                self._exact[normalized] = candidate
+                candidate.keys.append((None, normalized))
+                self._clusters.move_to_end(candidate.id)
+                return candidate
+
+        cluster = Cluster(cluster_id, text, signature)
+        for band, key in enumerate(band_keys):
+            self._buckets[band].setdefault(key, cluster)
+            cluster.keys.append((band, key))
+        self._exact[normalized] = cluster
+        cluster.keys.append((None, normalized))
+        self._clusters[cluster.id] = cluster
+        if len(self._clusters) > self.max_clusters:
+            self._forget(self._clusters.popitem(last=False)[1])
+        return cluster
+
+    def _forget(self, cluster: Cluster):
+        for band, key in cluster.keys:
+            table = self._exact if band is None else self._buckets[band]
+            if table.get(key) is cluster:
+                del table[key]
@@ -0,0 +1,73 @@
+from typing import Dict, Iterable, List, Tuple
+from plugin.db import PLATFORM_TEXT_FIELDS
+from utils.log import logging
+
+# Fields holding a post's text on each platform the scrapers know about
+BUILTIN_TEXT_FIELDS = {
+    "twitter": ["text"],
+    "youtube": ["metadata"],
+    "reddit": ["content"],
+}
+
+# Post fields the pipeline reads whatever the platform
+COMMON_FIELDS = ("platform", "datetime", "keyword")
+
+
+class PlatformExtractor:
+    """
+    Pulls a post's text out of the fields its platform stores it in. Fields
+    may be dotted paths into embedded documents; non-empty values are joined
+    with a blank line, in the declared order.
+    """
+
+    def __init__(self, platform: str, fields: Iterable[str]):
+        self.platform = platform
+        self.fields = tuple(fields)
+        # Split once here instead of per post
+        self._paths = [tuple(field.split(".")) for field in self.fields]
+
+    def extract(self, doc: dict) -> str:
+        parts = []
+        for path in self._paths:
+            value = doc
+            for key in path:
+                value = value.get(key) if isinstance(value, dict) else None
+            if isinstance(value, str) and value.strip():
+                parts.append(value)
+        return "\n\n".join(parts)
+
+
+def build_registry(overrides: Dict[str, List[str]] = PLATFORM_TEXT_FIELDS) -> Dict[str, PlatformExtractor]:
+    text_fields = {**BUILTIN_TEXT_FIELDS, **{platform.lower(): fields for platform, fields in overrides.items()}}
+    return {platform: PlatformExtractor(platform, fields) for platform, fields in text_fields.items()}
+
+def build_projection(registry: Dict[str, PlatformExtractor]) -> Dict[str, int]:
+    """
+    Mongo projection covering every registered platform's fields plus COMMON_FIELDS.
+    A path under a field that is already projected is dropped, since Mongo
+    rejects overlapping paths such as "quoted" and "quoted.text".
+    """
+    fields = set(COMMON_FIELDS)
+    for extractor in registry.values():
+        fields.update(extractor.fields)
+    kept: List[str] = []
+    for field in sorted(fields, key=lambda name: name.count(".")):
+        if not any(field.startswith(parent + ".") for parent in kept):
+            kept.append(field)
+    return {field: 1 for field in sorted(kept)}
+
+
+PLATFORM_EXTRACTORS = build_registry()
+SCRAPPED_POST_PROJECTION = build_projection(PLATFORM_EXTRACTORS)
+_unknown_platforms: set = set()
+
+
+def extract_text_by_platform(doc: dict, registry: Dict[str, PlatformExtractor] = PLATFORM_EXTRACTORS) -> str:
+    platform = (doc.get("platform") or "").lower()
+    extractor = registry.get(platform)
+    if extractor is None:
+        if platform not in _unknown_platforms:
+            _unknown_platforms.add(platform)
+            logging.warning(f"No text extractor for platform '{platform}'; add it to PLATFORM_TEXT_FIELDS. Its posts are skipped.")
+        return ""
+    return extractor.extract(doc)
@@ -0,0 +1,131 @@
+"""
+Runs explain() on the query behind each route and flags collection scans.
+
+    python -m utils.query_diagnostics [--session-id SESSION] [--ensure-indexes]
+
+Prints a JSON report and exits with status 1 when any query plan contains a COLLSCAN.
+"""
+import argparse
+import datetime
+import json
+import sys
+from plugin.db import db, ensure_indexes, verify_indexes
+from plugin.inference_client import DEFAULT_MODEL_NAME
+from utils.job_queue import JOB_QUEUED, JOB_RUNNING
+from utils.session_pipeline import SCRAPPED_POST_PROJECTION, pending_posts_query
+from utils.session_stats import session_keywords_pipeline, session_stats_pipeline
+
+
+def route_queries(session_id: str) -> list:
+    """
+    (route, collection, kind, query) for every hot query, with `session_id` as sample input.
+    Finds take a filter and an optional projection and sort.
+    """
+    sessions = {"$in": [session_id]}
+    cutoff = datetime.datetime.utcnow()
+    return [
+        # Job submission and claiming (utils.job_queue)
+        ("/process-session", "sessionJobs", "find", {"filter": {"activeSession": session_id}}),
+        ("/process-session", "scrappedPosts", "find", {"filter": pending_posts_query(session_id)}),
+        ("/process-sessions", "scrappedPosts", "aggregate", [
+            {"$match": {"sessionId": sessions, "status": 1}},
+            {"$group": {"_id": "$sessionId", "count": {"$sum": 1}}},
+        ]),
+        ("/process-sessions/batches", "sessionJobs", "find", {"filter": {"batchIds": session_id}, "sort": [("created_at", 1)]}),
+        ("job worker: claim_job", "sessionJobs", "find", {"filter": {"state": JOB_QUEUED}, "sort": [("queued_at", 1)]}),
+        ("job worker: claim_posts", "scrappedPosts", "find", {
+            "filter": pending_posts_query(session_id),
+            "projection": {"_id": 1},
+            "sort": [("_id", 1)],
+        }),
+        ("job worker: claimed posts", "scrappedPosts", "find", {
+            "filter": {"_id": {"$in": [session_id]}, "status": 2, "claimedBy": session_id},
+            "projection": SCRAPPED_POST_PROJECTION,
+        }),
+        ("job worker: recover_stale", "sessionJobs", "find", {"filter": {"state": JOB_RUNNING, "updated_at": {"$lt": cutoff}}}),
+        ("job worker: recover_stale", "scrappedPosts", "find", {"filter": {"status": 2, "claimedAt": {"$lt": cutoff}}}),
+        # Reports
+        ("/session-sentiment-summary, /session-sentiment-ranking", "sessionAggregates", "find", {
+            "filter": {"sessionId": sessions, "model": DEFAULT_MODEL_NAME},
+        }),
+        # Live fallback for sessions without a sessionAggregates row yet
+        ("/session-sentiment-summary, /session-sentiment-ranking", "socialMediaSentiment", "aggregate",
+         session_stats_pipeline([session_id], DEFAULT_MODEL_NAME)),
+        ("/session-sentiment-summary, /session-sentiment-ranking", "scrappedPosts", "aggregate",
+         session_keywords_pipeline([session_id])),
+        ("/session-sentiment-trend", "sessionTrends", "find", {
+            "filter": {
+                "sessionId": sessions, "model": DEFAULT_MODEL_NAME, "granularity": "hour",
+                "bucket": {"$gte": cutoff - datetime.timedelta(days=7), "$lt": cutoff},
+            },
+        }),
+        ("/session-hashtags/top", "hashtagSketches", "find", {"filter": {"sessionId": sessions, "model": DEFAULT_MODEL_NAME}}),
+        ("/session-hashtags/top (all sessions)", "hashtagRollups", "find", {"filter": {"_id": DEFAULT_MODEL_NAME}}),
+        ("job worker: refresh_rollups", "hashtagSketches", "find", {
+            "filter": {"model": DEFAULT_MODEL_NAME, "updated_at": {"$gte": cutoff}},
+        }),
+    ]
+
+def _plan_stages(plan) -> list:
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for key, value in plan.items():
+            # Only the winning plan matters
+            if key not in ("rejectedPlans", "allPlansExecution"):
+                stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            stages.extend(_plan_stages(value))
+    return stages
+
+def explain_query(database, collection_name: str, kind: str, query) -> dict:
+    collection = database[collection_name]
+    if kind == "find":
+        cursor = collection.find(query["filter"], query.get("projection"))
+        if query.get("sort"):
+            cursor = cursor.sort(query["sort"])
+        explanation = cursor.limit(1).explain()
+    else:
+        explanation = database.command("aggregate", collection_name, pipeline=query, explain=True)
+
+    # Aggregations nest the plan under stages[0].$cursor on some server versions,
+    # so walk the whole explanation instead of a fixed path
+    return {"stages": _plan_stages(explanation)}
+
+def explain_route_queries(database=db, session_id: str = "diagnostics") -> list:
+    report = []
+    for route, collection_name, kind, query in route_queries(session_id):
+        try:
+            plan = explain_query(database, collection_name, kind, query)
+        except Exception as e:
+            report.append({"route": route, "collection": collection_name, "error": str(e)})
+            continue
+        report.append({
+            "route": route,
+            "collection": collection_name,
+            "stages": plan["stages"],
+            "collection_scan": "COLLSCAN" in plan["stages"],
+        })
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--session-id", default="diagnostics", help="Sample sessionId used in the explained queries")
+    parser.add_argument("--ensure-indexes", action="store_true", help="Create missing indexes before explaining")
+    args = parser.parse_args()
+
+    missing = ensure_indexes(db) if args.ensure_indexes else verify_indexes(db)
+    report = {
+        "missing_indexes": missing,
+        "queries": explain_route_queries(db, args.session_id),
+    }
+    print(json.dumps(report, indent=2))
+
+    failed = missing or any(query.get("collection_scan") or query.get("error") for query in report["queries"])
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
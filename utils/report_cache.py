@@ -0,0 +1,87 @@
+"""
+Change-aware caching of the session summary and ranking reports.
+
+Before building a report, the route reads the version of each requested
+session's sessionAggregates row; SentimentWriter bumps it with every flush
+that touches the session. The versions then drive two things:
+
+- an ETag over the report, its parameters, the session ids in request
+  order and their versions, so a client sending it back in If-None-Match
+  gets 304 with no body until one of the sessions changes;
+- a per-process cache of the sessions' stats, keyed by model and the sorted,
+  de-duplicated session ids, and used only while the versions still match.
+
+Report type and min_posts only affect rendering, so they are part of the
+ETag but not the cache key: the summary and ranking for the same sessions
+share one entry.
+"""
+import hashlib
+import json
+from typing import Callable, Dict, List, Optional
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from starlette.concurrency import run_in_threadpool
+from plugin.inference_client import DEFAULT_MODEL_NAME
+from plugin.server import REPORT_CACHE_SIZE, REPORT_CACHE_TTL
+from utils.inference_cache import LRUCache
+from utils.metrics import REPORT_CACHE_HITS, REPORT_CACHE_MISSES, REPORT_NOT_MODIFIED
+from utils.session_aggregates import fetch_session_aggregates, fetch_session_versions
+
+
+class ReportCache:
+    def __init__(self, max_size: int = REPORT_CACHE_SIZE, ttl: float = REPORT_CACHE_TTL):
+        self.entries = LRUCache(max_size, ttl)
+
+    def session_stats(self, session_ids: List[str], versions: Dict[str, int], model: str = DEFAULT_MODEL_NAME) -> Dict[str, dict]:
+        """
+        fetch_session_aggregates for `session_ids`, from the cache when the entry
+        was built at exactly `versions`. Versions are read before the stats, so
+        an entry is never older than the versions it is stored under.
+        """
+        key = (model, tuple(sorted(set(session_ids))))
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] == versions:
+            REPORT_CACHE_HITS.inc()
+            return entry[1]
+
+        REPORT_CACHE_MISSES.inc()
+        stats = fetch_session_aggregates(list(key[1]), model)
+        self.entries.put(key, (versions, stats))
+        return stats
+
+
+def report_etag(report: str, model: str, session_ids: List[str], versions: Dict[str, int], **params) -> str:
+    state = [report, model, params, [[session_id, versions.get(session_id, 0)] for session_id in session_ids]]
+    return '"' + hashlib.sha256(json.dumps(state, sort_keys=True).encode()).hexdigest()[:32] + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    True when `etag` is among the If-None-Match tags. "*" is not honoured: the
+    check runs before the report is built, so it would answer 304 for sessions
+    that have no data and should get 404.
+    """
+    if not if_none_match:
+        return False
+    candidates = {candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")}
+    return etag in candidates
+
+async def cached_report(report: str, session_ids: List[str], if_none_match: Optional[str],
+                        build: Callable[[Dict[str, dict]], object], model: str = DEFAULT_MODEL_NAME, **params) -> Response:
+    """
+    Answers with 304 when the client's ETag is still current, otherwise with
+    `build(stats)` as JSON and its ETag. `build` raises HTTPException for
+    reports with nothing in them, which are not cached by clients either.
+    """
+    versions = await run_in_threadpool(fetch_session_versions, session_ids, model)
+    etag = report_etag(report, model, session_ids, versions, **params)
+    # Clients revalidate every time; an unchanged report costs one small read and no body
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, etag):
+        REPORT_NOT_MODIFIED.inc()
+        return Response(status_code=304, headers=headers)
+
+    stats = await run_in_threadpool(report_cache.session_stats, session_ids, versions, model)
+    return JSONResponse(jsonable_encoder(build(stats)), headers=headers)
+
+
+report_cache = ReportCache()
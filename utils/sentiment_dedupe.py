@@ -0,0 +1,90 @@
+"""
+Removes duplicate results from socialMediaSentiment.
+
+A post scored twice before the unique `raw_id_model` index existed can have
+more than one doc for the same (raw_id, analysis.model). The index cannot be
+built while they remain; ensure_indexes logs an E11000 error naming it. This
+keeps the oldest doc of each group and deletes the rest. Every copy was
+counted into the session's aggregates, trends and hashtag sketches, so those
+are rebuilt for the affected sessions afterwards.
+
+    python -m utils.sentiment_dedupe [--dry-run] [--no-rebuild]
+
+Run it while no session jobs are running, then restart the API (or run
+`python -m utils.query_diagnostics --ensure-indexes`) to build the index.
+"""
+import argparse
+import json
+from typing import Dict, Iterator
+from plugin.db import sentiment_data, MONGO_WRITE_BATCH_SIZE
+from utils import hashtag_sketches, session_aggregates, session_trends
+from utils.log import logging
+
+
+def find_duplicates() -> Iterator[dict]:
+    """
+    One {"_id": {"raw_id", "model"}, "ids", "sessions"} per key stored more than once.
+    """
+    return sentiment_data.aggregate([
+        {"$group": {
+            "_id": {"raw_id": "$raw_id", "model": "$analysis.model"},
+            "ids": {"$push": "$_id"},
+            "sessions": {"$addToSet": "$sessionId"},
+            "count": {"$sum": 1},
+        }},
+        {"$match": {"count": {"$gt": 1}}},
+    ], allowDiskUse=True)
+
+def dedupe(dry_run: bool = False, rebuild: bool = True) -> dict:
+    """
+    Deletes all but the oldest doc of each duplicate group, then rebuilds the
+    affected sessions' rollups. With `dry_run` nothing is changed.
+    """
+    groups, removed = 0, 0
+    affected: Dict[str, set] = {}
+    doomed = []
+
+    def delete_doomed():
+        if doomed and not dry_run:
+            sentiment_data.delete_many({"_id": {"$in": doomed}})
+        doomed.clear()
+
+    for group in find_duplicates():
+        groups += 1
+        # ObjectIds start with their creation time, so the smallest is the oldest
+        extra = sorted(group["ids"], key=str)[1:]
+        removed += len(extra)
+        affected.setdefault(group["_id"]["model"], set()).update(group["sessions"])
+        doomed.extend(extra)
+        if len(doomed) >= MONGO_WRITE_BATCH_SIZE:
+            delete_doomed()
+    delete_doomed()
+
+    if rebuild and not dry_run:
+        for model, session_ids in affected.items():
+            if model is None:
+                continue
+            session_ids = sorted(session_ids)
+            session_aggregates.rebuild(session_ids, model)
+            session_trends.rebuild(session_ids, model)
+            hashtag_sketches.rebuild(session_ids, model)
+            logging.info(f"Rebuilt aggregates, trends and hashtag sketches of {len(session_ids)} sessions for {model}")
+
+    return {
+        "dry_run": dry_run,
+        "duplicate_groups": groups,
+        "removed": removed,
+        "sessions": {str(model): sorted(session_ids) for model, session_ids in affected.items()},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="Only report the duplicates")
+    parser.add_argument("--no-rebuild", action="store_true", help="Leave aggregates, trends and hashtag sketches as they are")
+    args = parser.parse_args()
+
+    print(json.dumps(dedupe(dry_run=args.dry_run, rebuild=not args.no_rebuild), indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Columnar exports of socialMediaSentiment for offline analytics.
+
+Streams one model's sentiment results, optionally limited to some sessions
+and to results stored in [--since, --until), into Parquet or Arrow IPC files
+with a typed column per field, EXPORT_CHUNK_SIZE rows at a time. Each export
+directory keeps a manifest.json with its filters, its part files and a
+watermark: the time up to which stored results have been exported. Running
+the same export again only writes results stored after the watermark, as a new
+part file. Results younger than EXPORT_SETTLE_SECONDS wait for the next run,
+since other writers may still be inserting results with earlier ids.
+
+    python -m utils.sentiment_export DIR [--session-id ID ...] [--model MODEL] [--since ISO] [--until ISO] [--format parquet|arrow]
+
+Needs pyarrow, which is in requirements.txt. utils.export_reader builds the summary
+and ranking reports from the files.
+"""
+import argparse
+import datetime
+import json
+import os
+from typing import Dict, List, Optional
+from bson import ObjectId
+from plugin.db import sentiment_data, EXPORT_CHUNK_SIZE, EXPORT_SETTLE_SECONDS, MONGO_READ_BATCH_SIZE
+from plugin.inference_client import DEFAULT_MODEL_NAME
+from utils.log import logging
+from utils.session_stats import SCORE_FIELDS, fetch_session_keywords
+from utils.session_trends import to_utc
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+MANIFEST = "manifest.json"
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+SCORE_COLUMNS = [field.lower() for field in SCORE_FIELDS]
+
+if PYARROW_AVAILABLE:
+    # Times are naive UTC, like everywhere else in the database
+    SCHEMA = pa.schema(
+        [
+            ("id", pa.string()),
+            ("sessionId", pa.string()),
+            ("keyword", pa.string()),
+            ("model", pa.string()),
+            ("platform", pa.string()),
+            ("datetime", pa.timestamp("us")),
+            ("stored_at", pa.timestamp("us")),
+        ]
+        + [(column, pa.float64()) for column in SCORE_COLUMNS]
+        + [("hashtags", pa.list_(pa.string()))]
+    )
+else:
+    SCHEMA = None
+
+_PROJECTION = {"_id": 1, "sessionId": 1, "platform": 1, "datetime": 1, "hashtags": 1, "analysis.model": 1, "analysis.scores": 1}
+
+
+def load_manifest(directory: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(directory, MANIFEST)) as manifest_file:
+            return json.load(manifest_file)
+    except FileNotFoundError:
+        return None
+
+def _save_manifest(directory: str, manifest: dict):
+    path = os.path.join(directory, MANIFEST)
+    with open(path + ".tmp", "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    os.replace(path + ".tmp", path)
+
+def _open_writer(path: str, fmt: str):
+    if fmt == "parquet":
+        return pyarrow.parquet.ParquetWriter(path, SCHEMA, compression="zstd")
+    return pyarrow.ipc.new_file(path, SCHEMA)
+
+def _columns(docs: List[dict], keywords: Dict[str, str]) -> "pa.RecordBatch":
+    columns = {name: [] for name in SCHEMA.names}
+    for doc in docs:
+        analysis = doc.get("analysis") or {}
+        scores = analysis.get("scores") or {}
+        columns["id"].append(str(doc["_id"]))
+        columns["sessionId"].append(doc["sessionId"])
+        columns["keyword"].append(keywords.get(doc["sessionId"], "Unknown"))
+        columns["model"].append(analysis.get("model"))
+        columns["platform"].append((doc.get("platform") or "unknown").lower())
+        columns["datetime"].append(to_utc(doc.get("datetime")))
+        columns["stored_at"].append(doc["_id"].generation_time.replace(tzinfo=None))
+        for field, column in zip(SCORE_FIELDS, SCORE_COLUMNS):
+            columns[column].append(scores.get(field))
+        columns["hashtags"].append(list(doc.get("hashtags") or ()))
+    return pa.RecordBatch.from_pydict(columns, schema=SCHEMA)
+
+def export_sentiment(directory: str, session_ids: Optional[List[str]] = None, model: str = DEFAULT_MODEL_NAME,
+                     since: Optional[datetime.datetime] = None, until: Optional[datetime.datetime] = None,
+                     fmt: str = "parquet", chunk_size: int = EXPORT_CHUNK_SIZE) -> dict:
+    """
+    Writes the results stored since the directory's watermark to a new part
+    file and moves the watermark. Returns the part's name, row count and the
+    new watermark. A directory only ever holds one export: rerunning with other
+    filters or another format raises ValueError.
+    """
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError("Columnar exports need pyarrow: pip install pyarrow")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'; use one of {', '.join(FORMATS)}")
+
+    since, until = to_utc(since), to_utc(until)
+    filters = {
+        "model": model,
+        "session_ids": sorted(set(session_ids)) if session_ids else None,
+        "since": since.isoformat() if since else None,
+        "until": until.isoformat() if until else None,
+    }
+    os.makedirs(directory, exist_ok=True)
+    manifest = load_manifest(directory) or {"format": fmt, "filters": filters, "watermark": None, "files": [], "rows": 0}
+    if manifest["format"] != fmt or manifest["filters"] != filters:
+        raise ValueError(f"{directory} holds an export with other filters or format; export to a new directory")
+
+    # ObjectId times have whole-second resolution, so both ends are whole seconds
+    # and consecutive runs cover adjacent, non-overlapping id ranges
+    upper = (datetime.datetime.utcnow() - datetime.timedelta(seconds=EXPORT_SETTLE_SECONDS)).replace(microsecond=0)
+    if until is not None:
+        upper = min(upper, until.replace(microsecond=0))
+    lower = datetime.datetime.fromisoformat(manifest["watermark"]) if manifest["watermark"] else since
+    if lower is not None and lower >= upper:
+        return {"file": None, "rows": 0, "watermark": manifest["watermark"]}
+
+    id_range = {"$lt": ObjectId.from_datetime(upper)}
+    if lower is not None:
+        id_range["$gte"] = ObjectId.from_datetime(lower.replace(microsecond=0))
+    query = {"analysis.model": model, "_id": id_range}
+    if session_ids:
+        query["sessionId"] = {"$in": filters["session_ids"]}
+
+    name = f"part-{len(manifest['files']):05d}{FORMATS[fmt]}"
+    path = os.path.join(directory, name)
+    keywords: Dict[str, str] = {}
+    rows = 0
+    writer = _open_writer(path + ".tmp", fmt)
+    try:
+        chunk = []
+        for doc in sentiment_data.find(query, _PROJECTION, batch_size=MONGO_READ_BATCH_SIZE):
+            chunk.append(doc)
+            if len(chunk) >= chunk_size:
+                rows += _write_chunk(writer, chunk, keywords)
+                chunk = []
+        rows += _write_chunk(writer, chunk, keywords)
+    finally:
+        writer.close()
+
+    if rows:
+        os.replace(path + ".tmp", path)
+        manifest["files"].append({"name": name, "rows": rows, "watermark": upper.isoformat()})
+    else:
+        os.remove(path + ".tmp")
+        name = None
+    # The watermark only moves once the part file is in place
+    manifest["watermark"] = upper.isoformat()
+    manifest["rows"] += rows
+    _save_manifest(directory, manifest)
+    return {"file": name, "rows": rows, "watermark": manifest["watermark"]}
+
+def _write_chunk(writer, chunk: List[dict], keywords: Dict[str, str]) -> int:
+    if not chunk:
+        return 0
+    unseen = list({doc["sessionId"] for doc in chunk} - keywords.keys())
+    if unseen:
+        found = fetch_session_keywords(unseen)
+        keywords.update({session_id: found.get(session_id, "Unknown") for session_id in unseen})
+    writer.write_batch(_columns(chunk, keywords))
+    return len(chunk)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory")
+    parser.add_argument("--session-id", action="append", dest="session_ids", help="Limit to these sessions (repeatable)")
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--since", type=datetime.datetime.fromisoformat, help="Only results stored at or after this UTC time")
+    parser.add_argument("--until", type=datetime.datetime.fromisoformat, help="Only results stored before this UTC time")
+    parser.add_argument("--format", choices=list(FORMATS), default="parquet")
+    parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    result = export_sentiment(args.directory, args.session_ids, args.model, args.since, args.until, args.format, args.chunk_size)
+    logging.info(f"Exported {result['rows']} sentiment results to {args.directory} (watermark {result['watermark']})")
+
+
+if __name__ == "__main__":
+    main()
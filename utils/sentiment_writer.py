@@ -0,0 +1,119 @@
+import time
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from plugin.db import (
+    scrapped_data,
+    sentiment_data,
+    session_aggregates,
+    session_trends,
+    DUPLICATE_KEY_ERROR,
+    MONGO_WRITE_BATCH_SIZE,
+    MONGO_FLUSH_INTERVAL,
+)
+from utils.hashtag_sketches import apply_hashtag_updates, hashtag_updates
+from utils.log import logging
+from utils.metrics import POSTS_FAILED, POSTS_PROCESSED, POSTS_RELEASED
+from utils.session_aggregates import aggregate_increments
+from utils.session_trends import trend_increments
+
+
+def _status_update(status: int) -> dict:
+    # Any job claim on the post ends with its status change
+    return {"$set": {"status": status}, "$unset": {"claimedBy": "", "claimedAt": ""}}
+
+
+class SentimentWriter:
+    """
+    Buffers sentiment results and post status changes, then writes them with
+    one insert_many and one bulk_write per flush. Stored results are also
+    folded into the running totals in sessionAggregates and sessionTrends
+    and the hashtag sketches.
+    """
+
+    def __init__(self, batch_size: int = MONGO_WRITE_BATCH_SIZE, flush_interval: float = MONGO_FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._docs = []
+        self._failed_ids = []
+        self._released_ids = []
+        self._keywords = {}
+        self._last_flush = time.monotonic()
+        self.inserted_count = 0
+        self.failed_count = 0
+
+    def add_result(self, sentiment_doc: dict, keyword: str | None = None):
+        self._docs.append(sentiment_doc)
+        if keyword:
+            self._keywords[sentiment_doc["sessionId"]] = keyword
+
+    def add_failure(self, raw_id):
+        self._failed_ids.append(raw_id)
+
+    def add_release(self, raw_id):
+        # Post was skipped, not failed: it goes back to status 1 like before claims existed
+        self._released_ids.append(raw_id)
+
+    def pending(self) -> int:
+        return len(self._docs) + len(self._failed_ids) + len(self._released_ids)
+
+    def should_flush(self) -> bool:
+        if not self.pending():
+            return False
+        return self.pending() >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval
+
+    def flush(self) -> int:
+        """
+        Writes everything buffered. Returns how many posts now have a stored
+        sentiment doc. Posts already stored by an earlier run are marked status 3
+        without counting them into the totals again; posts whose sentiment doc
+        could not be inserted are marked status 4.
+        """
+        docs, failed_ids, released_ids = self._docs, self._failed_ids, self._released_ids
+        self._docs, self._failed_ids, self._released_ids = [], [], []
+        self._last_flush = time.monotonic()
+
+        stored_docs = docs
+        duplicate_ids = []
+        if docs:
+            try:
+                sentiment_data.insert_many(docs, ordered=False)
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                skipped_indexes = {error["index"] for error in errors}
+                duplicate_indexes = {error["index"] for error in errors if error.get("code") == DUPLICATE_KEY_ERROR}
+                failed_indexes = skipped_indexes - duplicate_indexes
+                if duplicate_indexes:
+                    logging.warning(f"{len(duplicate_indexes)} of {len(docs)} posts already had a stored result")
+                if failed_indexes:
+                    logging.error(f"{len(failed_indexes)} of {len(docs)} sentiment inserts failed")
+                stored_docs = [doc for i, doc in enumerate(docs) if i not in skipped_indexes]
+                duplicate_ids = [docs[i]["raw_id"] for i in duplicate_indexes]
+                failed_ids.extend(docs[i]["raw_id"] for i in failed_indexes)
+            except Exception as e:
+                logging.error(f"Error inserting {len(docs)} sentiment docs: {str(e)}")
+                failed_ids.extend(doc["raw_id"] for doc in docs)
+                stored_docs = []
+
+        stored_ids = [doc["raw_id"] for doc in stored_docs] + duplicate_ids
+        operations = [UpdateOne({"_id": raw_id}, _status_update(3)) for raw_id in stored_ids]
+        operations += [UpdateOne({"_id": raw_id}, _status_update(4)) for raw_id in failed_ids]
+        operations += [UpdateOne({"_id": raw_id}, _status_update(1)) for raw_id in released_ids]
+        if operations:
+            scrapped_data.bulk_write(operations, ordered=False)
+
+        aggregate_operations = aggregate_increments(stored_docs, self._keywords)
+        if aggregate_operations:
+            session_aggregates.bulk_write(aggregate_operations, ordered=False)
+
+        trend_operations = trend_increments(stored_docs)
+        if trend_operations:
+            session_trends.bulk_write(trend_operations, ordered=False)
+
+        apply_hashtag_updates(hashtag_updates(stored_docs))
+
+        self.inserted_count += len(stored_ids)
+        self.failed_count += len(failed_ids)
+        POSTS_PROCESSED.inc(len(stored_ids))
+        POSTS_FAILED.inc(len(failed_ids))
+        POSTS_RELEASED.inc(len(released_ids))
+        return len(stored_ids)
@@ -0,0 +1,149 @@
+"""
+Materialized per-session, per-model sentiment totals in `sessionAggregates`.
+
+process_all_in_session bumps the running sums as it stores results, so summary
+and ranking read one row per session instead of every post. Every change to a
+row also bumps its `version`, which the report cache checks entries against. Rebuild or check
+the rows against socialMediaSentiment with:
+
+    python -m utils.session_aggregates rebuild [--session-id ID ...] [--model MODEL]
+    python -m utils.session_aggregates check [--session-id ID ...] [--model MODEL]
+
+Sessions analyzed before this store existed need one `rebuild` to be seeded;
+until then summary and ranking aggregate their posts live on every read.
+Rebuild while the sessions are not being processed, e.g. as a deploy step.
+"""
+import argparse
+import datetime
+import json
+import sys
+from typing import Dict, Iterable, List, Optional
+from pymongo import UpdateOne
+from plugin.db import session_aggregates
+from plugin.inference_client import DEFAULT_MODEL_NAME
+from utils.log import logging
+from utils.session_stats import SCORE_FIELDS, fetch_session_stats
+
+TOTAL_FIELDS = ["total_posts"] + [f"total_{field.lower()}" for field in SCORE_FIELDS]
+
+
+def aggregate_increments(docs: Iterable[dict], keywords: Dict[str, str]) -> List[UpdateOne]:
+    """
+    Folds stored sentiment docs into one $inc upsert per (session, model).
+    """
+    increments = {}
+    for doc in docs:
+        analysis = doc.get("analysis") or {}
+        key = (doc["sessionId"], analysis.get("model"))
+        totals = increments.setdefault(key, dict.fromkeys(TOTAL_FIELDS, 0))
+        scores = analysis.get("scores") or {}
+        totals["total_posts"] += 1
+        for field in SCORE_FIELDS:
+            totals[f"total_{field.lower()}"] += scores.get(field, 0.0)
+
+    now = datetime.datetime.utcnow()
+    operations = []
+    for (session_id, model), totals in increments.items():
+        update = {"$inc": {**totals, "version": 1}, "$set": {"updated_at": now}}
+        if keywords.get(session_id):
+            update["$set"]["keyword"] = keywords[session_id]
+        operations.append(UpdateOne({"sessionId": session_id, "model": model}, update, upsert=True))
+    return operations
+
+def _with_averages(row: dict) -> dict:
+    stats = {field: row.get(field, 0) for field in TOTAL_FIELDS}
+    for field in SCORE_FIELDS:
+        name = field.lower()
+        stats[f"avg_{name}"] = stats[f"total_{name}"] / stats["total_posts"] if stats["total_posts"] else 0.0
+    stats["keyword"] = row.get("keyword") or "Unknown"
+    return stats
+
+def _seed_rows(stats: Dict[str, dict], model: str) -> int:
+    now = datetime.datetime.utcnow()
+    operations = []
+    for session_id, row in stats.items():
+        values = {field: row[field] for field in TOTAL_FIELDS}
+        values.update({"keyword": row["keyword"], "updated_at": now})
+        operations.append(UpdateOne({"sessionId": session_id, "model": model}, {"$set": values, "$inc": {"version": 1}}, upsert=True))
+    if operations:
+        session_aggregates.bulk_write(operations, ordered=False)
+    return len(operations)
+
+def fetch_session_aggregates(session_ids: List[str], model: str = DEFAULT_MODEL_NAME) -> Dict[str, dict]:
+    """
+    Same shape as session_stats.fetch_session_stats, read in O(sessions) from sessionAggregates.
+    Sessions without a row fall back to a live aggregation. It is not written
+    back: a read landing between a writer's insert and its $inc would seed the
+    new batch and the $inc would count it again. Seed rows with `rebuild`.
+    """
+    if not session_ids:
+        return {}
+
+    rows = session_aggregates.find(
+        {"sessionId": {"$in": list(session_ids)}, "model": model},
+        {"_id": 0, "sessionId": 1, "keyword": 1, **{field: 1 for field in TOTAL_FIELDS}},
+    )
+    stats = {row["sessionId"]: _with_averages(row) for row in rows if row.get("total_posts")}
+
+    missing = [session_id for session_id in dict.fromkeys(session_ids) if session_id not in stats]
+    if missing:
+        stats.update(fetch_session_stats(missing, model))
+    return stats
+
+def fetch_session_versions(session_ids: List[str], model: str = DEFAULT_MODEL_NAME) -> Dict[str, int]:
+    """
+    {session_id: version} for the requested sessions; sessions without a row are left out.
+    """
+    if not session_ids:
+        return {}
+    rows = session_aggregates.find({"sessionId": {"$in": list(session_ids)}, "model": model}, {"_id": 0, "sessionId": 1, "version": 1})
+    return {row["sessionId"]: row.get("version", 0) for row in rows}
+
+def rebuild(session_ids: Optional[List[str]] = None, model: str = DEFAULT_MODEL_NAME) -> int:
+    """
+    Recomputes rows from socialMediaSentiment and overwrites them. Returns rows written.
+    """
+    return _seed_rows(fetch_session_stats(session_ids, model), model)
+
+def check(session_ids: Optional[List[str]] = None, model: str = DEFAULT_MODEL_NAME, tolerance: float = 1e-6) -> List[dict]:
+    """
+    Compares stored rows with a fresh recomputation and returns the sessions that drifted.
+    """
+    expected = fetch_session_stats(session_ids, model)
+    query = {"model": model}
+    if session_ids is not None:
+        query["sessionId"] = {"$in": list(session_ids)}
+    stored = {row["sessionId"]: row for row in session_aggregates.find(query, {"_id": 0})}
+
+    drift = []
+    for session_id in sorted(set(expected) | set(stored)):
+        want = expected.get(session_id, {})
+        have = stored.get(session_id, {})
+        fields = {
+            field: {"stored": have.get(field, 0), "expected": want.get(field, 0)}
+            for field in TOTAL_FIELDS
+            if abs(have.get(field, 0) - want.get(field, 0)) > tolerance * max(1.0, abs(want.get(field, 0)))
+        }
+        if fields:
+            drift.append({"session_id": session_id, "fields": fields})
+    return drift
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["rebuild", "check"])
+    parser.add_argument("--session-id", action="append", dest="session_ids", help="Limit to these sessions (repeatable)")
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        written = rebuild(args.session_ids, args.model)
+        logging.info(f"Rebuilt {written} session aggregate rows for {args.model}")
+        return
+
+    drift = check(args.session_ids, args.model)
+    print(json.dumps({"model": args.model, "drifted_sessions": drift}, indent=2, default=str))
+    sys.exit(1 if drift else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+from typing import AsyncIterator, List
+from starlette.concurrency import run_in_threadpool
+from plugin.db import scrapped_data, MONGO_READ_BATCH_SIZE
+from plugin.inference_client import NEAR_DUP_ENABLED
+from utils.inference_helpers import analyze_sentiment_batch
+from utils.inference_resilience import InferenceUnavailable
+from utils.log import logging
+from utils.metrics import (
+    CLEAN_LATENCY,
+    DEDUP_LATENCY,
+    EXTRACT_LATENCY,
+    FETCH_LATENCY,
+    INFERENCE_STAGE_LATENCY,
+    NEAR_DUPLICATE_POSTS,
+    WRITE_LATENCY,
+)
+from utils.near_duplicates import Cluster, NearDuplicateIndex
+from utils.platform_extractors import SCRAPPED_POST_PROJECTION, extract_text_by_platform
+from utils.sentiment_writer import SentimentWriter
+from utils.text_cleaner import preprocess
+
+
+def pending_posts_query(session_id: str) -> dict:
+    return {"sessionId": session_id, "status": 1}
+
+def fetch_batch(collection, query: dict, projection: dict, after_id, batch_size: int) -> List[dict]:
+    if after_id is not None:
+        query = {**query, "_id": {"$gt": after_id}}
+    return list(collection.find(query, projection).sort("_id", 1).limit(batch_size))
+
+async def iter_batches(collection, query: dict, projection: dict, batch_size: int = MONGO_READ_BATCH_SIZE) -> AsyncIterator[List[dict]]:
+    """
+    Yields query results in `_id` order, `batch_size` docs at a time.
+    Each batch is a fresh query keyed on the last `_id`, so no cursor is held
+    open across inference calls and processed posts can change status safely.
+    """
+    last_id = None
+    while True:
+        with FETCH_LATENCY.time():
+            docs = await run_in_threadpool(fetch_batch, collection, query, projection, last_id, batch_size)
+        if not docs:
+            return
+        last_id = docs[-1]["_id"]
+        yield docs
+
+async def extract_stage(batches, writer: SentimentWriter, stats: dict):
+    async for docs in batches:
+        stats["total_attempted"] += len(docs)
+        extracted = []
+        with EXTRACT_LATENCY.time():
+            for doc in docs:
+                try:
+                    text = extract_text_by_platform(doc)
+                    if not text:
+                        logging.warning(f"No valid text found in post {doc['_id']}. Skipping.")
+                        writer.add_release(doc["_id"])
+                        continue
+                    extracted.append((doc, text))
+                except Exception as e:
+                    logging.error(f"Error processing post {doc['_id']}: {str(e)}")
+                    writer.add_failure(doc["_id"])
+        yield extracted
+
+async def clean_stage(batches, writer: SentimentWriter):
+    async for extracted in batches:
+        cleaned = []
+        with CLEAN_LATENCY.time():
+            for doc, text in extracted:
+                try:
+                    # The only cleaning pass this post gets; inference receives it as-is
+                    cleaned_text, hashtags = preprocess(text)
+                    cleaned.append((doc, text, hashtags, cleaned_text))
+                except Exception as e:
+                    logging.error(f"Error processing post {doc['_id']}: {str(e)}")
+                    writer.add_failure(doc["_id"])
+        yield cleaned
+
+def assign_clusters(cleaned: list, index: NearDuplicateIndex | None) -> list:
+    if index is None:
+        return [(*item, Cluster(item[0]["_id"], item[3])) for item in cleaned]
+    return [(*item, index.assign(item[0]["_id"], item[3])) for item in cleaned]
+
+async def dedup_stage(batches, index: NearDuplicateIndex | None):
+    async for cleaned in batches:
+        # MinHash is pure-Python CPU work; keep it off the event loop
+        with DEDUP_LATENCY.time():
+            clustered = await run_in_threadpool(assign_clusters, cleaned, index)
+        yield clustered
+
+async def infer_stage(batches, writer: SentimentWriter):
+    async for clustered in batches:
+        if not clustered:
+            continue
+        # Only clusters without a result yet are scored, once each
+        pending = list({id(cluster): cluster for *_, cluster in clustered if cluster.analysis is None}.values())
+        NEAR_DUPLICATE_POSTS.inc(len(clustered) - len(pending))
+        try:
+            if pending:
+                with INFERENCE_STAGE_LATENCY.time():
+                    analyses = await analyze_sentiment_batch([cluster.text for cluster in pending], cleaned=True)
+                for cluster, analysis in zip(pending, analyses):
+                    cluster.analysis = analysis
+        except InferenceUnavailable:
+            # Not the posts' fault: stop the run and leave them pending
+            raise
+        except Exception as e:
+            logging.error(f"Error analyzing batch of {len(pending)} posts: {str(e)}")
+            for doc, *_, cluster in clustered:
+                if cluster.analysis is None:
+                    writer.add_failure(doc["_id"])
+            clustered = [item for item in clustered if item[-1].analysis is not None]
+        yield clustered
+
+async def write_stage(batches, writer: SentimentWriter, session_id: str):
+    async for clustered in batches:
+        for doc, text, hashtags, cleaned_text, cluster in clustered:
+            analysis = cluster.analysis if cleaned_text == cluster.text else {**cluster.analysis, "text": cleaned_text}
+            writer.add_result({
+                "raw_id": doc["_id"],
+                "sessionId": session_id,
+                "platform": doc.get("platform"),
+                "text": text,
+                "hashtags": hashtags,
+                "analysis": analysis,
+                # Id of the post whose inference result this one shares; its own id when unique
+                "cluster_id": cluster.id,
+                "datetime": doc.get("datetime"),
+                "status": 3
+            }, keyword=doc.get("keyword"))
+
+        # Writes go out in bulk once the buffer is full or the flush interval passed
+        if writer.should_flush():
+            with WRITE_LATENCY.time():
+                await run_in_threadpool(writer.flush)
+
+    with WRITE_LATENCY.time():
+        await run_in_threadpool(writer.flush)
+
+async def run_pipeline(session_id: str, batches, writer: SentimentWriter) -> dict:
+    """
+    Drives `batches` of scraped posts through extract -> clean -> dedup -> infer -> write.
+    Near-duplicates within the run share their cluster representative's result.
+    """
+    stats = {"total_attempted": 0}
+    index = NearDuplicateIndex() if NEAR_DUP_ENABLED else None
+    pipeline = infer_stage(dedup_stage(clean_stage(extract_stage(batches, writer, stats), writer), index), writer)
+    await write_stage(pipeline, writer, session_id)
+
+    return {
+        "posts_processed": writer.inserted_count,
+        "posts_failed": writer.failed_count,
+        "total_attempted": stats["total_attempted"],
+    }
+
+async def process_session(session_id: str, batch_size: int = MONGO_READ_BATCH_SIZE) -> dict:
+    """
+    Streams a session's pending posts through the pipeline in the caller's task.
+    Peak memory is bounded by `batch_size` and the writer buffer, not by session size.
+    """
+    batches = iter_batches(scrapped_data, pending_posts_query(session_id), SCRAPPED_POST_PROJECTION, batch_size)
+    return await run_pipeline(session_id, batches, SentimentWriter())
@@ -0,0 +1,123 @@
+"""
+Summary and ranking reports built from per-session stats, shared by the API
+routes (stats from sessionAggregates) and the offline export reader (stats
+from exported files). Stats per session are total_posts, total_<score>,
+avg_<score> and keyword.
+"""
+from typing import Dict, List, Optional
+
+
+def summarize_sessions(session_ids: List[str], stats_by_session: Dict[str, dict]) -> List[dict]:
+    """
+    One summary per requested session with data, in request order.
+    """
+    output = []
+
+    for session_id in session_ids:
+        stats = stats_by_session.get(session_id)
+        if not stats:
+            continue
+
+        total_posts = stats["total_posts"]
+        total_negative = stats["total_negative"]
+        total_positive = stats["total_positive"]
+        keyword = stats["keyword"]
+
+        normalized_negative_score = total_negative / total_posts
+        negative_content_share = total_negative / (total_negative + total_positive) if (total_negative + total_positive) > 0 else 0.0
+
+        summary = (
+            f"For The Topic: {keyword}, out of {total_posts} analyzed posts in this session, "
+            f"the average negative sentiment is {normalized_negative_score:.4f}, "
+            f"and negative content accounts for {negative_content_share * 100:.2f}% of the overall sentiment. "
+        )
+
+        if negative_content_share < 0.2:
+            summary += "This indicates a predominantly positive tone."
+        elif negative_content_share < 0.5:
+            summary += "There is a moderate level of negative sentiment."
+        else:
+            summary += "The session contains a high amount of negative content."
+
+        output.append({
+            "session_id": session_id,
+            "summary": summary,
+            "keyword": keyword,
+            "normalized_score": normalized_negative_score
+        })
+
+    return output
+
+def rank_sessions(session_ids: List[str], stats_by_session: Dict[str, dict], min_posts: int) -> Optional[dict]:
+    """
+    Ranking of the requested sessions with at least `min_posts` posts, or None
+    when no session qualifies.
+    """
+    rankings = []
+    skipped_sessions = []
+
+    for session_id in session_ids:
+        stats = stats_by_session.get(session_id)
+        if not stats:
+            skipped_sessions.append({"session_id": session_id, "reason": "No posts found"})
+            continue
+
+        total_posts = stats["total_posts"]
+        if total_posts < min_posts:
+            skipped_sessions.append({"session_id": session_id, "reason": f"Only {total_posts} posts"})
+            continue
+
+        rankings.append({
+            "session_id": session_id,
+            "keyword": stats["keyword"],
+            "avg_negative_score": round(stats["avg_negative"], 4),
+            "avg_positive_score": round(stats["avg_positive"], 4),
+            "avg_neutral_score": round(stats["avg_neutral"], 4),
+            "total_posts": total_posts
+        })
+
+    if not rankings:
+        return None
+
+    # Sort sessions
+    sorted_by_negative = sorted(rankings, key=lambda x: x["avg_negative_score"], reverse=True)
+    sorted_by_positive = sorted(rankings, key=lambda x: x["avg_positive_score"], reverse=True)
+    sorted_by_total_posts = sorted(rankings, key=lambda x: x["total_posts"], reverse=True)
+
+    most_negative = sorted_by_negative[0]
+    most_positive = sorted_by_positive[0]
+
+    # Edge case: Same session is both highest positive and negative
+    if most_negative["session_id"] == most_positive["session_id"]:
+        summary = (
+            f"The session '{most_negative['keyword']}' stands out by having both the highest average positive sentiment "
+            f"({most_positive['avg_positive_score']:.4f}) and the highest average negative sentiment "
+            f"({most_negative['avg_negative_score']:.4f}) across {most_negative['total_posts']} posts. "
+            f"This indicates that people expressed very mixed opinions in this session—some posts were highly positive while others were strongly negative."
+        )
+
+        return {
+            "is_session_shared": True,
+            "mixed_sentiment_session": most_negative,
+            "all_session_rankings": sorted_by_total_posts,
+            "skipped_sessions": skipped_sessions,
+            "summary": summary
+        }
+
+    # Normal case
+    summary = (
+        f"Among the provided sessions, session '{most_negative['keyword']}' shows the highest average negative sentiment "
+        f"with a score of {most_negative['avg_negative_score']:.4f} across {most_negative['total_posts']} posts. "
+        f"This suggests that the content in this session may be more emotionally charged, critical, or negative."
+        f"In contrast, session '{most_positive['keyword']}' has the highest average positive sentiment score of "
+        f"{most_positive['avg_positive_score']:.4f} over {most_positive['total_posts']} posts, indicating a more positive and constructive tone overall."
+    )
+
+    return {
+        "is_session_shared": False,
+        "highest_avg_negative_session": most_negative,
+        "highest_avg_positive_session": most_positive,
+        "all_session_rankings": sorted_by_total_posts,
+        "skipped_sessions": skipped_sessions,
+        "summary": summary
+    }
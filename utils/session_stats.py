@@ -0,0 +1,57 @@
+from typing import Dict, List, Optional
+from plugin.db import sentiment_data, scrapped_data
+from plugin.inference_client import DEFAULT_MODEL_NAME
+
+SCORE_FIELDS = ("Negative", "Positive", "Neutral")
+
+
+def session_stats_pipeline(session_ids: Optional[List[str]], model: str = DEFAULT_MODEL_NAME) -> List[dict]:
+    """
+    Post count, score sums and averages per session in a single $group.
+    Missing scores count as 0, same as the old Python-side sums.
+    `session_ids=None` covers every session for the model.
+    """
+    group = {"_id": "$sessionId", "total_posts": {"$sum": 1}}
+    for field in SCORE_FIELDS:
+        score = {"$ifNull": [f"$analysis.scores.{field}", 0.0]}
+        group[f"total_{field.lower()}"] = {"$sum": score}
+        group[f"avg_{field.lower()}"] = {"$avg": score}
+
+    match = {"analysis.model": model}
+    if session_ids is not None:
+        match["sessionId"] = {"$in": list(session_ids)}
+
+    return [
+        {"$match": match},
+        {"$group": group},
+    ]
+
+def session_keywords_pipeline(session_ids: List[str]) -> List[dict]:
+    # Sorting on sessionId before $group/$first lets Mongo answer from the index
+    return [
+        {"$match": {"sessionId": {"$in": list(session_ids)}}},
+        {"$sort": {"sessionId": 1}},
+        {"$group": {"_id": "$sessionId", "keyword": {"$first": "$keyword"}}},
+    ]
+
+def fetch_session_keywords(session_ids: List[str]) -> Dict[str, str]:
+    if not session_ids:
+        return {}
+    return {
+        row["_id"]: row.get("keyword") or "Unknown"
+        for row in scrapped_data.aggregate(session_keywords_pipeline(session_ids))
+    }
+
+def fetch_session_stats(session_ids: Optional[List[str]], model: str = DEFAULT_MODEL_NAME) -> Dict[str, dict]:
+    """
+    Returns {session_id: stats} for every requested session that has analyzed posts.
+    Two round-trips (scores, keywords) regardless of how many sessions or posts are involved.
+    """
+    if session_ids is not None and not session_ids:
+        return {}
+
+    stats = {row.pop("_id"): row for row in sentiment_data.aggregate(session_stats_pipeline(session_ids, model))}
+    keywords = fetch_session_keywords(list(stats))
+    for session_id, row in stats.items():
+        row["keyword"] = keywords.get(session_id, "Unknown")
+    return stats
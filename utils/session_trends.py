@@ -0,0 +1,162 @@
+"""
+Per-session sentiment rollups by time bucket and platform in `sessionTrends`.
+
+SentimentWriter bumps a row per (session, model, granularity, bucket, platform)
+as it stores results, so trend reads are one index range scan over buckets
+instead of a pass over every post. Rebuild rows from socialMediaSentiment with:
+
+    python -m utils.session_trends rebuild [--session-id ID ...] [--model MODEL]
+
+Sessions analyzed before this store existed need one `rebuild` to be seeded.
+"""
+import argparse
+import datetime
+from typing import Dict, Iterable, List, Optional
+from pymongo import DeleteMany, UpdateOne
+from plugin.db import session_trends, sentiment_data, MONGO_READ_BATCH_SIZE, MONGO_WRITE_BATCH_SIZE, TREND_GRANULARITIES
+from plugin.inference_client import DEFAULT_MODEL_NAME
+from utils.log import logging
+from utils.session_stats import SCORE_FIELDS
+
+TOTAL_FIELDS = ["total_posts"] + [f"total_{field.lower()}" for field in SCORE_FIELDS]
+
+_TRUNCATE = {
+    "minute": lambda moment: moment.replace(second=0, microsecond=0),
+    "hour": lambda moment: moment.replace(minute=0, second=0, microsecond=0),
+    "day": lambda moment: moment.replace(hour=0, minute=0, second=0, microsecond=0),
+}
+GRANULARITIES = tuple(_TRUNCATE)
+
+for _name in TREND_GRANULARITIES:
+    if _name not in _TRUNCATE:
+        logging.warning(f"Ignoring unknown trend granularity '{_name}'; use one of {', '.join(GRANULARITIES)}")
+TRACKED_GRANULARITIES = [name for name in TREND_GRANULARITIES if name in _TRUNCATE]
+
+
+def to_utc(value) -> Optional[datetime.datetime]:
+    """
+    Naive UTC datetime for a post's `datetime` (datetime or ISO 8601 string), or None.
+    """
+    if isinstance(value, str):
+        try:
+            value = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if not isinstance(value, datetime.datetime):
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value
+
+def _fold(docs: Iterable[dict], totals: Dict[tuple, dict], granularities: List[str]) -> Dict[tuple, dict]:
+    for doc in docs:
+        moment = to_utc(doc.get("datetime"))
+        if moment is None:
+            continue
+        analysis = doc.get("analysis") or {}
+        scores = analysis.get("scores") or {}
+        platform = (doc.get("platform") or "unknown").lower()
+        for granularity in granularities:
+            key = (doc["sessionId"], analysis.get("model"), granularity, _TRUNCATE[granularity](moment), platform)
+            row = totals.setdefault(key, dict.fromkeys(TOTAL_FIELDS, 0))
+            row["total_posts"] += 1
+            for field in SCORE_FIELDS:
+                row[f"total_{field.lower()}"] += scores.get(field, 0.0)
+    return totals
+
+def _row_filter(key: tuple) -> dict:
+    session_id, model, granularity, bucket, platform = key
+    return {"sessionId": session_id, "model": model, "granularity": granularity, "bucket": bucket, "platform": platform}
+
+def trend_increments(docs: Iterable[dict], granularities: List[str] = TRACKED_GRANULARITIES) -> List[UpdateOne]:
+    """
+    Folds stored sentiment docs into one $inc upsert per bucket row.
+    Docs without a parseable `datetime` are left out of the trend.
+    """
+    totals = _fold(docs, {}, granularities)
+    return [UpdateOne(_row_filter(key), {"$inc": row}, upsert=True) for key, row in totals.items()]
+
+def _bucket_stats(row: dict) -> dict:
+    stats = {"total_posts": row.get("total_posts", 0)}
+    for field in SCORE_FIELDS:
+        name = field.lower()
+        stats[f"avg_{name}"] = round(row.get(f"total_{name}", 0) / stats["total_posts"], 4) if stats["total_posts"] else 0.0
+    return stats
+
+def fetch_session_trends(session_ids: List[str], granularity: str, model: str = DEFAULT_MODEL_NAME,
+                         start: Optional[datetime.datetime] = None, end: Optional[datetime.datetime] = None,
+                         platforms: Optional[List[str]] = None) -> Dict[str, List[dict]]:
+    """
+    Returns {session_id: buckets} in bucket order for sessions with data in [start, end).
+    Each bucket has the counts and average scores over all platforms, plus the
+    same stats per platform under "platforms".
+    """
+    if not session_ids:
+        return {}
+
+    query = {"sessionId": {"$in": list(session_ids)}, "model": model, "granularity": granularity}
+    bucket_range = {}
+    if start is not None:
+        bucket_range["$gte"] = _TRUNCATE[granularity](to_utc(start))
+    if end is not None:
+        bucket_range["$lt"] = to_utc(end)
+    if bucket_range:
+        query["bucket"] = bucket_range
+    if platforms:
+        query["platform"] = {"$in": [platform.lower() for platform in platforms]}
+
+    rows = session_trends.find(query, {"_id": 0, "sessionId": 1, "bucket": 1, "platform": 1, **{field: 1 for field in TOTAL_FIELDS}})
+    merged: Dict[str, Dict[datetime.datetime, dict]] = {}
+    for row in rows:
+        buckets = merged.setdefault(row["sessionId"], {})
+        bucket = buckets.setdefault(row["bucket"], {"totals": dict.fromkeys(TOTAL_FIELDS, 0), "platforms": {}})
+        for field in TOTAL_FIELDS:
+            bucket["totals"][field] += row.get(field, 0)
+        bucket["platforms"][row["platform"]] = _bucket_stats(row)
+
+    return {
+        session_id: [
+            {"bucket": moment, **_bucket_stats(bucket["totals"]), "platforms": bucket["platforms"]}
+            for moment, bucket in sorted(buckets.items())
+        ]
+        for session_id, buckets in merged.items()
+    }
+
+def rebuild(session_ids: Optional[List[str]] = None, model: str = DEFAULT_MODEL_NAME,
+            granularities: List[str] = TRACKED_GRANULARITIES) -> int:
+    """
+    Recomputes rows from socialMediaSentiment and replaces them. Returns rows written.
+    Memory grows with the number of buckets, not the number of posts.
+    """
+    query = {"analysis.model": model}
+    if session_ids is not None:
+        query["sessionId"] = {"$in": list(session_ids)}
+    docs = sentiment_data.find(
+        query, {"_id": 0, "sessionId": 1, "platform": 1, "datetime": 1, "analysis.model": 1, "analysis.scores": 1},
+        batch_size=MONGO_READ_BATCH_SIZE,
+    )
+    totals = _fold(docs, {}, granularities)
+
+    stale = {"model": model}
+    if session_ids is not None:
+        stale["sessionId"] = {"$in": list(session_ids)}
+    operations = [DeleteMany(stale)]
+    operations += [UpdateOne(_row_filter(key), {"$set": row}, upsert=True) for key, row in totals.items()]
+    for start in range(0, len(operations), MONGO_WRITE_BATCH_SIZE):
+        # The delete goes first in the first chunk, so chunks stay in order
+        session_trends.bulk_write(operations[start:start + MONGO_WRITE_BATCH_SIZE], ordered=True)
+    return len(totals)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--session-id", action="append", dest="session_ids", help="Limit to these sessions (repeatable)")
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    args = parser.parse_args()
+
+    written = rebuild(args.session_ids, args.model)
+    logging.info(f"Rebuilt {written} session trend rows for {args.model}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,27 @@
 import re
+from typing import List, NamedTuple
 
-def clean_text(text: str, max_words: int = 200) -> str:
-    text = text.lower()
-    text = re.sub(r"http\S+", "http", text)   # replace URLs
-    text = re.sub(r"@\w+", "@user", text)     # replace @mentions
-    text = re.sub(r"\s+", " ", text).strip()  # collapse whitespace
-    text = " ".join(text.split()[:max_words]) # limit to max_words
+MAX_WORDS = 200
+
+_URL_RE = re.compile(r"http\S+")
+_MENTION_RE = re.compile(r"@\w+")
+_HASHTAG_RE = re.compile(r"#\w+")
+
+
+class PreprocessedText(NamedTuple):
+    cleaned: str
+    hashtags: List[str]
+
+
+def clean_text(text: str, max_words: int = MAX_WORDS) -> str:
+    # Truncate first: split() stops after max_words, so long posts are not scanned
+    # past the cut. URL/mention replacements never add or remove whitespace, so
+    # the word count is the same as cleaning first and truncating after.
+    text = " ".join(text.split(None, max_words)[:max_words]).lower()  # collapse whitespace, limit to max_words
+    if "http" in text:
+        text = _URL_RE.sub("http", text)        # replace URLs
+    if "@" in text:
+        text = _MENTION_RE.sub("@user", text)   # replace @mentions
 
     return text
 
@@ -13,5 +29,16 @@ def extract_hashtags(text: str) -> list[str]:
     """
     Extracts hashtags from text, returns them as a list keeping the # symbol.
     """
-    hashtags = re.findall(r"#\w+", text)
-    return hashtags
\ No newline at end of file
+    if "#" not in text:
+        return []
+    return _HASHTAG_RE.findall(text)
+
+def preprocess(text: str, max_words: int = MAX_WORDS) -> PreprocessedText:
+    """
+    Cleaned model input and hashtags for one post. Hashtags come from the whole
+    raw text, the cleaned text is truncated to `max_words`.
+    """
+    return PreprocessedText(clean_text(text, max_words), extract_hashtags(text))
+
+def preprocess_batch(texts: List[str], max_words: int = MAX_WORDS) -> List[PreprocessedText]:
+    return [PreprocessedText(clean_text(text, max_words), extract_hashtags(text)) for text in texts]